@@ -0,0 +1,199 @@
+# Compare the threaded WSGI server with the async (ASGI) serving mode under many open connections.
+#
+#   python benchmarks/async_serving.py
+#   python benchmarks/async_serving.py --connections 50,500,2000 --duration 20 --modes asgi
+#
+# Seeds a database the way load_test.py does, then for each mode and each
+# --connections level opens that many keep-alive connections, each one
+# searching availability (/api/v1/availability) for one of --distinct popular
+# stays, pausing --think seconds between requests like a real client. Reported
+# per run: connections held open, requests per second, p50/p99 latency, 503s
+# from the concurrency limit, failed connections, and the server's peak thread
+# count.
+#
+#   wsgi  `flask run`: Werkzeug's threaded server, a thread per connection
+#   asgi  uvicorn serving main:asgi_app: one event loop, ASYNC_THREADS view threads,
+#         identical searches coalesced (needs `pip install uvicorn`)
+#
+# Both run as a single process, so the numbers compare the serving models rather than core counts.
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from load_test import ROOT, free_port, seed, stop_server
+
+SERVERS = {
+    'wsgi': ['-m', 'flask', '--app', 'main', 'run', '--host', '127.0.0.1', '--port', '{port}', '--with-threads'],
+    'asgi': ['-m', 'uvicorn', 'main:asgi_app', '--host', '127.0.0.1', '--port', '{port}', '--log-level', 'warning',
+             '--no-access-log', '--backlog', '4096'],
+}
+
+
+def start_server(mode, database, threads):
+    if mode == 'asgi':
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            return None, None
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + database, JOB_WORKERS='0', HOLD_SWEEP_IN_PROCESS='0',
+               ASYNC_THREADS=str(threads))
+    args = [sys.executable] + [arg.format(port=port) for arg in SERVERS[mode]]
+    server = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit('%s server exited with %d' % (mode, server.returncode))
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    sys.exit('%s server did not start listening within 30 s' % mode)
+
+
+# Peak thread count of the server process, sampled from /proc while a run is going (Linux only)
+class ThreadSampler(threading.Thread):
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.path = '/proc/%d/status' % pid
+        self.peak = None
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.wait(0.1):
+            try:
+                with open(self.path) as f:
+                    for line in f:
+                        if line.startswith('Threads:'):
+                            self.peak = max(self.peak or 0, int(line.split()[1]))
+            except OSError:
+                return
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.failed = 0
+        self.held = 0
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def visitor(port, paths, think, deadline, stats, rng):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        stats.failed += 1
+        return
+    stats.held += 1
+    try:
+        while time.monotonic() < deadline:
+            path = rng.choice(paths)
+            start = time.perf_counter()
+            writer.write(('GET %s HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n' % path).encode())
+            status, keep_alive = await read_response(reader)
+            stats.latencies.append(time.perf_counter() - start)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if not keep_alive:
+                writer.close()
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            await asyncio.sleep(think * rng.uniform(0.5, 1.5))
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        stats.failed += 1
+    finally:
+        writer.close()
+
+
+async def run_level(port, connections, paths, think, duration, seed_value):
+    stats = Stats()
+    rng = random.Random(seed_value)
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*[visitor(port, paths, think, deadline, stats, random.Random(rng.random()))
+                           for _ in range(connections)])
+    return stats, time.perf_counter() - start
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'hotel-async.db'))
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--connections', default='50,200,800', help='comma separated levels')
+    parser.add_argument('--distinct', type=int, default=20, help='different stays being searched')
+    parser.add_argument('--think', type=float, default=0.05, help='seconds each client pauses between requests')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=16, help='ASYNC_THREADS for the asgi mode')
+    args = parser.parse_args()
+
+    seed(args.database, args.rooms, args.bookings, args.seed)
+    rng = random.Random(args.seed)
+    paths = []
+    for _ in range(args.distinct):
+        checkin = date.today() + timedelta(days=rng.randrange(1, 180))
+        paths.append('/api/v1/availability?checkin_date=%s&checkout_date=%s'
+                     % (checkin, checkin + timedelta(days=rng.randint(1, 7))))
+
+    print('%-5s %11s %6s %9s %8s %8s %6s %7s %8s' % ('mode', 'connections', 'held', 'req/s', 'p50 ms', 'p99 ms',
+                                                       '503s', 'failed', 'threads'))
+    for mode in args.modes.split(','):
+        server, port = start_server(mode, args.database, args.threads)
+        if server is None:
+            print('%-5s skipped: uvicorn is not installed (pip install uvicorn)' % mode)
+            continue
+        try:
+            for connections in [int(level) for level in args.connections.split(',')]:
+                sampler = ThreadSampler(server.pid)
+                sampler.start()
+                stats, elapsed = asyncio.run(run_level(port, connections, paths, args.think, args.duration,
+                                                       args.seed))
+                sampler.stopping.set()
+                sampler.join()
+                print('%-5s %11d %6d %9.1f %8.1f %8.1f %6d %7d %8s' % (
+                    mode, connections, stats.held, len(stats.latencies) / elapsed,
+                    percentile(stats.latencies, 0.5) * 1000, percentile(stats.latencies, 0.99) * 1000,
+                    stats.statuses.get(503, 0), stats.failed, sampler.peak or '-'))
+        finally:
+            stop_server(server)
+
+
+if __name__ == '__main__':
+    main()
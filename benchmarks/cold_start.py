@@ -0,0 +1,70 @@
+# Measure worker cold start: importing the app, and the first request after it.
+#
+#   python benchmarks/cold_start.py --runs 10 [--max-import-ms 400]
+#
+# Every run is a fresh interpreter, like a freshly forked or autoscaled worker.
+# The database URL points at a file that doesn't exist; it must still not exist
+# after the import, proving startup never opens the database or issues DDL.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+touched_db = os.path.exists(sys.argv[1])
+response = main.app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (served - imported) * 1000,
+    'status': response.status_code,
+    'touched_db': touched_db,  # the first request starts job workers, which do use it
+}))
+'''
+
+
+def run_once(db_path):
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path)
+    output = subprocess.check_output([sys.executable, '-c', PROBE, db_path], cwd=ROOT, env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-import-ms', type=float, default=None,
+                        help='Exit non-zero when the median import time is above this.')
+    args = parser.parse_args()
+
+    results = [run_once(os.path.join(tempfile.mkdtemp(), 'cold.db')) for _ in range(args.runs)]
+    imports = [result['import_ms'] for result in results]
+    firsts = [result['first_request_ms'] for result in results]
+    print('import        median %7.1f ms  min %7.1f ms  max %7.1f ms' % (
+        statistics.median(imports), min(imports), max(imports)))
+    print('first request median %7.1f ms  min %7.1f ms  max %7.1f ms' % (
+        statistics.median(firsts), min(firsts), max(firsts)))
+
+    if any(result['touched_db'] for result in results):
+        print('FAIL: startup opened the database')
+        return 1
+    if any(result['status'] != 200 for result in results):
+        print('FAIL: first request did not return 200')
+        return 1
+    if args.max_import_ms is not None and statistics.median(imports) > args.max_import_ms:
+        print('FAIL: median import above %.1f ms' % args.max_import_ms)
+        return 1
+    print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,379 @@
+# Load test the booking flow and the admin pages over HTTP.
+#
+#   python benchmarks/load_test.py --users 32 --duration 60 --save-baseline benchmarks/baseline.json
+#   python benchmarks/load_test.py --users 32 --duration 60 --baseline benchmarks/baseline.json
+#   python benchmarks/load_test.py --url http://127.0.0.1:8000 --users 16   # a server that is already running
+#
+# Seeds a SQLite database with --rooms rooms and --bookings bookings through the
+# bulk importer (kept in --database and reused by later runs with the same
+# sizes), serves it with gunicorn, then runs --users simulated visitors for
+# --duration seconds after a --warmup. Each visitor picks a scenario by --mix:
+#
+#   guest  home -> room types -> search a stay -> quote -> book -> pay -> wait for the capture
+#   admin  dashboard -> filtered and sorted pages -> next page -> guest search -> reports
+#
+# Latency is measured per step and reported as p50/p95/p99 with requests per
+# second. With --baseline the run is compared to an earlier --save-baseline
+# and exits non-zero when a step's p95 or the overall throughput is worse by
+# more than --tolerance. The dataset comes from --seed, so runs are repeatable.
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STATUSES = [('confirmed', 'paid')] * 7 + [('pending', 'pending')] + [('cancelled', 'pending')] * 2
+ADMIN_PAGES = [
+    '/admin_dash',
+    '/admin_dash?status=confirmed',
+    '/admin_dash?sort=checkin&order=desc',
+    '/admin_dash?status=pending&sort=name',
+]
+
+
+# One row per room type with a few units each, the way main.py lays rooms out
+def room_lines(count, rng):
+    yield 'name,room_type,price,total_of_this_type,max_guests\n'
+    for n in range(count):
+        yield 'Room type %d,type-%04d,%d,%d,%d\n' % (n, n, rng.randrange(60, 400), rng.randint(1, 5),
+                                                   rng.randint(1, 4))
+
+
+# A year either side of today, so the dashboards, reports and searches all see data
+def booking_lines(count, room_ids, rng):
+    yield 'customer_name,email,phone,room_id,checkin_date,checkout_date,price,payment_method,status,payment_status\n'
+    first = date.today() - timedelta(days=365)
+    for n in range(count):
+        checkin = first + timedelta(days=rng.randrange(730))
+        nights = rng.randint(1, 7)
+        status, payment_status = rng.choice(STATUSES)
+        yield 'guest %d,guest%d@example.com,555%07d,%d,%s,%s,%d,card,%s,%s\n' % (
+            n, n, n, rng.choice(room_ids), checkin, checkin + timedelta(days=nights), nights * 100,
+            status, payment_status)
+
+
+def seed(database, rooms, bookings, seed_value):
+    from hotel import bulk, create_app
+    from hotel.extensions import db
+    from hotel.migrations import upgrade
+    from hotel.models import Room
+
+    marker = database + '.json'
+    wanted = {'rooms': rooms, 'bookings': bookings, 'seed': seed_value}
+    if os.path.exists(database) and os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == wanted:
+                print('reusing %s' % database)
+                return
+    for path in (database, database + '-wal', database + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    rng = random.Random(seed_value)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database})
+    with app.app_context():
+        upgrade(db.engine)
+        bulk.import_rows('rooms', room_lines(rooms, rng), chunk_size=2000)
+        room_ids = [room_id for room_id, in db.session.execute(db.select(Room.id)).all()]
+        report = bulk.import_rows('bookings', booking_lines(bookings, room_ids, rng), chunk_size=5000)
+        db.session.remove()
+        db.engine.dispose()
+    with open(marker, 'w') as f:
+        json.dump(wanted, f)
+    print('seeded %d rooms and %d bookings in %.1f s' % (rooms, report.inserted, time.perf_counter() - start))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(database, workers, threads, gateway_latency):
+    if shutil.which('gunicorn') is None:
+        sys.exit('gunicorn is not installed (pip install gunicorn), or pass --url of a running server')
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + database, FAKE_GATEWAY_LATENCY=str(gateway_latency))
+    server = subprocess.Popen(['gunicorn', '--workers', str(workers), '--threads', str(threads),
+                               '--bind', '127.0.0.1:%d' % port, '--log-level', 'warning', 'main:app'],
+                              cwd=ROOT, env=env)
+    url = 'http://127.0.0.1:%d' % port
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit('gunicorn exited with %d' % server.returncode)
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return server, url
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    sys.exit('gunicorn did not start listening within 30 s')
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+# One visitor's keep-alive connection; every request is recorded as (step, seconds, status)
+class Client:
+    def __init__(self, url, samples):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.samples = samples
+        self.recording = False
+        self._conn = None
+
+    def request(self, step, method, path, form=None):
+        body = urlencode(form) if form is not None else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form is not None else {}
+        start = time.perf_counter()
+        try:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self._conn.request(method, path, body, headers)
+            response = self._conn.getresponse()
+            data = response.read()
+            status = response.status
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            response, data, status = None, b'', 0
+        if self.recording:
+            self.samples.append((step, time.perf_counter() - start, status))
+        return status, response.getheader('Location', '') if response else '', data
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def guest_visit(client, rng, room_ids):
+    client.request('home', 'GET', '/')
+    client.request('room_types', 'GET', '/room_details')
+    checkin = date.today() + timedelta(days=rng.randint(30, 365))
+    checkout = checkin + timedelta(days=rng.randint(1, 5))
+    stay = {'checkin_date': checkin.isoformat(), 'checkout_date': checkout.isoformat()}
+    client.request('search', 'GET', '/room_details?' + urlencode(stay))
+    room_id = rng.choice(room_ids)
+    client.request('quote', 'GET', '/quote?' + urlencode(dict(stay, room_id=room_id)))
+    n = rng.randrange(10 ** 9)
+    status, location, _ = client.request('book', 'POST', '/process-booking/%d' % room_id, dict(
+        stay, customer_name='load %d' % n, email='load%d@example.com' % n, phone='555%07d' % (n % 10 ** 7),
+        payment_method='card', idempotency_key='load-%d-%d' % (n, room_id)))
+    match = re.search(r'/payment/(\d+)$', location)
+    if not match:
+        return  # sold out, sent back to the room list
+    payment = '/payment/%s' % match.group(1)
+    client.request('payment_form', 'GET', payment)
+    client.request('pay', 'POST', payment, {'payment_method': 'card'})
+    for _ in range(40):
+        status, _, body = client.request('payment_status', 'GET', payment + '/status')
+        if status != 200 or json.loads(body)['payment_status'] != 'pending':
+            break
+        time.sleep(0.25)
+    client.request('processing', 'GET', payment + '/processing')
+
+
+def admin_visit(client, rng, booking_count):
+    for path in ADMIN_PAGES:
+        status, _, body = client.request('dashboard', 'GET', path)
+    match = re.search(rb'href="([^"]*after=[^"]*)"', body)
+    if match:
+        client.request('dashboard_next', 'GET', match.group(1).decode().replace('&amp;', '&'))
+    guest = 'guest %d' % rng.randrange(max(booking_count, 1))
+    client.request('guest_search', 'GET', '/admin_dash?' + urlencode({'guest': guest}))
+    client.request('reports', 'GET', '/admin/reports')
+
+
+def discover(url):
+    client = Client(url, [])
+    status, _, body = client.request('rooms', 'GET', '/api/v1/rooms?fields=id&per_page=200')
+    client.close()
+    if status != 200:
+        sys.exit('GET /api/v1/rooms returned %d' % status)
+    room_ids = [room['id'] for room in json.loads(body)['data']]
+    if not room_ids:
+        sys.exit('the server has no rooms; seed it first')
+    return room_ids
+
+
+def run_load(url, users, duration, warmup, mix, seed_value, booking_count):
+    room_ids = discover(url)
+    scenarios = [name for name, weight in mix.items() for _ in range(weight)]
+    samples = []
+    started = threading.Event()
+    stop = threading.Event()
+    clients = []
+
+    def visitor(number):
+        rng = random.Random(seed_value * 1000 + number)
+        client = Client(url, samples)
+        clients.append(client)
+        while not stop.is_set():
+            client.recording = started.is_set()
+            if rng.choice(scenarios) == 'guest':
+                guest_visit(client, rng, room_ids)
+            else:
+                admin_visit(client, rng, booking_count)
+        client.close()
+
+    threads = [threading.Thread(target=visitor, args=(n,), daemon=True) for n in range(users)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    started.set()
+    start = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+    # Requests still in flight when the clock stopped are left out
+    return samples, elapsed
+
+
+def percentile(ordered, share):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(share * len(ordered) + 0.5)) - 1)]
+
+
+def stats(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': len(ordered) / elapsed,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+    }
+
+
+def summarize(samples, elapsed):
+    steps = {}
+    for step, seconds, status in samples:
+        steps.setdefault(step, ([], [0]))
+        steps[step][0].append(seconds)
+        if status == 0 or status >= 500:
+            steps[step][1][0] += 1
+    return {
+        'total': stats([seconds for _, seconds, _ in samples],
+                       sum(errors[0] for _, errors in steps.values()), elapsed),
+        'steps': {step: stats(latencies, errors[0], elapsed) for step, (latencies, errors) in sorted(steps.items())},
+    }
+
+
+def report(result):
+    print('%-16s %8s %6s %8s %9s %9s %9s' % ('step', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for step, row in list(result['steps'].items()) + [('TOTAL', result['total'])]:
+        print('%-16s %8d %6d %8.1f %9.1f %9.1f %9.1f' % (
+            step, row['requests'], row['errors'], row['rps'], row['p50_ms'], row['p95_ms'], row['p99_ms']))
+
+
+# Regressions against a stored run: slower p95 per step, lower overall throughput, new errors
+def compare(result, baseline, tolerance):
+    problems = []
+    if baseline.get('settings') != result['settings']:
+        print('note: baseline was recorded with different settings %s' % baseline.get('settings'))
+    for step, row in result['steps'].items():
+        before = baseline['steps'].get(step)
+        if before is None:
+            continue
+        # A couple of milliseconds of jitter is not a regression on a fast step
+        if row['p95_ms'] > before['p95_ms'] * (1 + tolerance) + 2:
+            problems.append('%s p95 %.1f ms, was %.1f ms' % (step, row['p95_ms'], before['p95_ms']))
+    if result['total']['rps'] < baseline['total']['rps'] * (1 - tolerance):
+        problems.append('throughput %.1f req/s, was %.1f req/s' % (result['total']['rps'], baseline['total']['rps']))
+    if result['total']['errors'] > baseline['total']['errors']:
+        problems.append('%d errors, was %d' % (result['total']['errors'], baseline['total']['errors']))
+    return problems
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('guest', 'admin'):
+            raise argparse.ArgumentTypeError('scenarios are guest and admin')
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default=None, help='load this running server instead of seeding and starting one')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'hotel-loadtest.db'))
+    parser.add_argument('--rooms', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--gateway-latency', type=float, default=0.05, help='seconds per fake payment capture')
+    parser.add_argument('--users', type=int, default=32, help='concurrent visitors')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds first')
+    parser.add_argument('--mix', type=parse_mix, default='guest=4,admin=1')
+    parser.add_argument('--save-baseline', default=None, help='write the results as JSON here')
+    parser.add_argument('--baseline', default=None, help='compare against results saved earlier')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        seed(os.path.abspath(args.database), args.rooms, args.bookings, args.seed)
+        server, url = start_server(os.path.abspath(args.database), args.workers, args.threads,
+                                   args.gateway_latency)
+    try:
+        print('%d users for %.0f s against %s' % (args.users, args.duration, url))
+        samples, elapsed = run_load(url, args.users, args.duration, args.warmup, args.mix, args.seed,
+                                    args.bookings)
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    result = summarize(samples, elapsed)
+    result['settings'] = {
+        'rooms': args.rooms, 'bookings': args.bookings, 'seed': args.seed, 'users': args.users,
+        'mix': args.mix, 'workers': None if args.url else args.workers, 'threads': None if args.url else args.threads,
+    }
+    report(result)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(result, json.load(f), args.tolerance)
+        for problem in problems:
+            print('REGRESSION: %s' % problem)
+        if problems:
+            return 1
+        print('OK: within %.0f%% of the baseline' % (args.tolerance * 100))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# Hammer one room type from many threads and check nothing is oversold.
+#
+#   python benchmarks/oversell_stress.py --threads 32 --requests 200 --units 5
+#
+# Every request asks for the same nights, so at most --units bookings may
+# succeed. A share of the requests reuse an idempotency key to simulate client
+# retries, which must not create extra bookings either. Exits non-zero on failure.
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--units', type=int, default=5)
+    args = parser.parse_args()
+
+    from hotel import create_app
+    from hotel.extensions import db
+    from hotel.migrations import upgrade
+    from hotel.models import Booking, Room
+    from hotel.services import reservations
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stress.db')})
+    with app.app_context():
+        upgrade(db.engine)
+        room = Room(name='Standard', room_type='standard', max_guests=2, min_guests=1, max_adults=2,
+                    max_children=0, total_of_this_type=args.units, room_description='stress')
+        db.session.add(room)
+        db.session.commit()
+        room_id = room.id
+
+    local = threading.local()
+
+    def attempt(n):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        form = {
+            'customer_name': 'guest %d' % n,
+            'email': 'guest%d@example.com' % n,
+            'phone': '555%04d' % n,
+            'checkin_date': '2030-01-10',
+            'checkout_date': '2030-01-13',
+            'payment_method': 'card',
+            'idempotency_key': 'retry-%d' % (n // 4),  # every key is submitted four times
+        }
+        response = local.client.post('/process-booking/%d' % room_id, data=form)
+        return '/payment/' in (response.location or '')
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        accepted = sum(pool.map(attempt, range(args.requests)))
+
+    with app.app_context():
+        booked = reservations().booked_units('standard', date(2030, 1, 10), date(2030, 1, 13))
+        rows = Booking.query.count()
+
+    print('requests=%d accepted=%d bookings=%d units=%d' % (args.requests, accepted, rows, args.units))
+    if booked > args.units or rows > args.units:
+        print('FAIL: room type oversold')
+        return 1
+    if rows != min(args.units, args.requests // 4 + (args.requests % 4 > 0)):
+        print('FAIL: expected every unit to sell exactly once')
+        return 1
+    print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# Measure payment capture throughput through the background job queue, offline.
+#
+#   python benchmarks/payment_throughput.py --payments 200 --latency 0.2 --threads 1,4,16
+#   python benchmarks/payment_throughput.py --failure-rate 0.2   # exercise retries
+#
+# Every setup gets a fresh database with --payments pending bookings. Each one
+# is paid through POST /payment/<id> (the time the guest waits is the request
+# latency below), then the job threads capture them against the fake gateway
+# and the run ends when every booking is paid or its job has given up.
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hotel import create_app  # noqa: E402
+from hotel.extensions import db  # noqa: E402
+from hotel.migrations import upgrade  # noqa: E402
+from hotel.models import Booking, Job, Room  # noqa: E402
+
+
+def run(threads, args):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'payments.db'),
+        'JOB_WORKERS': threads,
+        'JOB_RETRY_BACKOFF': 0.05,
+        'FAKE_GATEWAY_LATENCY': args.latency,
+        'FAKE_GATEWAY_FAILURE_RATE': args.failure_rate,
+    })
+    with app.app_context():
+        upgrade(db.engine)
+        room = Room(room_type='standard', price=100, total_of_this_type=args.payments)
+        db.session.add(room)
+        db.session.flush()
+        db.session.add_all(Booking(customer_name='guest %d' % n, room_id=room.id, room_type='standard',
+                                   checkin_date=date(2031, 5, 1), checkout_date=date(2031, 5, 3))
+                           for n in range(args.payments))
+        db.session.commit()
+        booking_ids = [booking_id for (booking_id,) in db.session.query(Booking.id)]
+
+    client = app.test_client()
+    request_times = []
+    start = time.perf_counter()
+    for booking_id in booking_ids:
+        sent = time.perf_counter()
+        response = client.post('/payment/%d' % booking_id, data={'payment_method': 'card'})
+        request_times.append(time.perf_counter() - sent)
+        assert response.status_code == 302, response.status_code
+
+    with app.app_context():
+        while True:
+            open_jobs = Job.query.filter(Job.status.in_(('queued', 'running'))).count()
+            db.session.commit()
+            if not open_jobs:
+                break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        paid = Booking.query.filter_by(payment_status='paid').count()
+        attempts = db.session.query(db.func.sum(Job.attempts)).scalar()
+    app.extensions['job_runner'].stop(timeout=5)
+
+    print('%3d threads  %5d paid  %5d attempts  %7.1f payments/s  request p50 %6.1f ms  max %6.1f ms' % (
+        threads, paid, attempts, paid / elapsed,
+        statistics.median(request_times) * 1000, max(request_times) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--payments', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake gateway seconds per capture')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of captures that fail and are retried')
+    parser.add_argument('--threads', default='1,4,16', help='comma separated job thread counts to compare')
+    args = parser.parse_args()
+
+    print('%d payments, %.0f ms gateway latency; capturing inline would block each request for that long'
+          % (args.payments, args.latency * 1000))
+    for threads in [int(value) for value in args.threads.split(',')]:
+        run(threads, args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
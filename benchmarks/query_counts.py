@@ -0,0 +1,74 @@
+# Check that the booking listing pages run a constant number of SQL statements.
+#
+#   python benchmarks/query_counts.py
+#
+# Seeds the app with a few bookings, counts the statements each
+# listing page runs, then seeds many more and counts again. The app runs with
+# TESTING on, so a page over its @query_budget raises QueryBudgetExceeded.
+import os
+import sys
+import tempfile
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hotel import create_app  # noqa: E402
+from hotel.extensions import db  # noqa: E402
+from hotel.guests import bookings_token  # noqa: E402
+from hotel.migrations import upgrade  # noqa: E402
+from hotel.models import Booking, Room  # noqa: E402
+from hotel.query_budget import count_queries  # noqa: E402
+
+PAGES = ['/admin_dash', '/admin_dash?sort=checkin&order=desc']
+
+
+def seed(start, count):
+    rooms = [Room(photo='room.jpg', price=100 + n, room_type='type %d' % (n % 5)) for n in range(start, start + 5)]
+    db.session.add_all(rooms)
+    db.session.flush()
+    for n in range(start, start + count):
+        db.session.add(Booking(guest_name='guest %d' % n, guest_email='guest%d@example.com' % (n % 10),
+                               guest_phone='555%04d' % n, room=rooms[n % 5], room_type=rooms[n % 5].room_type,
+                               price=100, check_in=date(2030, 1, n % 27 + 1), check_out=date(2030, 2, n % 27 + 1)))
+    db.session.commit()
+
+
+def measure(client, pages):
+    counts = {}
+    for page in pages:
+        # Counted around the whole body: streamed pages run their template after the response starts
+        with count_queries() as counter:
+            response = client.get(page)
+            response.get_data()
+        assert response.status_code == 200, (page, response.status_code)
+        counts[page] = counter.count
+    return counts
+
+
+def main():
+    app = create_app({'TESTING': True,
+                      'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'queries.db')})
+    client = app.test_client()
+    with app.test_request_context():
+        # A returning guest's "my bookings" page, which lists one guest's growing history
+        pages = PAGES + ['/guest/bookings/' + bookings_token(('email', 'guest0@example.com'))]
+    with app.app_context():
+        upgrade(db.engine)
+        seed(0, 10)
+    small = measure(client, pages)
+    with app.app_context():
+        seed(10, 2000)
+    large = measure(client, pages)
+
+    for page in pages:
+        print('%-40s %3d statements at 10 bookings, %3d at 2010' % (page, small[page], large[page]))
+    if small != large:
+        print('FAIL: statement count grows with the number of bookings')
+        return 1
+    print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# Measure stay quoting speed: rule evaluation per night vs the price calendar.
+#
+#   python benchmarks/quote_throughput.py --quotes 20000 [--min-per-sec 5000]
+#
+# Seeds rate plans with seasonal, weekend and length-of-stay rules, quotes the
+# same random stays (1-14 nights over the next year) both ways, checks that
+# the totals agree, and then times the /quote endpoint.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hotel import create_app  # noqa: E402
+from hotel.catalog import RATES, bump_version  # noqa: E402
+from hotel.extensions import db  # noqa: E402
+from hotel.migrations import upgrade  # noqa: E402
+from hotel.models import RatePlan, RateRule, Room  # noqa: E402
+from hotel.pricing import load_plans, pricing, quote_by_rules  # noqa: E402
+
+ROOM_TYPES = ['standard', 'deluxe', 'suite', 'family']
+
+
+def seed():
+    today = date.today()
+    for n, room_type in enumerate(ROOM_TYPES):
+        db.session.add(Room(room_type=room_type, price=100 + 50 * n))
+        plan = RatePlan(room_type=room_type, name=room_type + ' BAR', base_rate=100 + 50 * n)
+        plan.rules = [RateRule(name='weekend', weekdays='45', percent=20)]
+        for month in range(12):
+            start = today.replace(day=1) + timedelta(days=31 * month)
+            plan.rules.append(RateRule(name='season %d' % month, start_date=start,
+                                       end_date=start + timedelta(days=20), percent=random.choice([-15, 10, 25])))
+        plan.rules += [RateRule(name='week', min_nights=7, percent=-10),
+                       RateRule(name='fortnight', min_nights=14, percent=-20)]
+        db.session.add(plan)
+    bump_version(RATES)
+    db.session.commit()
+
+
+def stays(count):
+    rng = random.Random(1)
+    today = date.today()
+    for _ in range(count):
+        checkin = today + timedelta(days=rng.randint(0, 365))
+        yield rng.choice(ROOM_TYPES), checkin, checkin + timedelta(days=rng.randint(1, 14))
+
+
+def rate(label, count, elapsed):
+    print('%-22s %8.0f quotes/s' % (label, count / elapsed))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quotes', type=int, default=20000)
+    parser.add_argument('--min-per-sec', type=float, default=None,
+                        help='Exit non-zero when calendar quoting is slower than this.')
+    args = parser.parse_args()
+
+    app = create_app({'TESTING': True, 'JOB_WORKERS': 0, 'HOLD_SWEEP_IN_PROCESS': False,
+                      'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'quotes.db')})
+    sample = list(stays(args.quotes))
+    with app.test_request_context():
+        upgrade(db.engine)
+        seed()
+        plans = load_plans()
+
+        start = time.perf_counter()
+        expected = [quote_by_rules(plans[room_type], room_type, checkin, checkout).total
+                    for room_type, checkin, checkout in sample]
+        rate('rules per night', len(sample), time.perf_counter() - start)
+
+        engine = pricing()
+        engine.quote(ROOM_TYPES[0], date.today(), date.today() + timedelta(days=1))  # load plans
+        start = time.perf_counter()
+        for room_type in ROOM_TYPES:  # calendar builds count against the calendar
+            engine.quote(room_type, date.today(), date.today() + timedelta(days=1))
+        got = [engine.quote(room_type, checkin, checkout).total for room_type, checkin, checkout in sample]
+        per_sec = rate('price calendar', len(sample), time.perf_counter() - start)
+
+    mismatches = sum(1 for a, b in zip(expected, got) if abs(a - b) > 0.01)
+    client = app.test_client()
+    requests = sample[:min(len(sample), 2000)]
+    start = time.perf_counter()
+    for room_type, checkin, checkout in requests:
+        response = client.get('/quote', query_string={'room_type': room_type, 'checkin_date': checkin.isoformat(),
+                                                      'checkout_date': checkout.isoformat()})
+        assert response.status_code == 200, response.status_code
+    rate('GET /quote', len(requests), time.perf_counter() - start)
+
+    if mismatches:
+        print('FAIL: %d quotes differ between the calendar and the rules' % mismatches)
+        return 1
+    if args.min_per_sec is not None and per_sec < args.min_per_sec:
+        print('FAIL: calendar quoting below %.0f quotes/s' % args.min_per_sec)
+        return 1
+    print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# Measure template compile, load and render times, and what streaming does to a big listing page.
+#
+#   python benchmarks/template_render.py
+#   python benchmarks/template_render.py --repeat 200 --rows 100,10000,50000
+#
+# Per template: loading it the way a cold worker does, first compiling it
+# from source, then from the bytecode cache `flask templates compile` fills, and
+# rendering it with --sample-rows of sample data (median of --repeat runs).
+# Templates that fail to compile or render are reported as such.
+#
+# Then the admin dashboard with each --rows count of rooms and bookings,
+# rendered whole by render_template() and streamed by stream_page(): time to
+# the first chunk, total time and the peak memory the render allocated.
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import render_template  # noqa: E402
+from jinja2 import TemplateError  # noqa: E402
+
+from hotel import analytics, create_app  # noqa: E402
+from hotel.models import Booking, Room  # noqa: E402
+from hotel.templating import EXTENSIONS, TemplateCache, stream_page  # noqa: E402
+
+
+# A page of bookings the way paginate_from_args() returns one
+class Page(list):
+    has_next = False
+    next_cursor = None
+
+
+def sample_context(app, count):
+    rooms = [Room(id=n, room_number=str(n), room_type='type %d' % (n % 5), price=100 + n % 50, total_of_this_type=2,
+                  room_image='room.jpg', room_description='A quiet room with a view of the sea.')
+             for n in range(1, count + 1)]
+    checkin = date(2031, 1, 1)
+    bookings = Page(Booking(id=n, customer_name='guest %d' % n, email='guest%d@example.com' % n, phone='555%04d' % n,
+                            room=rooms[n % count], room_type=rooms[n % count].room_type, price=200,
+                            checkin_date=checkin + timedelta(days=n % 60),
+                            checkout_date=checkin + timedelta(days=n % 60 + 2), status='pending',
+                            payment_status='pending', reference='ABC%06d' % n)
+                    for n in range(1, count + 1))
+    rows = [analytics._row(checkin + timedelta(days=n // 5), 'type %d' % (n % 5), 2, n % 3, 100.0 * (n % 3))
+            for n in range(count)]
+    return {'rooms': rooms, 'room': rooms[0], 'bookings': bookings, 'booking': bookings[0], 'filters': {},
+            'hotel_info': app.config['HOTEL_INFO'], 'checkin_date': checkin, 'checkout_date': checkin + timedelta(2),
+            'start': checkin, 'end': checkin + timedelta(30), 'rows': rows, 'totals': analytics.summarize(rows),
+            'room_type': '', 'kinds': ['bookings', 'rates', 'rooms'], 'report': None,
+            'idempotency_key': 'k' * 32, 'reference': ''}
+
+
+def median_ms(run, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def template_table(app, context, repeat):
+    environment = app.jinja_env
+    original = environment.bytecode_cache
+    cache = TemplateCache(tempfile.mkdtemp())
+
+    def load(bytecode_cache):
+        environment.bytecode_cache = bytecode_cache
+        environment.cache.clear()
+        return environment.get_template(name)
+
+    print('%-30s %11s %11s %11s %9s' % ('template', 'compile ms', 'cached ms', 'render ms', 'bytes'))
+    for name in sorted(environment.list_templates(extensions=EXTENSIONS)):
+        try:
+            load(cache)  # fills the bytecode cache
+            compiled = median_ms(lambda: load(None), repeat)
+            cached = median_ms(lambda: load(cache), repeat)
+        except TemplateError as error:
+            print('%-30s does not compile: %s' % (name, error))
+            continue
+        try:
+            html = render_template(name, **context)
+            rendered = median_ms(lambda: render_template(name, **context), repeat)
+        except Exception as error:  # a page that needs something the sample doesn't have
+            print('%-30s %11.2f %11.2f   not rendered: %s: %s' % (name, compiled, cached, type(error).__name__, error))
+            continue
+        print('%-30s %11.2f %11.2f %11.2f %9d' % (name, compiled, cached, rendered, len(html.encode())))
+    environment.bytecode_cache = original
+    environment.cache.clear()
+
+
+# (ms to the first chunk, ms in total, peak KiB allocated while rendering)
+def measure_page(render, context):
+    def timed():
+        start = time.perf_counter()
+        chunks = iter(render(context))
+        next(chunks)
+        first = time.perf_counter()
+        for _ in chunks:
+            pass
+        return (first - start) * 1000, (time.perf_counter() - start) * 1000
+
+    timed()  # warm up
+    first, total = timed()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        for _ in render(context):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return first, total, peak / 1024
+
+
+def buffered(context):
+    return [render_template('admin_dashboard.html', **context)]
+
+
+def streamed(context):
+    return stream_page('admin_dashboard.html', **context).response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--sample-rows', type=int, default=50, help='rooms, bookings and report rows per template')
+    parser.add_argument('--rows', default='100,1000,10000', help='comma separated dashboard sizes')
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'render.db'),
+                      'JOB_WORKERS': 0, 'HOLD_SWEEP_IN_PROCESS': False})
+    with app.test_request_context('/admin_dash'):
+        template_table(app, sample_context(app, args.sample_rows), args.repeat)
+        print()
+        print('%-24s %8s %14s %10s %11s' % ('admin_dashboard.html', 'rows', 'first byte ms', 'total ms', 'peak KiB'))
+        for count in [int(level) for level in args.rows.split(',')]:
+            context = sample_context(app, count)
+            for label, render in (('render_template', buffered), ('stream_page', streamed)):
+                first, total, peak = measure_page(render, context)
+                print('%-24s %8d %14.1f %10.1f %11.0f' % (label, count, first, total, peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+from hotel.asgi import to_asgi
+from hotel.properties import create_group_app
+
+# Every property in HOTEL_PROPERTIES behind one server, each under /<code> (see hotel/properties.py):
+#   flask --app group properties upgrade
+#   gunicorn group:app  or  uvicorn group:asgi_app
+app = create_group_app()
+asgi_app = to_asgi(app)
@@ -0,0 +1,57 @@
+from flask import Flask
+
+from hotel.config import Config
+
+
+# Build a configured app. `config` is a config class/object or a dict of
+# overrides on top of Config. Nothing here connects to the database: the schema
+# is managed with `flask db upgrade` and the availability indexes load on first use.
+def create_app(config=None):
+    app = Flask(__name__, template_folder='../templates', static_folder='../static')
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    from hotel.assets import init_assets
+    from hotel.catalog import init_catalog
+    from hotel.engine import init_engine_options, init_engines
+    from hotel.holds import init_holds
+    from hotel.jobs import init_jobs
+    from hotel.journal import init_journal
+    from hotel.metrics import init_metrics
+    from hotel.extensions import db
+    from hotel.page_cache import init_page_cache
+    from hotel.payments import init_payments
+    from hotel.pricing import init_pricing
+    from hotel.profiler import init_profiler
+    from hotel.query_budget import init_query_budget
+    from hotel.services import init_services
+    from hotel.templating import init_templates
+    from hotel.cli import init_cli
+    from hotel import admin, api, customer, public
+
+    init_engine_options(app)
+    db.init_app(app)
+    init_engines(app, db)
+    init_metrics(app)  # first, so its timing wraps every other request hook
+    init_profiler(app)
+    init_query_budget(app)
+    init_assets(app)
+    init_templates(app)
+    init_page_cache(app)
+    init_services(app)
+    init_journal(app)
+    init_catalog(app)
+    init_pricing(app)
+    init_jobs(app)
+    init_payments(app)
+    init_holds(app)
+    init_cli(app)
+
+    app.register_blueprint(public.bp)
+    app.register_blueprint(customer.bp)
+    app.register_blueprint(admin.bp)
+    app.register_blueprint(api.bp)
+    return app
@@ -0,0 +1,293 @@
+import csv
+import functools
+import io
+from datetime import date, timedelta
+
+from flask import Blueprint, Response, current_app, jsonify, render_template, request, redirect, session, \
+    stream_with_context, url_for, abort
+
+from hotel import analytics, bulk
+from hotel.api import has_admin_token
+from hotel.availability import parse_date, type_capacities
+
+from hotel.catalog import ROOMS, all_rooms, bump_version, catalog
+from hotel.extensions import db
+from hotel.holds import hold_sweeper
+from hotel.models import Booking, Room, normalize_email
+from hotel.pagination import apply_filters, paginate_from_args
+from hotel.query_budget import query_budget
+from hotel.reservations import SoldOut
+from hotel.services import availability, record_booking, record_status, reservations, room_availability, \
+    sync_booking
+from hotel.templating import stream_page
+
+bp = Blueprint('admin', __name__)
+
+
+# Views that read or write rows in bulk, guest contact details included: for a signed-in admin, or
+# a script sending the JSON API's admin token
+def admin_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('admin') or has_admin_token():
+            return view(*args, **kwargs)
+        if 'Authorization' in request.headers:
+            abort(401)
+        return redirect(url_for('admin.admin_login'))
+    return wrapper
+
+
+# Admin Routes
+@bp.route('/admin', methods=['GET', 'POST'])
+def admin_login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        if username == 'admin' and password == 'admin':
+            session['admin'] = True
+            return redirect(url_for('admin.admin_dashboard'))
+    return render_template('admin_login.html')
+
+
+@bp.route('/logout')
+def logout():
+    # Here, you can clear the session or any other authentication details.
+    session.clear()  # Clear the session (if you're using session-based login)
+
+    # Redirect to the home page
+    return redirect(url_for('public.index'))
+
+
+@bp.route('/admin_dash')
+@bp.route('/admin/dashboard')
+@query_budget(3)  # the page of bookings, plus the room catalog's version check and (when stale) reload
+def admin_dashboard():
+    rooms = all_rooms()  # the shared room catalog, reloaded only when a room changes
+    filters = {key: value for key, value in request.args.items() if key != 'after'}
+    try:
+        # The join feeds booking.room in the template without a query per row
+        query = apply_filters(Booking.query.outerjoin(Booking.room).options(db.contains_eager(Booking.room)),
+                              request.args, {
+            'status': Booking.status,
+            'room_type': Booking.room_type,
+            'checkin': Booking.checkin_date,
+            'checkout': Booking.checkout_date,
+            'guest': [Booking.customer_name, (Booking.email, normalize_email)],
+        })
+        bookings = paginate_from_args(query, request.args, {
+            'checkin': Booking.checkin_date,
+            'checkout': Booking.checkout_date,
+            'name': Booking.customer_name,
+            'id': Booking.id,
+        }, Booking.id, default_sort='id', per_page=current_app.config['ADMIN_PAGE_SIZE'], default_order='desc')
+    except ValueError:
+        abort(400)
+    return stream_page('admin_dashboard.html', rooms=rooms, bookings=bookings, filters=filters)
+
+
+@bp.route("/create_rooms")
+def create_rooms():
+    return render_template("create_rooms.html")
+
+
+# Add Room Route (Admin)
+@bp.route('/admin/add-room', methods=['GET', 'POST'])
+@bp.route('/admin/add_room', methods=['GET', 'POST'])
+def add_room():
+    if request.method == 'POST':
+        room = Room(
+            id=request.form.get('id') or None,
+            room_number=request.form.get('room_number') or None,
+            room_type=request.form['room_type'],
+            price=float(request.form['price']),
+            photo=request.form.get('photo'),
+            total_of_this_type=int(request.form.get('total_of_this_type') or 1),
+        )
+        db.session.add(room)
+        bump_version(ROOMS)
+        db.session.commit()
+        return redirect(url_for('admin.admin_dashboard'))
+    return render_template('add_room.html')
+
+
+# Delete Room Route (Admin)
+@bp.route('/admin/delete-room/<int:room_id>', methods=['GET', 'POST'])
+@bp.route('/admin/delete_room/<int:room_id>', methods=['GET', 'POST'])
+def delete_room(room_id):
+    room = Room.query.get_or_404(room_id)
+    db.session.delete(room)
+    bump_version(ROOMS)
+    db.session.commit()
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+# Bulk upload of rooms, bookings or rates as CSV or JSON Lines; the file is read as a stream, chunk by chunk
+@bp.route('/admin/import', methods=['GET', 'POST'])
+@admin_required
+def bulk_import():
+    report = None
+    if request.method == 'POST':
+        kind = request.form.get('kind')
+        upload = request.files.get('file')
+        if kind not in bulk.KINDS or upload is None:
+            abort(400)
+        fmt = request.form.get('format') or ('json' if upload.filename.endswith(('.json', '.jsonl')) else 'csv')
+        if fmt not in bulk.FORMATS:
+            abort(400)
+        report = bulk.import_rows(kind, io.TextIOWrapper(upload.stream, encoding='utf-8', newline=''), fmt)
+        if kind == 'bookings':
+            availability().invalidate()
+            room_availability().invalidate()
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(report.as_dict())
+    return render_template('admin_import.html', report=report, kinds=sorted(bulk.KINDS))
+
+
+# Streamed export: /admin/export/bookings?format=json
+@bp.route('/admin/export/<kind>')
+@admin_required
+def bulk_export(kind):
+    fmt = request.args.get('format', 'csv')
+    if kind not in bulk.KINDS or fmt not in bulk.FORMATS:
+        abort(404)
+    filename = f'{kind}.' + ('csv' if fmt == 'csv' else 'jsonl')
+    return Response(stream_with_context(bulk.export_rows(kind, fmt)),
+                    mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+# Report range and rows from ?from=&to=&room_type=; defaults to the current month
+def _report_from_args():
+    today = date.today()
+    try:
+        start = parse_date(request.args.get('from')) or today.replace(day=1)
+        end = parse_date(request.args.get('to')) or (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    except ValueError:
+        abort(400)
+    if end <= start or (end - start).days > 400:
+        abort(400)
+    capacities = type_capacities(all_rooms())
+    rows = analytics.daily_report(db.session, start, end, capacities, request.args.get('room_type') or None)
+    return start, end, rows
+
+
+# Occupancy, ADR and RevPAR per room type, read from the daily rollups
+@bp.route('/admin/reports')
+@query_budget(3)
+def reports():
+    start, end, rows = _report_from_args()
+    return stream_page('admin_reports.html', start=start, end=end, rows=rows,
+                       totals=analytics.summarize(rows), room_type=request.args.get('room_type', ''))
+
+
+@bp.route('/admin/reports.csv')
+@query_budget(3)
+def reports_csv():
+    start, end, rows = _report_from_args()
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(analytics.ReportRow._fields)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(generate(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename=occupancy-{start}-{end}.csv'})
+
+
+# Hold expiry counters of this worker, plus the holds currently open
+@bp.route('/admin/holds')
+def hold_stats():
+    stats = hold_sweeper().stats()
+    stats['open_holds'] = Booking.query.filter_by(status='pending').count()
+    return jsonify(stats)
+
+
+# Hit/miss counters of this worker's room catalog cache
+@bp.route('/admin/cache_stats')
+def cache_stats():
+    return jsonify(catalog().stats())
+
+
+@bp.route('/admin/view_booking/<int:booking_id>', methods=['GET'])
+def view_booking(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+    return render_template('view_booking.html', booking=booking)
+
+
+def _set_status(booking, status):
+    record_status(booking, booking.status, status)
+    booking.status = status
+    booking.hold = False  # staff own it now: the hold sweeper leaves it alone
+
+
+# A cancelled booking taking its nights back goes through the reservation lock and capacity check,
+# since the nights it gave up may have been sold since
+def _reinstate(booking, status):
+    try:
+        booking = reservations().reinstate(booking.id, lambda locked: _set_status(locked, status))
+    except SoldOut:
+        return f'{booking.room_type} has no unit left on some night of this booking', 409
+    sync_booking(booking)
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+@bp.route('/admin/update_booking_status/<int:booking_id>', methods=['GET', 'POST'])
+def update_booking_status(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+    if request.method == 'POST':
+        status = request.form['status']
+        if booking.status == 'cancelled' and status != 'cancelled':
+            return _reinstate(booking, status)
+        # Release the booking's nights in the same transaction as the status change
+        if booking.status != 'cancelled' and status == 'cancelled':
+            record_booking(booking, -1)
+        _set_status(booking, status)
+        db.session.commit()
+        sync_booking(booking)
+        return redirect(url_for('admin.admin_dashboard'))
+    return render_template('update_booking_status.html', booking=booking)
+
+
+# Confirm Booking (Admin)
+@bp.route('/admin/confirm-booking/<int:booking_id>', methods=['GET', 'POST'])
+def confirm_booking(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+    if booking.status == 'cancelled':
+        return _reinstate(booking, 'confirmed')
+    _set_status(booking, 'confirmed')
+    db.session.commit()
+    sync_booking(booking)
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+# Cancel Booking (Admin)
+@bp.route('/admin/cancel-booking/<int:booking_id>', methods=['GET', 'POST'])
+def cancel_booking(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+    if booking.status != 'cancelled':
+        record_booking(booking, -1)
+    record_status(booking, booking.status, 'cancelled')
+    booking.status = 'cancelled'
+    db.session.commit()
+    sync_booking(booking)
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+# Delete Booking Route (Admin)
+@bp.route('/admin/delete-booking/<int:booking_id>', methods=['GET', 'POST'])
+def delete_booking(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+    if booking.status != 'cancelled':
+        record_booking(booking, -1)
+    record_status(booking, booking.status, None)
+    db.session.delete(booking)
+    db.session.commit()
+    sync_booking(booking, deleted=True)
+    return redirect(url_for('admin.admin_dashboard'))
@@ -0,0 +1,117 @@
+from collections import defaultdict, namedtuple
+
+from sqlalchemy import insert
+
+from hotel.availability import nights
+from hotel.inventory import add_by_key
+from hotel.models import Booking, DailyRollup
+
+# Occupancy, ADR and RevPAR per room type per night.
+#
+# Confirmed bookings are rolled up into DailyRollup, one row per room type and
+# night with the rooms sold and the revenue earned that night (the booking's
+# price spread evenly over its nights). Every status change into or out of
+# 'confirmed' applies its delta in the same transaction, so reports read a
+# handful of rollup rows instead of scanning bookings; recompute() rebuilds
+# them from scratch for backfills.
+#
+#   occupancy = rooms sold / rooms available
+#   ADR       = revenue / rooms sold
+#   RevPAR    = revenue / rooms available
+
+COUNTED = 'confirmed'
+
+ReportRow = namedtuple('ReportRow', 'night room_type capacity rooms_sold revenue occupancy adr revpar')
+
+
+def _add_stay(deltas, room_type, checkin, checkout, price, delta):
+    stay = list(nights(checkin, checkout))
+    share = (price or 0.0) / len(stay) if stay else 0.0
+    for night in stay:
+        entry = deltas[room_type, night]
+        entry[0] += delta
+        entry[1] += delta * share
+
+
+# Apply {(room_type, night): [rooms, revenue]} deltas to the rollups as increments, so concurrent
+# confirmations (payment workers, admin actions) don't overwrite each other; the caller commits
+def apply(session, deltas):
+    add_by_key(session, DailyRollup, {key: {'rooms_sold': rooms, 'revenue': round(revenue, 2)}
+                                      for key, (rooms, revenue) in deltas.items()})
+
+
+# Roll a booking in or out when its status moves into or out of 'confirmed' (new_status None: deleted)
+def record_status_change(session, booking, old_status, new_status):
+    delta = (new_status == COUNTED) - (old_status == COUNTED)
+    if delta:
+        deltas = defaultdict(lambda: [0, 0.0])
+        _add_stay(deltas, booking.room_type, booking.checkin_date, booking.checkout_date, booking.price, delta)
+        apply(session, deltas)
+
+
+# Deltas for freshly inserted booking rows (dicts), e.g. from a bulk import
+def deltas_for_rows(rows):
+    deltas = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        if row.get('status') == COUNTED:
+            _add_stay(deltas, row['room_type'], row['checkin_date'], row['checkout_date'], row.get('price'), 1)
+    return deltas
+
+
+# Rebuild the rollups for nights in [start, end) (all nights when not given) from the bookings
+def recompute(session, start=None, end=None):
+    rollups = session.query(DailyRollup)
+    bookings = session.query(Booking.room_type, Booking.checkin_date, Booking.checkout_date, Booking.price) \
+        .filter(Booking.status == COUNTED)
+    if start is not None:
+        rollups = rollups.filter(DailyRollup.night >= start)
+        bookings = bookings.filter(Booking.checkout_date > start)
+    if end is not None:
+        rollups = rollups.filter(DailyRollup.night < end)
+        bookings = bookings.filter(Booking.checkin_date < end)
+    rollups.delete(synchronize_session=False)
+
+    deltas = defaultdict(lambda: [0, 0.0])
+    for room_type, checkin, checkout, price in bookings.yield_per(1000):
+        _add_stay(deltas, room_type, checkin, checkout, price, 1)
+    rows = [{'room_type': room_type, 'night': night, 'rooms_sold': rooms, 'revenue': round(revenue, 2)}
+            for (room_type, night), (rooms, revenue) in deltas.items()
+            if (start is None or night >= start) and (end is None or night < end)]
+    if rows:
+        session.execute(insert(DailyRollup), rows)
+    session.commit()
+    return len(rows)
+
+
+def _row(night, room_type, capacity, rooms_sold, revenue):
+    return ReportRow(night, room_type, capacity, rooms_sold, round(revenue, 2),
+                     round(rooms_sold / capacity, 4) if capacity else None,
+                     round(revenue / rooms_sold, 2) if rooms_sold else None,
+                     round(revenue / capacity, 2) if capacity else None)
+
+
+# One ReportRow per night in [start, end) and room type, read from the rollups only.
+# `capacities` maps room types to the units they have on sale each night.
+def daily_report(session, start, end, capacities, room_type=None):
+    query = session.query(DailyRollup.room_type, DailyRollup.night, DailyRollup.rooms_sold, DailyRollup.revenue) \
+        .filter(DailyRollup.night >= start, DailyRollup.night < end)
+    if room_type:
+        query = query.filter(DailyRollup.room_type == room_type)
+    sold = {(row_type, night): (rooms, revenue) for row_type, night, rooms, revenue in query}
+    room_types = sorted(set(capacities) | {row_type for row_type, _ in sold})
+    if room_type:
+        room_types = [room_type]
+    return [_row(night, row_type, capacities.get(row_type, 0), *sold.get((row_type, night), (0, 0.0)))
+            for night in nights(start, end) for row_type in room_types]
+
+
+# The same figures summed over the whole range, per room type
+def summarize(rows):
+    totals = defaultdict(lambda: [0, 0, 0.0])
+    for row in rows:
+        entry = totals[row.room_type]
+        entry[0] += row.capacity
+        entry[1] += row.rooms_sold
+        entry[2] += row.revenue
+    return [_row(None, room_type, capacity, rooms, revenue)
+            for room_type, (capacity, rooms, revenue) in sorted(totals.items())]
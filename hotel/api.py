@@ -0,0 +1,295 @@
+import gzip
+import hashlib
+import hmac
+import json
+
+from flask import Blueprint, Response, current_app, request, url_for
+from werkzeug.exceptions import HTTPException
+
+from hotel.availability import parse_date, parse_stay, type_capacities
+from hotel.catalog import all_rooms
+from hotel.extensions import db
+from hotel.guests import find_booking
+from hotel.models import Booking, normalize_email
+from hotel.pagination import apply_filters, decode_cursor, encode_cursor, paginate_from_args
+from hotel.pricing import quote_room
+from hotel.query_budget import query_budget
+from hotel.reservations import SoldOut
+from hotel.schema import BOOKING, ROOM
+from hotel.services import availability, record_booking, record_status, reservations, sync_booking
+
+# Versioned JSON API for the channel manager and the mobile app.
+#
+# Lists use the same keyset cursors as the admin dashboard (?after=, ?per_page=)
+# and every endpoint takes ?fields=a,b to trim the payload. GET responses
+# carry a weak ETag of the body and answer If-None-Match with 304; bodies over
+# API_GZIP_MIN_SIZE are gzipped for clients that accept it. Errors come back
+# as {"error": "..."} with the HTTP status.
+#
+# Guests reach their own booking by its reference plus the email or phone it
+# was made with, sent in an X-Booking-Contact header (kept out of URLs and
+# logs), the same check as the /guest lookup. Bookings by id are admin only.
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _json(data, status=200, headers=None):
+    body = json.dumps(data, separators=(',', ':'))
+    return Response(body, status=status, headers=headers, mimetype='application/json')
+
+
+def _error(status, message):
+    return _json({'error': message}, status)
+
+
+class _ApiError(HTTPException):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.code = status
+
+
+def _abort(status, message):
+    raise _ApiError(status, message)
+
+
+def _fields(schema):
+    try:
+        return schema.select(request.args.get('fields'))
+    except ValueError as error:
+        _abort(400, str(error))
+
+
+@bp.errorhandler(HTTPException)
+def handle_error(error):
+    return _error(error.code, error.description)
+
+
+# Unknown URLs and methods under /api/ never reach the blueprint's own handler
+@bp.app_errorhandler(404)
+@bp.app_errorhandler(405)
+def handle_routing_error(error):
+    if request.path.startswith(bp.url_prefix + '/'):
+        return _error(error.code, error.description)
+    return error
+
+
+# Whether the request carries 'Authorization: Bearer <API_ADMIN_TOKEN>'; never while no token is set
+def has_admin_token():
+    token = current_app.config['API_ADMIN_TOKEN']
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                               f'Bearer {token}'.encode())
+
+
+# /api/v1/admin/* needs the bearer token, and is off altogether until one is configured
+@bp.before_request
+def check_admin_token():
+    if not request.path.startswith('/api/v1/admin/'):
+        return None
+    if not current_app.config['API_ADMIN_TOKEN']:
+        return _error(403, 'the admin API is disabled: set API_ADMIN_TOKEN')
+    if not has_admin_token():
+        return _error(401, 'admin token required')
+
+
+@bp.after_request
+def finish_response(response):
+    if request.method == 'GET' and response.status_code == 200 and not response.direct_passthrough:
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest()[:20], weak=True)
+        response = response.make_conditional(request)
+    if (response.status_code == 200 and 'gzip' in request.headers.get('Accept-Encoding', '')
+            and response.content_length and response.content_length >= current_app.config['API_GZIP_MIN_SIZE']):
+        response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _page_of_rows(rows, per_page_default=50):
+    after = request.args.get('after')
+    if after:
+        try:
+            _, last_id = decode_cursor(after)
+        except ValueError as error:
+            _abort(400, str(error))
+        rows = [row for row in rows if row.id > last_id]
+    try:
+        per_page = max(1, min(int(request.args.get('per_page', per_page_default)), 200))
+    except ValueError:
+        _abort(400, 'per_page must be a number')
+    items = rows[:per_page]
+    next_cursor = encode_cursor(items[-1].id, items[-1].id) if len(rows) > per_page else None
+    return items, next_cursor
+
+
+# Rooms by id, from the room catalog cache
+@bp.route('/rooms')
+@query_budget(2)
+def rooms():
+    names = _fields(ROOM)
+    rows = list(all_rooms())
+    if request.args.get('room_type'):
+        rows = [row for row in rows if row.room_type == request.args['room_type']]
+    items, next_cursor = _page_of_rows(rows)
+    return _json({'data': ROOM.dump_many(items, names), 'next': next_cursor})
+
+
+# Room types with free units for the stay, each with a quote; needs only an app context
+def search_room_types(checkin_date, checkout_date, guests=None, room_type=None):
+    rooms = all_rooms()
+    capacities = type_capacities(rooms)  # every room of the type, as booking counts them
+    cheapest = {}
+    for room in rooms:
+        if guests and room.max_guests < guests:
+            continue
+        current = cheapest.get(room.room_type)
+        if current is None or (room.price or 0) < (current.price or 0):
+            cheapest[room.room_type] = room
+    if room_type:
+        cheapest = {key: room for key, room in cheapest.items() if key == room_type}
+
+    free = availability().search({key: capacities[key] for key in cheapest}, checkin_date, checkout_date)
+    results = []
+    for key, room in sorted(cheapest.items()):
+        if not free[key]:
+            continue
+        stay_quote = quote_room(room, checkin_date, checkout_date)
+        results.append({
+            'room_type': key,
+            'available_units': free[key],
+            'room_id': room.id,
+            'total': stay_quote.total if stay_quote else None,
+            'nightly': stay_quote.nightly if stay_quote else None,
+        })
+    return results
+
+
+# Room types with free units for ?checkin_date=&checkout_date=, each with a quote for the stay
+@bp.route('/availability')
+@query_budget(4)
+def search_availability():
+    try:
+        checkin_date, checkout_date = parse_stay(request.args)
+    except ValueError as error:
+        _abort(400, str(error))
+    if checkin_date is None:
+        _abort(400, 'checkin_date and checkout_date are required')
+    results = search_room_types(checkin_date, checkout_date, request.args.get('guests', type=int),
+                                request.args.get('room_type'))
+    return _json({'checkin_date': checkin_date.isoformat(), 'checkout_date': checkout_date.isoformat(),
+                  'data': results})
+
+
+# Create a booking: {"room_id", "checkin_date", "checkout_date", "customer_name", "email", "phone"}.
+# An Idempotency-Key header makes retries return the booking the first attempt created.
+@bp.route('/bookings', methods=['POST'])
+def create_booking():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        _abort(400, 'expected a JSON object')
+    try:
+        room_id = int(data['room_id'])
+        checkin_date, checkout_date = parse_date(data['checkin_date']), parse_date(data['checkout_date'])
+        customer_name = str(data['customer_name']).strip()
+    except KeyError as error:
+        _abort(400, f'{error.args[0]} is required')
+    except (TypeError, ValueError) as error:
+        _abort(400, str(error))
+    if not customer_name or not checkin_date or not checkout_date or checkout_date <= checkin_date:
+        _abort(400, 'customer_name and a checkout_date after checkin_date are required')
+    room = next((row for row in all_rooms() if row.id == room_id), None)
+    if room is None:
+        _abort(404, f'no room {room_id}')
+
+    stay_quote = quote_room(room, checkin_date, checkout_date)
+    try:
+        booking = reservations().book(room.id, checkin_date, checkout_date,
+                                      idempotency_key=request.headers.get('Idempotency-Key'),
+                                      customer_name=customer_name, email=data.get('email'),
+                                      phone=data.get('phone'), payment_method=data.get('payment_method'),
+                                      price=stay_quote.total if stay_quote else None)
+    except SoldOut:
+        _abort(409, 'sold out for these dates')
+    sync_booking(booking)
+    # The reference is for the guest's own lookup (/guest), so only its creator is shown it
+    return _json({'data': dict(BOOKING.serializer()(booking), reference=booking.reference)}, 201,
+                 {'Location': url_for('api.get_booking', reference=booking.reference)})
+
+
+# The guest's booking `reference`, if the X-Booking-Contact header matches its email or phone
+def _guest_booking(reference):
+    contact = request.headers.get('X-Booking-Contact')
+    if not contact:
+        _abort(401, 'X-Booking-Contact with the booking email or phone is required')
+    booking = find_booking(reference, contact)
+    if booking is None:
+        _abort(404, 'no booking with that reference and contact')
+    return booking
+
+
+def _admin_booking(booking_id):
+    booking = db.session.get(Booking, booking_id)
+    if booking is None:
+        _abort(404, f'no booking {booking_id}')
+    return booking
+
+
+def _cancel(booking):
+    if booking.status != 'cancelled':
+        record_booking(booking, -1)
+        record_status(booking, booking.status, 'cancelled')
+        booking.status = 'cancelled'
+        db.session.commit()
+        sync_booking(booking)
+    return _json({'data': BOOKING.serializer()(booking)})
+
+
+@bp.route('/bookings/<reference>')
+@query_budget(1)
+def get_booking(reference):
+    names = _fields(BOOKING)
+    response = _json({'data': BOOKING.serializer(names)(_guest_booking(reference))})
+    response.vary.add('X-Booking-Contact')
+    response.cache_control.private = True
+    return response
+
+
+@bp.route('/bookings/<reference>/cancel', methods=['POST'])
+def cancel_booking(reference):
+    return _cancel(_guest_booking(reference))
+
+
+@bp.route('/admin/bookings/<int:booking_id>')
+@query_budget(1)
+def admin_get_booking(booking_id):
+    names = _fields(BOOKING)
+    return _json({'data': BOOKING.serializer(names)(_admin_booking(booking_id))})
+
+
+@bp.route('/admin/bookings/<int:booking_id>/cancel', methods=['POST'])
+def admin_cancel_booking(booking_id):
+    return _cancel(_admin_booking(booking_id))
+
+
+# Admin listing with the dashboard's filters and sorts:
+# ?status=&room_type=&from=&to=&guest=&sort=checkin|checkout|name|id&order=desc&after=&per_page=
+@bp.route('/admin/bookings')
+@query_budget(1)
+def admin_bookings():
+    names = _fields(BOOKING)
+    try:
+        query = apply_filters(Booking.query, request.args, {
+            'status': Booking.status,
+            'room_type': Booking.room_type,
+            'checkin': Booking.checkin_date,
+            'checkout': Booking.checkout_date,
+            'guest': [Booking.customer_name, (Booking.email, normalize_email)],
+        })
+        page = paginate_from_args(query, request.args, {
+            'checkin': Booking.checkin_date,
+            'checkout': Booking.checkout_date,
+            'name': Booking.customer_name,
+            'id': Booking.id,
+        }, Booking.id, default_sort='id', per_page=current_app.config['ADMIN_PAGE_SIZE'])
+    except ValueError as error:
+        _abort(400, str(error))
+    return _json({'data': BOOKING.dump_many(page.items, names), 'next': page.next_cursor})
@@ -0,0 +1,282 @@
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Async serving mode: the Flask app behind an ASGI server.
+#
+#   uvicorn main:asgi_app --host 0.0.0.0 --port 8000
+#
+# Connections live on the event loop, so a slow client, an idle keep-alive
+# connection or a request waiting its turn costs a coroutine rather than a
+# thread. The views themselves still run synchronously, on a pool of
+# ASYNC_THREADS threads sized to the database pool: that is the concurrency
+# limit. Up to ASYNC_MAX_WAITING more requests queue for a thread for at most
+# ASYNC_WAIT_TIMEOUT seconds; anything beyond gets a 503 with Retry-After
+# straight away instead of piling up behind a busy database.
+#
+# Identical concurrent GETs to ASYNC_COALESCE_PATHS (the availability searches
+# and room listings) are single-flighted: the first one runs the view and
+# every request that arrives while it runs gets a copy of its response, so a
+# burst of the same search costs one query and one thread. Requests carrying
+# a cookie or an Authorization header are never shared, and neither is a
+# response that sets a cookie.
+
+SPOOL_SIZE = 1024 * 1024  # request bodies bigger than this go to a temporary file
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyLimit:
+    def __init__(self, limit, max_waiting, timeout):
+        self.limit, self.max_waiting, self.timeout = limit, max_waiting, timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.running = 0
+        self.waiting = 0
+
+    async def __aenter__(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                raise Overloaded()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise Overloaded()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.running += 1
+
+    async def __aexit__(self, *exc_info):
+        self.running -= 1
+        self._semaphore.release()
+
+
+# A complete response, as the single-flight leader hands it to the requests that joined it
+class Buffered:
+    def __init__(self, status, headers, body):
+        self.status, self.headers, self.body = status, headers, body
+
+    @property
+    def shareable(self):
+        return not any(name.lower() == 'set-cookie' for name, _ in self.headers)
+
+
+def _environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    if 'CONTENT_LENGTH' not in environ:  # e.g. a chunked upload; it has been read in full by now
+        environ['CONTENT_LENGTH'] = str(body.seek(0, 2))
+        body.seek(0)
+    return environ
+
+
+def _start_message(status, headers):
+    return {'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]}
+
+
+class AsgiApp:
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.threads = config['ASYNC_THREADS']
+        self.coalesce_paths = frozenset(config['ASYNC_COALESCE_PATHS'])
+        self._settings = (config['ASYNC_THREADS'], config['ASYNC_MAX_WAITING'], config['ASYNC_WAIT_TIMEOUT'])
+        self._executor = None
+        self._limit = None
+        self._flights = {}  # only touched on the event loop, so no lock
+        self.coalesced = 0
+        self.rejected = 0
+
+    # Created on the server's event loop, on the first request or at startup
+    def _start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='hotel-view')
+            self._limit = ConcurrencyLimit(*self._settings)
+
+    def stats(self):
+        limit = self._limit
+        return {'running': limit.running if limit else 0, 'waiting': limit.waiting if limit else 0,
+                'coalesced': self.coalesced, 'rejected': self.rejected}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            self._start()
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"unsupported ASGI scope type {scope['type']!r}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return  # the client went away mid-upload
+        key = self._flight_key(scope)
+        try:
+            if key is None:
+                async with self._limit:
+                    await self._stream(_environ(scope, body), send)
+                return
+            response = await self._join(key, scope, body)
+        except Overloaded:
+            self.rejected += 1
+            await self._send(send, Buffered('503 Service Unavailable',
+                                            [('Content-Type', 'text/plain'), ('Retry-After', '1')],
+                                            b'Server busy, try again shortly.'))
+            return
+        await self._send(send, response)
+
+    async def _read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    # Requests with the same key get the same response; None when this one must run on its own
+    def _flight_key(self, scope):
+        if scope['method'] not in ('GET', 'HEAD') or scope['path'] not in self.coalesce_paths:
+            return None
+        headers = dict(scope['headers'])
+        if b'cookie' in headers or b'authorization' in headers:
+            return None
+        return (scope['method'], scope['path'], scope['query_string'], headers.get(b'host'),
+                headers.get(b'accept-encoding'), headers.get(b'if-none-match'), headers.get(b'if-modified-since'))
+
+    async def _join(self, key, scope, body):
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = asyncio.ensure_future(self._run_buffered(_environ(scope, body)))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        # Shielded: a leader whose client hangs up mustn't cancel the response the others wait for
+        response = await asyncio.shield(flight)
+        if leader:
+            return response
+        if not response.shareable:
+            return await self._run_buffered(_environ(scope, body))
+        self.coalesced += 1
+        return Buffered(response.status, response.headers + [('X-Single-Flight', 'shared')], response.body)
+
+    def _land(self, key, flight):
+        self._flights.pop(key, None)
+        if not flight.cancelled():
+            flight.exception()  # retrieved, in case every request waiting on it has gone
+
+    async def _run_buffered(self, environ):
+        def run():
+            started = []
+            chunks = []
+
+            def start_response(status, headers, exc_info=None):
+                started[:] = [status, headers]
+                return chunks.append
+
+            result = self.app(environ, start_response)
+            try:
+                chunks.extend(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            return Buffered(started[0], started[1], b''.join(chunks))
+
+        async with self._limit:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+
+    # Everything else streams, e.g. CSV exports; the view's thread waits while the client reads
+    async def _stream(self, environ, send):
+        loop = asyncio.get_running_loop()
+
+        def run():
+            started = []
+            sent = []
+
+            def send_now(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            def write(data):
+                if not sent:
+                    send_now(_start_message(*started))
+                    sent.append(True)
+                if data:
+                    send_now({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+            def start_response(status, headers, exc_info=None):
+                if exc_info and sent:
+                    raise exc_info[1].with_traceback(exc_info[2])
+                started[:] = [status, headers]
+                return write
+
+            result = self.app(environ, start_response)
+            try:
+                for data in result:
+                    write(data)
+                if not sent:
+                    write(b'')
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            send_now({'type': 'http.response.body', 'body': b''})
+
+        await loop.run_in_executor(self._executor, run)
+
+    async def _send(self, send, response):
+        await send(_start_message(response.status, response.headers))
+        await send({'type': 'http.response.body', 'body': response.body})
+
+
+# The ASGI application serving `app`; create_app() output goes in, `uvicorn module:name` serves the result
+def to_asgi(app):
+    asgi_app = AsgiApp(app)
+    app.extensions['asgi'] = asgi_app
+    return asgi_app
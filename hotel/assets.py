@@ -0,0 +1,278 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import threading
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+
+# Static asset build and serving.
+#
+# `flask assets build` copies everything under static/ into ASSETS_DIR with a
+# content hash in the file name (style.css -> style.5d41402abc.css). CSS is
+# minified and its url() references point at the hashed files; text assets get
+# .gz siblings (and .br ones when the brotli package is installed) compressed
+# once at build time; images get ASSETS_IMAGE_WIDTHS-wide variants for srcset
+# when Pillow is installed. manifest.json maps each source path to its output.
+#
+# Templates link assets with asset_url() and responsive_image(). A hashed file
+# never changes, so /assets serves it with a year-long immutable Cache-Control
+# and a new build simply produces new names; old outputs are kept until
+# `--clean` so pages cached elsewhere keep working. Without a build, or in
+# debug, the helpers point at /static instead.
+
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map'}
+IMAGES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+_CSS_PROTECTED = re.compile(r'/\*.*?\*/|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'', re.S)
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+# Drop comments and the whitespace CSS doesn't need, leaving strings untouched
+def minify_css(text):
+    strings = []
+
+    def protect(match):
+        if match.group().startswith('/*'):
+            return ' '
+        strings.append(match.group())
+        return '\0%d\0' % (len(strings) - 1)
+
+    text = _CSS_PROTECTED.sub(protect, text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r' ?([{};,>]) ?', r'\1', text)
+    text = text.replace(': ', ':').replace(';}', '}')
+    return re.sub(r'\0(\d+)\0', lambda match: strings[int(match.group(1))], text.strip())
+
+
+def _hashed(path, data):
+    stem, ext = posixpath.splitext(path)
+    return f'{stem}.{hashlib.sha1(data).hexdigest()[:10]}{ext}'
+
+
+def _sources(source, skip):
+    skip = {os.path.abspath(os.path.join(source, name)) for name in skip}
+    for root, dirs, files in os.walk(source):
+        dirs[:] = sorted(name for name in dirs if os.path.abspath(os.path.join(root, name)) not in skip)
+        for name in sorted(files):
+            yield os.path.relpath(os.path.join(root, name), source).replace(os.sep, '/')
+
+
+class Builder:
+    def __init__(self, source, output, url_prefix, image_widths=(), skip=()):
+        self.source, self.output, self.url_prefix = source, output, url_prefix.rstrip('/')
+        self.image_widths = sorted(image_widths)
+        self.skip = set(skip) | {os.path.relpath(output, source)}
+        self.files = {}
+        self.images = {}
+        self.written = self.bytes_in = self.bytes_out = 0
+        # Both optional: without brotli only .gz copies are written, without Pillow no variants
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = None
+        self.brotli, self.pillow = brotli, Image
+
+    def _write(self, path, data):
+        target = os.path.join(self.output, path)
+        if os.path.exists(target):
+            return  # same name, same content
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        self.written += 1
+        if posixpath.splitext(path)[1] in COMPRESSIBLE:
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, 9, mtime=0))
+            if self.brotli is not None:
+                with open(target + '.br', 'wb') as f:
+                    f.write(self.brotli.compress(data))
+
+    def _add(self, path, data):
+        hashed = _hashed(path, data)
+        self._write(hashed, data)
+        self.bytes_out += len(data)
+        return hashed
+
+    # Narrower copies of an image for srcset, never wider than the original
+    def _variants(self, path, data):
+        with self.pillow.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            entry = {'width': width, 'height': height, 'variants': []}
+            for variant_width in self.image_widths:
+                if variant_width >= width:
+                    break
+                resized = image.resize((variant_width, round(height * variant_width / width)),
+                                       self.pillow.LANCZOS)
+                buffer = io.BytesIO()
+                resized.save(buffer, format=image.format, quality=82, optimize=True)
+                stem, ext = posixpath.splitext(path)
+                entry['variants'].append([variant_width, self._add(f'{stem}-{variant_width}w{ext}',
+                                                                   buffer.getvalue())])
+        entry['variants'].append([width, self.files[path]])
+        return entry
+
+    # url() references in CSS are relative to the source file; point them at the hashed outputs
+    def _rewrite_urls(self, path, text):
+        def replace(match):
+            target = match.group(2).strip()
+            if re.match(r'^([a-z]+:|//|#)', target):
+                return match.group()
+            if target.startswith('/static/'):
+                resolved = target[len('/static/'):]
+            else:
+                resolved = posixpath.normpath(posixpath.join(posixpath.dirname(path), target.split('?')[0]))
+            hashed = self.files.get(resolved)
+            return f'url({self.url_prefix}/{hashed})' if hashed else match.group()
+        return _CSS_URL.sub(replace, text)
+
+    def build(self):
+        os.makedirs(self.output, exist_ok=True)
+        # CSS last, so the files it references already have their hashed names
+        for path in sorted(_sources(self.source, self.skip), key=lambda path: path.endswith('.css')):
+            with open(os.path.join(self.source, path), 'rb') as f:
+                data = f.read()
+            self.bytes_in += len(data)
+            ext = posixpath.splitext(path)[1].lower()
+            if ext == '.css':
+                data = minify_css(self._rewrite_urls(path, data.decode('utf-8'))).encode('utf-8')
+            self.files[path] = self._add(path, data)
+            if ext in IMAGES and self.pillow is not None:
+                self.images[path] = self._variants(path, data)
+        manifest = {'files': self.files, 'images': self.images}
+        with open(os.path.join(self.output, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        return manifest
+
+
+class Assets:
+    def __init__(self, app):
+        self.app = app
+        self.directory = app.config['ASSETS_DIR']
+        self._manifest = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._manifest is None:
+                try:
+                    with open(os.path.join(self.directory, MANIFEST), 'rb') as f:
+                        raw = f.read()
+                except FileNotFoundError:
+                    raw = b'{}'
+                self._version = hashlib.sha1(raw).hexdigest()[:16]
+                self._manifest = json.loads(raw)
+        return self._manifest
+
+    @property
+    def manifest(self):
+        if self.app.debug:
+            return {}  # edits under static/ show up without a rebuild
+        return self._manifest if self._manifest is not None else self._load()
+
+    # Changes with every build, e.g. for caches holding pages that link assets
+    @property
+    def version(self):
+        if self._manifest is None:
+            self._load()
+        return self._version
+
+    def reload(self):
+        with self._lock:
+            self._manifest = None
+
+    def url(self, path):
+        hashed = self.manifest.get('files', {}).get(path)
+        if hashed is None:
+            return url_for('static', filename=path)
+        return f"{self.app.config['ASSETS_URL_PATH'].rstrip('/')}/{hashed}"
+
+    # An <img> that loads lazily and, when the build made variants, lets the browser pick a width
+    def image(self, path, alt, sizes='100vw', **attrs):
+        entry = self.manifest.get('images', {}).get(path)
+        attrs = dict(attrs, alt=alt, loading=attrs.get('loading', 'lazy'), decoding='async')
+        attrs['src'] = self.url(path)
+        if entry is not None:
+            prefix = self.app.config['ASSETS_URL_PATH'].rstrip('/')
+            attrs['srcset'] = ', '.join(f'{prefix}/{hashed} {width}w' for width, hashed in entry['variants'])
+            attrs['sizes'] = sizes
+            attrs['width'], attrs['height'] = entry['width'], entry['height']
+        return Markup('<img %s>' % ' '.join(
+            f'{escape(name.rstrip("_").replace("_", "-"))}="{escape(value)}"' for name, value in attrs.items()))
+
+    # Hashed outputs, precompressed when the client accepts it
+    def send(self, filename):
+        max_age = self.app.config['ASSETS_MAX_AGE']
+        response = None
+        if posixpath.splitext(filename)[1] in COMPRESSIBLE:
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if request.accept_encodings[encoding] and os.path.isfile(os.path.join(self.directory,
+                                                                                      filename + suffix)):
+                    response = send_from_directory(self.directory, filename + suffix, max_age=max_age,
+                                                   mimetype=mimetypes.guess_type(filename)[0])
+                    response.headers['Content-Encoding'] = encoding
+                    break
+            if response is None:
+                response = send_from_directory(self.directory, filename, max_age=max_age)
+            response.vary.add('Accept-Encoding')
+        else:
+            response = send_from_directory(self.directory, filename, max_age=max_age)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def assets():
+    return current_app.extensions['assets']
+
+
+def asset_url(path):
+    return assets().url(path)
+
+
+def responsive_image(path, alt, sizes='100vw', **attrs):
+    return assets().image(path, alt, sizes, **attrs)
+
+
+def init_assets(app):
+    app.extensions['assets'] = Assets(app)
+    app.add_template_global(asset_url)
+    app.add_template_global(responsive_image)
+    app.add_url_rule(app.config['ASSETS_URL_PATH'].rstrip('/') + '/<path:filename>', 'assets',
+                     lambda filename: assets().send(filename))
+
+
+assets_cli = AppGroup('assets', help='Build fingerprinted, minified and precompressed static assets.')
+
+
+#   flask assets build [--clean]
+@assets_cli.command('build')
+@click.option('--clean', is_flag=True, help='Remove earlier outputs first instead of keeping them next to the new ones.')
+def build_command(clean):
+    config = current_app.config
+    if clean and os.path.isdir(config['ASSETS_DIR']):
+        shutil.rmtree(config['ASSETS_DIR'])
+    builder = Builder(current_app.static_folder, config['ASSETS_DIR'], config['ASSETS_URL_PATH'],
+                      config['ASSETS_IMAGE_WIDTHS'], config['ASSETS_SKIP'])
+    manifest = builder.build()
+    assets().reload()
+    click.echo(f"{len(manifest['files'])} assets ({builder.written} new files) in {config['ASSETS_DIR']}, "
+               f'{builder.bytes_in} bytes in, {builder.bytes_out} out')
+    if builder.brotli is None:
+        click.echo('brotli not installed (pip install brotli): only .gz copies were written')
+    if builder.pillow is None:
+        click.echo('Pillow not installed (pip install Pillow): no responsive image variants')
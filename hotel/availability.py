@@ -0,0 +1,157 @@
+import bisect
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+
+# Parse a 'YYYY-MM-DD' form/query value, returning None when it is missing
+def parse_date(value):
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+# Read a checkin/checkout pair from request args or form data.
+# Returns (None, None) when no dates were given, raises ValueError on a bad range.
+def parse_stay(values, checkin_field='checkin_date', checkout_field='checkout_date'):
+    checkin = parse_date(values.get(checkin_field))
+    checkout = parse_date(values.get(checkout_field))
+    if checkin is None and checkout is None:
+        return None, None
+    if checkin is None or checkout is None or checkout <= checkin:
+        raise ValueError('checkout must be after checkin')
+    return checkin, checkout
+
+
+# Units of each room type: the rows of one type add up, since app.py keeps a row per room
+# (total_of_this_type 1) and main.py a row per type carrying the count
+def type_capacities(rooms):
+    capacities = Counter()
+    for room in rooms:
+        capacities[room.room_type] += room.total_of_this_type or 0
+    return capacities
+
+
+# Yield every night of a [checkin, checkout) stay
+def nights(checkin, checkout):
+    for offset in range((checkout - checkin).days):
+        yield checkin + timedelta(days=offset)
+
+
+# Sorted interval list per key (room type or room id).
+#
+# Each key holds its stays as (checkin, checkout, booking_id) tuples ordered by
+# checkin. A stay can only overlap [start, end) if it starts before `end` and no
+# earlier than `start - longest stay`, so a lookup is two bisects plus a scan of
+# the stays that actually fall in that window.
+class IntervalIndex:
+    def __init__(self):
+        self._stays = defaultdict(list)
+        self._longest = defaultdict(int)
+        self._by_booking = {}
+
+    def __len__(self):
+        return len(self._by_booking)
+
+    def add(self, key, checkin, checkout, booking_id):
+        if booking_id in self._by_booking:
+            self.remove(booking_id)
+        stay = (checkin, checkout, booking_id)
+        bisect.insort(self._stays[key], stay)
+        self._longest[key] = max(self._longest[key], (checkout - checkin).days)
+        self._by_booking[booking_id] = (key, stay)
+
+    def remove(self, booking_id):
+        entry = self._by_booking.pop(booking_id, None)
+        if entry is None:
+            return False
+        key, stay = entry
+        stays = self._stays[key]
+        position = bisect.bisect_left(stays, stay)
+        if position < len(stays) and stays[position] == stay:
+            del stays[position]
+        return True
+
+    def overlapping(self, key, start, end):
+        stays = self._stays.get(key)
+        if not stays:
+            return []
+        earliest = start - timedelta(days=self._longest[key])
+        low = bisect.bisect_left(stays, (earliest,))
+        high = bisect.bisect_left(stays, (end,))
+        return [stay for stay in stays[low:high] if stay[1] > start]
+
+    # Highest number of stays sharing a single night inside [start, end)
+    def peak_occupancy(self, key, start, end):
+        span = (end - start).days
+        deltas = [0] * (span + 1)
+        for checkin, checkout, _ in self.overlapping(key, start, end):
+            deltas[max((checkin - start).days, 0)] += 1
+            deltas[min((checkout - start).days, span)] -= 1
+        peak = running = 0
+        for delta in deltas[:span]:
+            running += delta
+            peak = max(peak, running)
+        return peak
+
+
+# Availability engine backed by an IntervalIndex.
+#
+# `loader` returns (key, checkin, checkout, booking_id) rows for every booking
+# that holds inventory. The index is built lazily on first use, kept in sync by
+# the write paths calling add()/remove(), and reloaded after `ttl` seconds so
+# bookings written by other worker processes are picked up.
+class AvailabilityEngine:
+    def __init__(self, loader, ttl=30):
+        self._loader = loader
+        self._ttl = ttl
+        self._lock = threading.RLock()
+        self._index = None
+        self._loaded_at = 0.0
+
+    def _current(self):
+        with self._lock:
+            expired = self._ttl is not None and time.monotonic() - self._loaded_at > self._ttl
+            if self._index is None or expired:
+                self.reload()
+            return self._index
+
+    def reload(self):
+        index = IntervalIndex()
+        for key, checkin, checkout, booking_id in self._loader():
+            index.add(key, checkin, checkout, booking_id)
+        with self._lock:
+            self._index = index
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def add(self, key, checkin, checkout, booking_id):
+        with self._lock:
+            if self._index is not None:
+                self._index.add(key, checkin, checkout, booking_id)
+
+    def remove(self, booking_id):
+        with self._lock:
+            if self._index is not None:
+                self._index.remove(booking_id)
+
+    # Number of units of `key` still free on every night of [checkin, checkout)
+    def available(self, key, checkin, checkout, capacity):
+        with self._lock:
+            return max(capacity - self._current().peak_occupancy(key, checkin, checkout), 0)
+
+    def is_available(self, key, checkin, checkout, capacity=1):
+        return self.available(key, checkin, checkout, capacity) > 0
+
+    # Map each key in `capacities` ({key: total units}) to its free units for the stay
+    def search(self, capacities, checkin, checkout):
+        with self._lock:
+            index = self._current()
+            return {
+                key: max(capacity - index.peak_occupancy(key, checkin, checkout), 0)
+                for key, capacity in capacities.items()
+            }
@@ -0,0 +1,324 @@
+import csv
+import io
+import json
+from collections import Counter
+from datetime import date
+from itertools import islice
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from hotel import analytics, inventory, journal
+from hotel.availability import nights, parse_date, type_capacities
+from hotel.catalog import BOOKINGS, RATES, ROOMS, bump_version
+from hotel.extensions import db
+from hotel.models import Booking, RatePlan, RateRule, Room, RoomNightInventory, normalize_email, normalize_phone, \
+    normalize_reference
+from hotel.reservations import lock_room_types
+
+# Bulk import and export of rooms and bookings as CSV or JSON Lines.
+#
+# Imports stream the input: rows are read, validated and inserted one chunk at
+# a time, each chunk as a single executemany INSERT in its own transaction, so
+# memory stays flat and a bad row only costs its own line in the report. When
+# a chunk trips a unique constraint it is retried row by row in savepoints to
+# find the offending rows. Imported bookings hold the reservation lock of
+# their room types until their chunk commits, like bookings made on the site,
+# and a row that would sell a night past its type's capacity is reported
+# instead of inserted. They come back from the INSERT in full and go into the
+# booking journal. Exports page through the table by primary key and yield the
+# output as text, ready for a streamed response or a file.
+
+FORMATS = ('csv', 'json')
+CHUNK_SIZE = 500
+
+
+def _text(value):
+    return str(value).strip() if value not in (None, '') else None
+
+
+def _int(value):
+    value = _text(value)
+    return int(value) if value is not None else None
+
+
+def _float(value):
+    value = _text(value)
+    return float(value) if value is not None else None
+
+
+def _date(value):
+    return parse_date(_text(value))
+
+
+# Stored the way the model's validators store them, since bulk inserts bypass the ORM
+def _email(value):
+    return normalize_email(_text(value))
+
+
+def _phone(value):
+    return normalize_phone(_text(value))
+
+
+def _reference(value):
+    return normalize_reference(_text(value))
+
+
+def _weekdays(value):
+    value = _text(value)
+    if value is not None and not set(value) <= set('0123456'):
+        raise ValueError('digits 0-6 (Monday is 0)')
+    return value
+
+
+def _required(parse):
+    def check(value):
+        value = parse(value)
+        if value is None:
+            raise ValueError('is required')
+        return value
+    return check
+
+
+# Column name -> parser for each importable model; ids are optional and kept when given
+KINDS = {
+    'rooms': (Room, {
+        'id': _int, 'name': _text, 'room_number': _text, 'room_type': _required(_text), 'price': _float,
+        'status': _text, 'max_guests': _int, 'min_guests': _int, 'max_adults': _int, 'max_children': _int,
+        'total_of_this_type': _int, 'room_description': _text, 'room_image': _text,
+    }),
+    'bookings': (Booking, {
+        'id': _int, 'customer_name': _required(_text), 'email': _email, 'phone': _phone, 'room_id': _int,
+        'room_type': _text, 'checkin_date': _required(_date), 'checkout_date': _required(_date),
+        'price': _float, 'payment_method': _text, 'status': _text, 'payment_status': _text,
+        'idempotency_key': _text, 'reference': _reference,
+    }),
+    'rate_plans': (RatePlan, {
+        'id': _int, 'room_type': _required(_text), 'name': _text, 'base_rate': _required(_float),
+    }),
+    'rate_rules': (RateRule, {
+        'id': _int, 'rate_plan_id': _required(_int), 'name': _text, 'start_date': _date, 'end_date': _date,
+        'weekdays': _weekdays, 'min_nights': _int, 'percent': _required(_float),
+    }),
+}
+
+# Cache version each kind of row feeds
+VERSIONS = {'rooms': ROOMS, 'bookings': BOOKINGS, 'rate_plans': RATES, 'rate_rules': RATES}
+
+# Legacy column headers accepted on import (test.py's field names)
+ALIASES = {'photo': 'room_image', 'guest_name': 'customer_name', 'guest_email': 'email',
+           'guest_phone': 'phone', 'check_in': 'checkin_date', 'check_out': 'checkout_date'}
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []  # (line, message)
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def as_dict(self):
+        return {'inserted': self.inserted,
+                'errors': [{'line': line, 'error': message} for line, message in self.errors]}
+
+
+# Yield (line number, row dict) from a text stream
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'json':
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    row = error
+                yield line_number, row
+    else:
+        raise ValueError(f'unknown format {fmt!r}')
+
+
+def _validate(kind, row):
+    if not isinstance(row, dict):
+        raise ValueError(f'not a JSON object: {row}')
+    columns = KINDS[kind][1]
+    values = {}
+    for key, raw in row.items():
+        key = ALIASES.get(key, key)
+        if key not in columns:
+            continue
+        try:
+            values[key] = columns[key](raw)
+        except ValueError as error:
+            raise ValueError(f'{key}: {error}')
+    for key, parse in columns.items():
+        if key not in values:
+            values[key] = parse(None)
+    return {key: value for key, value in values.items() if value is not None or key == 'id'}
+
+
+# Fill in what a booking row may leave out and check it against the rooms it points at
+def _complete_bookings(chunk, report):
+    room_ids = {values['room_id'] for _, values in chunk if values.get('room_id')}
+    rooms = {}
+    if room_ids:
+        rooms = dict(db.session.execute(select(Room.id, Room.room_type).where(Room.id.in_(room_ids))).all())
+    valid = []
+    for line, values in chunk:
+        if values['checkout_date'] <= values['checkin_date']:
+            report.error(line, 'checkout_date must be after checkin_date')
+        elif values.get('room_id') and values['room_id'] not in rooms:
+            report.error(line, f"room_id: no room {values['room_id']}")
+        elif not values.get('room_type') and not values.get('room_id'):
+            report.error(line, 'room_type or room_id is required')
+        else:
+            values.setdefault('room_type', rooms.get(values.get('room_id')))
+            values.setdefault('status', 'pending')
+            values.setdefault('payment_status', 'pending')
+            valid.append((line, values))
+    return valid
+
+
+# Take the lock of the chunk's room types and split the rows into those that fit the types'
+# capacity night by night and (line, message) for those that don't; the lock is held until
+# the caller commits
+def _fit_bookings(chunk):
+    active = [(line, values) for line, values in chunk if values['status'] != 'cancelled']
+    room_types = {values['room_type'] for _, values in active}
+    lock_room_types(db.session, Room, room_types)
+    capacities = type_capacities(db.session.query(Room.room_type, Room.total_of_this_type)
+                                 .filter(Room.room_type.in_(room_types))) if room_types else {}
+    keys = {(values['room_type'], night) for _, values in active
+            for night in nights(values['checkin_date'], values['checkout_date'])}
+    sold = Counter({key: row.sold for key, row in inventory.rows_by_key(db.session, RoomNightInventory, keys).items()})
+    fits, rejected = [], []
+    for line, values in chunk:
+        if values['status'] != 'cancelled':
+            room_type = values['room_type']
+            stay = list(nights(values['checkin_date'], values['checkout_date']))
+            full = [night for night in stay if sold[room_type, night] >= capacities.get(room_type, 0)]
+            if full:
+                rejected.append((line, f'{room_type} has no unit left on {full[0].isoformat()}'))
+                continue
+            sold.update((room_type, night) for night in stay)
+        fits.append((line, values))
+    return fits, rejected
+
+
+def _fit(kind, chunk):
+    return _fit_bookings(chunk) if kind == 'bookings' else (chunk, [])
+
+
+def _stays(rows):
+    return [(values['room_type'], values['checkin_date'], values['checkout_date'], None)
+            for values in rows if values['status'] != 'cancelled']
+
+
+# Returns the inserted bookings as stored, for the journal
+def _insert(model, rows):
+    # An executemany binds every row to the first row's columns, so rows that leave out
+    # different columns (to get their defaults) go in one statement per set of columns
+    batches = {}
+    for values in rows:
+        values = {key: value for key, value in values.items() if key != 'id' or value is not None}
+        batches.setdefault(frozenset(values), []).append(values)
+    stored = []
+    for batch in batches.values():
+        if model is Booking:
+            table = Booking.__table__
+            stored.extend(db.session.execute(insert(table).returning(*table.columns), batch).mappings())
+        else:
+            db.session.execute(insert(model), batch)
+    return stored
+
+
+def _load_chunk(kind, chunk, report):
+    model = KINDS[kind][0]
+    if kind == 'bookings':
+        chunk = _complete_bookings(chunk, report)
+    if not chunk:
+        return
+    try:
+        rows, rejected = _fit(kind, chunk)
+        stored = _insert(model, [values for _, values in rows])
+        inserted = [values for _, values in rows]
+    except IntegrityError:
+        db.session.rollback()
+        rows, rejected = _fit(kind, chunk)  # the rollback let the lock go
+        inserted, stored = [], []
+        for line, values in rows:
+            try:
+                with db.session.begin_nested():
+                    stored.extend(_insert(model, [values]))
+                inserted.append(values)
+            except IntegrityError as error:
+                report.error(line, str(error.orig))
+    for line, message in rejected:
+        report.error(line, message)
+    if kind == 'bookings':
+        journal.append_rows(db.session, 'created', stored)
+        inventory.add_counts(db.session, RoomNightInventory, inventory.expected_counts(_stays(inserted)))
+        analytics.apply(db.session, analytics.deltas_for_rows(inserted))
+    bump_version(VERSIONS[kind])
+    db.session.commit()
+    report.inserted += len(inserted)
+
+
+# Validate and insert rows from a text stream, one transaction per chunk
+def import_rows(kind, stream, fmt='csv', chunk_size=CHUNK_SIZE):
+    report = ImportReport()
+    rows = read_rows(stream, fmt)
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            break
+        chunk = []
+        for line, row in batch:
+            try:
+                chunk.append((line, _validate(kind, row)))
+            except ValueError as error:
+                report.error(line, str(error))
+        _load_chunk(kind, chunk, report)
+    report.errors.sort()
+    return report
+
+
+def _cell(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+# Yield the whole table as CSV or JSON Lines text, reading `page_size` rows at a time
+def export_rows(kind, fmt='csv', page_size=1000):
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown format {fmt!r}')
+    model, columns = KINDS[kind]
+    names = list(columns)
+    table_columns = [getattr(model, name) for name in names]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+    last_id = None
+    while True:
+        query = select(*table_columns).order_by(model.id).limit(page_size)
+        if last_id is not None:
+            query = query.where(model.id > last_id)
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        if fmt == 'csv':
+            writer.writerows([_cell(value) for value in row] for row in rows)
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            chunk = ''.join(json.dumps(dict(zip(names, map(_cell, row)))) + '\n' for row in rows)
+        yield chunk
+        last_id = rows[-1][0]
+    if fmt == 'csv' and buffer.tell():
+        yield buffer.getvalue()
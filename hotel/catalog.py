@@ -0,0 +1,138 @@
+import threading
+from collections import namedtuple
+
+from flask import current_app, g
+from sqlalchemy import func, literal, select
+
+from hotel.availability import type_capacities
+from hotel.extensions import db
+from hotel.models import BookingEvent, CacheVersion, Room
+from hotel.page_cache import LRUCache
+
+# Cached room listings.
+#
+# Rooms only change through add_room/delete_room and availability only through
+# booking holds, so listings are kept in memory as tuples of RoomRow and
+# reused until one of the version counters they depend on moves. The counters
+# live in the cache_version table and are bumped in the same transaction as
+# the change, so one small read per request is enough for every worker process
+# to notice changes made by the others.
+
+ROOMS = 'rooms'
+BOOKINGS = 'bookings'
+RATES = 'rates'
+JOURNAL = 'journal'  # not a counter: the last booking event's id, see hotel/journal.py
+
+ROOM_FIELDS = ('id', 'name', 'room_number', 'room_type', 'price', 'status', 'max_guests', 'min_guests',
+               'max_adults', 'max_children', 'total_of_this_type', 'room_description', 'room_image')
+
+
+class RoomRow(namedtuple('RoomRow', ROOM_FIELDS)):
+    __slots__ = ()
+
+    @property
+    def photo(self):
+        return self.room_image
+
+
+# Bump counters inside the caller's transaction; the caller commits
+def bump_version(*names):
+    db.session.query(CacheVersion).filter(CacheVersion.name.in_(names)) \
+        .update({CacheVersion.version: CacheVersion.version + 1}, synchronize_session=False)
+    g.pop('cache_versions', None)
+
+
+# Read once per request, so every listing on a page sees the same versions
+def load_versions():
+    if 'cache_versions' not in g:
+        journal = select(literal(JOURNAL), func.coalesce(func.max(BookingEvent.id), 0))
+        g.cache_versions = dict(db.session.execute(
+            select(CacheVersion.name, CacheVersion.version).union_all(journal)).all())
+    return g.cache_versions
+
+
+class RoomCatalog:
+    def __init__(self, max_entries=128):
+        self._entries = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+
+    # Call `listener()` whenever another counter value is seen, e.g. to drop an in-memory index
+    def on_change(self, listener):
+        self._listeners.append(listener)
+
+    def _versions(self):
+        versions = load_versions()
+        with self._lock:
+            changed = versions != self._seen
+            self._seen = versions
+        if changed:
+            for listener in self._listeners:
+                listener()
+        return versions
+
+    # Return the cached rows for `key`, rebuilding them with `loader` once a counter in `depends_on` moves
+    def get(self, key, depends_on, loader):
+        versions = self._versions()
+        stamp = tuple(versions.get(name, 0) for name in depends_on)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+        with self._lock:
+            self.misses += 1
+        rows = tuple(loader())
+        self._entries.set(key, (stamp, rows))
+        return rows
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else None}
+
+
+def _room_rows(query):
+    return [RoomRow(*row) for row in query.with_entities(*[getattr(Room, field) for field in ROOM_FIELDS])]
+
+
+def catalog():
+    return current_app.extensions['room_catalog']
+
+
+def all_rooms():
+    return catalog().get(('all',), (ROOMS,), lambda: _room_rows(Room.query.order_by(Room.id)))
+
+
+def rooms_for_sale():
+    return catalog().get(('available',), (ROOMS,),
+                         lambda: _room_rows(Room.query.filter_by(status='available').order_by(Room.id)))
+
+
+# Rooms whose type has a unit free on every night of the stay
+def room_types_free(checkin_date, checkout_date, availability):
+    def load():
+        rooms = all_rooms()
+        free = availability.search(type_capacities(rooms), checkin_date, checkout_date)
+        return [room for room in rooms if free[room.room_type] > 0]
+    return catalog().get(('room_types_free', checkin_date, checkout_date), (ROOMS, BOOKINGS), load)
+
+
+# Rooms (one unit each) with no booking overlapping the stay
+def rooms_free(checkin_date, checkout_date, room_availability):
+    def load():
+        rooms = rooms_for_sale()
+        free = room_availability.search({room.id: 1 for room in rooms}, checkin_date, checkout_date)
+        return [room for room in rooms if free[room.id]]
+    return catalog().get(('rooms_free', checkin_date, checkout_date), (ROOMS, BOOKINGS), load)
+
+
+def init_catalog(app):
+    room_catalog = RoomCatalog(app.config['ROOM_CATALOG_MAX_ENTRIES'])
+    # A booking change seen from another worker means the in-memory availability indexes are stale
+    # too; the journal follower applies the changes to them (see hotel/journal.py)
+    room_catalog.on_change(app.extensions['journal_follower'].catch_up)
+    app.extensions['room_catalog'] = room_catalog
@@ -0,0 +1,81 @@
+import click
+from flask.cli import AppGroup
+
+from hotel import analytics, bulk, inventory
+from hotel.assets import assets_cli
+from hotel.availability import parse_date
+from hotel.extensions import db
+from hotel.holds import holds_cli
+from hotel.jobs import jobs_cli
+from hotel.journal import journal_cli
+from hotel.migrations import db_cli
+from hotel.models import RoomNightInventory
+from hotel.services import load_booked_stays
+from hotel.templating import templates_cli
+
+
+# Recompute the per-night inventory counters from Booking and report drift:
+#   flask inventory [--rebuild]
+@click.command('inventory', help='Check the per-night inventory counters against the bookings.')
+@click.option('--rebuild', is_flag=True, help='Rewrite the counters instead of only reporting drift.')
+def inventory_command(rebuild):
+    stays = load_booked_stays()
+    if rebuild:
+        drift = inventory.rebuild(db.session, RoomNightInventory, stays)
+    else:
+        drift = inventory.find_drift(db.session, RoomNightInventory, stays)
+    for room_type, night, stored, expected in drift:
+        click.echo(f'{room_type} {night}: stored {stored}, expected {expected}')
+    click.echo(f'{len(drift)} drifted counters' + (' repaired' if rebuild and drift else ''))
+
+
+# Bulk load rooms, bookings or rate plans/rules from a CSV or JSON Lines file, one transaction per chunk:
+#   flask import rooms rooms.csv
+#   flask import bookings bookings.jsonl --format json --chunk-size 1000
+@click.command('import', help='Load KIND rows from a CSV or JSON Lines file (- for stdin).')
+@click.argument('kind', type=click.Choice(sorted(bulk.KINDS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(bulk.FORMATS), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=bulk.CHUNK_SIZE, show_default=True, help='Rows per INSERT and transaction.')
+def import_command(kind, source, fmt, chunk_size):
+    fmt = fmt or ('json' if source.name.endswith(('.json', '.jsonl')) else 'csv')
+    report = bulk.import_rows(kind, source, fmt, chunk_size)
+    for line, message in report.errors:
+        click.echo(f'line {line}: {message}', err=True)
+    click.echo(f'{report.inserted} {kind} imported, {len(report.errors)} rows rejected')
+
+
+#   flask export bookings --format json -o bookings.jsonl
+@click.command('export', help='Write every KIND row as CSV or JSON Lines.')
+@click.argument('kind', type=click.Choice(sorted(bulk.KINDS)))
+@click.option('--format', 'fmt', type=click.Choice(bulk.FORMATS), default='csv', show_default=True)
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+def export_command(kind, fmt, output):
+    for chunk in bulk.export_rows(kind, fmt):
+        output.write(chunk)
+
+
+# Rebuild the occupancy/revenue rollups from the bookings, e.g. after a backfill:
+#   flask analytics recompute [--from 2031-01-01] [--to 2031-02-01]
+analytics_cli = AppGroup('analytics', help='Maintain the occupancy and revenue rollups.')
+
+
+@analytics_cli.command('recompute', help='Rebuild the rollups from the bookings.')
+@click.option('--from', 'start', help='First night to rebuild (YYYY-MM-DD).')
+@click.option('--to', 'end', help='Night after the last one to rebuild (YYYY-MM-DD).')
+def recompute_command(start, end):
+    written = analytics.recompute(db.session, parse_date(start), parse_date(end))
+    click.echo(f'{written} rollup rows written')
+
+
+def init_cli(app):
+    app.cli.add_command(db_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(holds_cli)
+    app.cli.add_command(inventory_command)
+    app.cli.add_command(import_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(journal_cli)
+    app.cli.add_command(templates_cli)
@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Config:
+    # An absolute path, so Flask-SQLAlchemy doesn't resolve it against the instance folder
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'DATABASE_URL', 'sqlite:///' + os.path.join(PROJECT_ROOT, 'sunrise_hotel.db'))
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev')
+    # Applied to every new SQLite connection; set to {} for SQLite's defaults
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative means KiB, so 64 MiB
+    }
+    # Connection pool for server databases such as postgresql://; ignored for SQLite
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 20))
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))  # seconds
+    DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 30))  # seconds
+    # Hotel information shown on the home page
+    HOTEL_INFO = {
+        'name': 'Sunrise Hotel',
+        'address': '123 Beach Road, Paradise City',
+        'location': 'Paradise City, Ocean View',
+        'email': 'contact@sunrisehotel.com',
+        'phone': '+1234567890',
+        'social_media': {
+            'facebook': 'https://www.facebook.com/sunrisehotel',
+            'twitter': 'https://twitter.com/sunrisehotel',
+            'instagram': 'https://www.instagram.com/sunrisehotel'
+        }
+    }
+    # Full-page cache for the marketing routes: 'memory' (per worker LRU) or 'redis' (shared)
+    PAGE_CACHE_ENABLED = True
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    PAGE_CACHE_URL = os.environ.get('PAGE_CACHE_URL', 'redis://localhost:6379/0')
+    PAGE_CACHE_MAX_ENTRIES = 256
+    PAGE_CACHE_TTL = 3600  # seconds an entry lives in the shared backend
+    PAGE_CACHE_MAX_AGE = 300  # Cache-Control max-age sent to browsers
+    PAGE_CACHE_WATCH_TEMPLATES = False  # re-check template files on every request (always on in debug)
+    # Static assets: `flask assets build` writes fingerprinted, minified and precompressed copies
+    # of static/ to ASSETS_DIR, served from ASSETS_URL_PATH with a long immutable Cache-Control
+    ASSETS_DIR = os.path.join(PROJECT_ROOT, 'static', 'dist')
+    ASSETS_URL_PATH = '/assets'
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+    ASSETS_IMAGE_WIDTHS = (320, 640, 1024, 1600)  # srcset variants, when Pillow is installed
+    ASSETS_SKIP = ('uploads',)  # under static/, written at runtime rather than built
+    # Compiled templates: `flask templates compile` fills this at deploy time so new workers load
+    # them instead of compiling; set TEMPLATE_CACHE_DIR to '' to turn the cache off
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(PROJECT_ROOT, '.template-cache'))
+    TEMPLATE_STREAM_CHUNK = 16 * 1024  # characters of a streamed page sent at a time
+    # Prometheus metrics on /metrics; with several worker processes point this at a directory they share
+    METRICS_ENABLED = True
+    METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+    METRICS_WRITE_INTERVAL = 5  # seconds between snapshot writes to that directory
+    # Sampling profiler: profile requests sending 'X-Profile: 1' and/or a random share of them,
+    # keeping the PROFILER_KEEP slowest as collapsed stacks in PROFILER_DIR
+    PROFILER_ALLOW_HEADER = os.environ.get('PROFILER_ALLOW_HEADER') == '1'
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_INTERVAL = 0.005  # seconds between stack samples
+    PROFILER_KEEP = 20
+    PROFILER_DIR = os.environ.get('PROFILER_DIR', os.path.join(tempfile.gettempdir(), 'hotel-profiles'))
+    # Async serving mode (uvicorn main:asgi_app): views run on ASYNC_THREADS threads, keep it near the
+    # database pool size; up to ASYNC_MAX_WAITING requests wait ASYNC_WAIT_TIMEOUT seconds for one, the
+    # rest get a 503. Identical concurrent GETs to ASYNC_COALESCE_PATHS share one response.
+    ASYNC_THREADS = int(os.environ.get('ASYNC_THREADS', 16))
+    ASYNC_MAX_WAITING = int(os.environ.get('ASYNC_MAX_WAITING', 256))
+    ASYNC_WAIT_TIMEOUT = float(os.environ.get('ASYNC_WAIT_TIMEOUT', 10))
+    ASYNC_COALESCE_PATHS = ('/api/v1/availability', '/api/v1/rooms', '/room_details', '/quote')
+    # Booking journal: `flask journal snapshot` keeps the newest JOURNAL_SNAPSHOT_KEEP snapshots; a web
+    # process more than JOURNAL_CATCH_UP_MAX events behind reloads its availability indexes instead
+    JOURNAL_SNAPSHOT_KEEP = 3
+    JOURNAL_CATCH_UP_MAX = 5000
+    JOURNAL_GAP_GRACE = 5.0  # seconds a reader waits on a hole in the event ids
+    JOURNAL_TAIL_INTERVAL = 1.0  # seconds between polls of `flask journal tail --follow`
+    AVAILABILITY_INDEX_TTL = 30  # seconds before the in-memory availability indexes are reloaded
+    ADMIN_PAGE_SIZE = 50
+    # Multi-property serving (group:app, see hotel/properties.py): {code: {"name", "database", CONFIG: value}}
+    PROPERTIES = json.loads(os.environ.get('HOTEL_PROPERTIES', '{}'))
+    PROPERTY = None  # the code of the property an app serves, set by the group app
+    PROPERTY_SEARCH_THREADS = 8  # properties searched at once by the cross-property search (0 = all)
+    PROPERTY_SEARCH_TIMEOUT = 5.0  # seconds before a property is left out of the results as unavailable
+    # Guest self-service: signed "my bookings" links from the booking lookup
+    GUEST_LINK_MAX_AGE = 7 * 24 * 3600  # seconds a link stays valid
+    GUEST_CACHE_MAX_AGE = 60  # seconds the guest's browser may reuse the page
+    GUEST_BOOKINGS_LIMIT = 100
+    # JSON API: /api/v1/admin/* requires 'Authorization: Bearer <token>', and is disabled while this is unset
+    API_ADMIN_TOKEN = os.environ.get('API_ADMIN_TOKEN')
+    API_GZIP_MIN_SIZE = 1024  # bytes; smaller responses aren't worth compressing
+    ROOM_CATALOG_MAX_ENTRIES = 512  # cached room listings per worker, one per filter
+    PRICE_CALENDAR_DAYS = 730  # nights ahead precomputed per room type; stays beyond are priced rule by rule
+    # Background jobs: worker threads per web process (0 = only `flask jobs work` runs them)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = 1.0  # seconds an idle worker waits before looking for due jobs again
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_BACKOFF = 2.0  # seconds before the first retry, doubled for each one after it
+    JOB_RETRY_MAX_DELAY = 300
+    JOB_LEASE = 120  # seconds before a running job whose worker died is picked up again
+    # Unpaid pending bookings are released HOLD_TTL seconds after they were made
+    HOLD_TTL = int(os.environ.get('HOLD_TTL', 15 * 60))
+    HOLD_SWEEP_INTERVAL = 60  # seconds between sweeps
+    HOLD_SWEEP_BATCH = 200  # holds released per transaction
+    HOLD_SWEEP_IN_PROCESS = os.environ.get('HOLD_SWEEP_IN_PROCESS', '1') == '1'  # else run `flask holds expire --loop`
+    # Payment gateway; 'fake' simulates one with the latency and error rates below
+    PAYMENT_GATEWAY = os.environ.get('PAYMENT_GATEWAY', 'fake')
+    FAKE_GATEWAY_LATENCY = float(os.environ.get('FAKE_GATEWAY_LATENCY', 0.5))  # seconds per capture or refund
+    FAKE_GATEWAY_FAILURE_RATE = 0.0  # share of captures and refunds failing with a retryable error
+    FAKE_GATEWAY_DECLINE_RATE = 0.0  # share of captures declined for good
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
@@ -0,0 +1,213 @@
+import hashlib
+import uuid
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, jsonify, make_response, render_template, request, redirect, url_for
+
+from hotel.availability import parse_stay
+from hotel.catalog import all_rooms, rooms_for_sale, rooms_free
+from hotel.extensions import db
+from hotel.guests import bookings_token, contact_key, find_booking, guest_bookings, read_token
+from hotel.models import Booking, Room
+from hotel.payments import payment_state, start_payment
+from hotel.pricing import quote_room
+from hotel.query_budget import query_budget
+from hotel.reservations import SoldOut
+from hotel.services import reservations, room_availability, sync_booking
+from hotel.templating import stream_page
+
+bp = Blueprint('customer', __name__)
+
+
+@bp.route("/booking")
+def booking():
+    return render_template("booking.html", idempotency_key=uuid.uuid4().hex)
+
+
+# Route to process the booking form submission
+@bp.route('/process-booking/<int:room_id>', methods=['POST'])
+def process_booking(room_id):
+    room = Room.query.get_or_404(room_id)
+
+    customer_name = request.form['customer_name']
+    email = request.form['email']
+    phone = request.form['phone']
+    checkin_date_str = request.form['checkin_date']
+    checkout_date_str = request.form['checkout_date']
+    payment_method = request.form['payment_method']
+
+    # Convert string to date object
+    checkin_date = datetime.strptime(checkin_date_str, '%Y-%m-%d').date()
+    checkout_date = datetime.strptime(checkout_date_str, '%Y-%m-%d').date()
+
+    # A retried submit carries the same key and gets the booking the first attempt created
+    idempotency_key = request.form.get('idempotency_key') or request.headers.get('Idempotency-Key')
+
+    # Save the booking under the room type's inventory lock so it can't be oversold
+    try:
+        stay_quote = quote_room(room, checkin_date, checkout_date)
+        booking = reservations().book(room.id, checkin_date, checkout_date, idempotency_key=idempotency_key,
+                                      customer_name=customer_name, email=email, phone=phone,
+                                      payment_method=payment_method,
+                                      price=stay_quote.total if stay_quote else None)
+    except (SoldOut, ValueError):
+        return redirect(url_for('public.room_details'))
+    sync_booking(booking)
+
+    # Redirect to payment confirmation page (you can modify this)
+    return redirect(url_for('customer.payment', booking_id=booking.id))
+
+
+# Route to handle the payment
+@bp.route('/payment/<int:booking_id>', methods=['GET', 'POST'])
+def payment(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+
+    if request.method == 'POST':
+        # The capture runs in the background; the guest waits on the processing page
+        start_payment(booking, request.form.get('payment_method'))
+        return redirect(url_for('customer.payment_processing', booking_id=booking.id))
+
+    return render_template('payment.html', booking=booking)
+
+
+@bp.route('/payment/<int:booking_id>/processing')
+def payment_processing(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+    if booking.payment_status == 'paid':
+        return redirect(url_for('customer.booking_confirmation', booking_id=booking.id))
+    return render_template('payment_processing.html', booking=booking)
+
+
+# Polled by the processing page until the capture job has finished
+@bp.route('/payment/<int:booking_id>/status')
+def payment_status(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+    return jsonify(payment_state(booking))
+
+
+# Route to display booking confirmation
+@bp.route('/booking_confirmation/<int:booking_id>')
+def booking_confirmation(booking_id):
+    booking = Booking.query.get_or_404(booking_id)
+    return render_template('booking_confirmation.html', booking=booking)
+
+
+# Rooms free for ?checkin_date=&checkout_date=, one unit per room
+@bp.route('/customer', methods=['GET'])
+@query_budget(3)
+def customer_view_rooms():
+    try:
+        checkin_date, checkout_date = parse_stay(request.args)
+    except ValueError:
+        return redirect(url_for('customer.customer_view_rooms'))
+
+    if checkin_date:
+        rooms = rooms_free(checkin_date, checkout_date, room_availability())
+    else:
+        rooms = rooms_for_sale()
+    return stream_page('customer_rooms.html', rooms=rooms)
+
+
+@bp.route('/book_room/<int:room_id>', methods=['GET', 'POST'])
+def book_room(room_id):
+    room = Room.query.get_or_404(room_id)
+    if request.method == 'POST':
+        customer_name = request.form['customer_name']
+        try:
+            checkin_date, checkout_date = parse_stay(request.form)
+        except ValueError:
+            return render_template('book_room.html', room=room)
+        if not checkin_date or not room_availability().is_available(room.id, checkin_date, checkout_date):
+            return redirect(url_for('customer.customer_view_rooms'))
+        stay_quote = quote_room(room, checkin_date, checkout_date)
+        try:
+            booking = reservations().book(room.id, checkin_date, checkout_date, customer_name=customer_name,
+                                          price=stay_quote.total if stay_quote else None)
+        except SoldOut:
+            return redirect(url_for('customer.customer_view_rooms'))
+        sync_booking(booking)
+        return redirect(url_for('customer.payment', booking_id=booking.id))
+    return render_template('book_room.html', room=room)
+
+
+# app.py's dashboard listed every guest's bookings; guests now look up their own
+@bp.route('/customer/dashboard')
+def customer_dashboard():
+    return redirect(url_for('customer.guest_dashboard'))
+
+
+# Guest Registration (Booking Room)
+@bp.route('/guest/registration', methods=['GET', 'POST'])
+def guest_registration():
+    rooms = all_rooms()  # Fetch all rooms to display in the form
+    if request.method == 'POST':
+        guest_name = (request.form.get('guest_name') or '').strip()
+        guest_email = request.form.get('guest_email')
+        guest_phone = request.form.get('guest_phone')
+        room_id = request.form.get('room_id', type=int)  # This is the room selected by the user
+
+        # Fetch the room from the database to get the correct price
+        room = db.session.get(Room, room_id) if room_id is not None else None
+
+        if not room:
+            return "Selected room not found", 404
+
+        try:
+            check_in, check_out = parse_stay(request.form, 'check_in', 'check_out')
+        except ValueError:
+            check_in = check_out = None
+        if not guest_name or check_in is None:
+            return render_template('guest_registration.html', rooms=rooms,
+                                   error='Enter your name and a check-out date after the check-in date.'), 400
+
+        stay_quote = quote_room(room, check_in, check_out)  # rate plan price for the whole stay
+        # The same locked, oversell-safe path as the API
+        try:
+            new_booking = reservations().book(room.id, check_in, check_out, customer_name=guest_name,
+                                              email=guest_email, phone=guest_phone,
+                                              price=stay_quote.total if stay_quote else room.price)
+        except SoldOut:
+            return render_template('guest_registration.html', rooms=rooms,
+                                   error='That room type is sold out for those dates.'), 409
+        sync_booking(new_booking)
+
+        # Only the new booking's reference: typing an email here mustn't lead to that guest's other
+        # bookings, so the "my bookings" link is only handed out by the reference + contact lookup
+        return render_template('guest_lookup.html', reference=new_booking.reference,
+                               notice=f'Booked. Your booking reference is {new_booking.reference}; '
+                                      'keep it to look up your booking.')
+
+    return render_template('guest_registration.html', rooms=rooms)
+
+
+# Guest Dashboard Route: a booking reference plus the booking's email or phone leads to that guest's bookings
+@bp.route('/guest', methods=['GET', 'POST'])
+@query_budget(1)
+def guest_dashboard():
+    if request.method == 'POST':
+        reference = request.form.get('reference', '')
+        booking = find_booking(reference, request.form.get('contact'))
+        if booking is None:
+            # The same answer whichever part was wrong, so references can't be probed
+            return render_template('guest_lookup.html', reference=reference,
+                                   error="We couldn't find a booking with those details.")
+        return redirect(url_for('customer.my_bookings', token=bookings_token(contact_key(request.form['contact']))))
+    return render_template('guest_lookup.html')
+
+
+# The signed link from the lookup; nobody else's bookings, and the browser may keep it briefly
+@bp.route('/guest/bookings/<token>')
+@query_budget(1)
+def my_bookings(token):
+    try:
+        key = read_token(token)
+    except ValueError:
+        abort(404)
+    response = make_response(render_template('guest_dashboard.html', bookings=guest_bookings(key)))
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest()[:20])
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['GUEST_CACHE_MAX_AGE']
+    response.headers['Referrer-Policy'] = 'no-referrer'  # the token is in the URL
+    response.headers['X-Robots-Tag'] = 'noindex'
+    return response.make_conditional(request)
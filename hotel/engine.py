@@ -0,0 +1,52 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Engine options per backend, applied by create_app before db.init_app.
+#
+# SQLite gets connect-time pragmas: WAL lets readers run alongside the single
+# writer, synchronous=NORMAL drops the fsync per commit (still durable against
+# application crashes under WAL), busy_timeout makes a second writer wait
+# instead of failing with "database is locked", and mmap/cache sizes keep hot
+# pages in memory. Server databases (PostgreSQL) get a sized QueuePool instead.
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if is_sqlite(uri):
+        # Matches the busy_timeout pragma, so waiting also covers the driver's own lock handling
+        timeout = config['SQLITE_PRAGMAS'].get('busy_timeout', 5000) / 1000
+        return {'connect_args': {'timeout': timeout}}
+    return {
+        'pool_size': config['DATABASE_POOL_SIZE'],
+        'max_overflow': config['DATABASE_MAX_OVERFLOW'],
+        'pool_recycle': config['DATABASE_POOL_RECYCLE'],
+        'pool_timeout': config['DATABASE_POOL_TIMEOUT'],
+        'pool_pre_ping': True,
+    }
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def init_engine_options(app):
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+
+# Called after db.init_app, once the engines exist
+def init_engines(app, db):
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'])
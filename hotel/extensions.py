@@ -0,0 +1,4 @@
+from flask_sqlalchemy import SQLAlchemy
+
+# Shared by main.py, app.py and test.py; each entry point binds it with db.init_app(app)
+db = SQLAlchemy()
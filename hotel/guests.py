@@ -0,0 +1,65 @@
+import hmac
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from hotel.models import Booking, normalize_email, normalize_phone, normalize_reference
+
+# Guest self-service.
+#
+# A guest proves who they are with a booking reference plus the email or phone
+# the booking was made with; both are single index lookups since contact
+# details are stored normalized. They then get a signed link to "my bookings",
+# which lists only the bookings made with that email or phone. The link carries
+# the contact detail and a timestamp signed with SECRET_KEY, so the page needs
+# no session and can be cached privately by the guest's browser.
+
+SALT = 'guest-bookings'
+
+
+# ('email', value) or ('phone', value) for what a guest typed, or None
+def contact_key(contact):
+    contact = (contact or '').strip()
+    if '@' in contact:
+        return ('email', normalize_email(contact))
+    phone = normalize_phone(contact)
+    return ('phone', phone) if phone else None
+
+
+# The booking with `reference` if it was made with `contact`, else None
+def find_booking(reference, contact):
+    reference, key = normalize_reference(reference), contact_key(contact)
+    if not reference or key is None:
+        return None
+    booking = Booking.query.filter_by(reference=reference).first()
+    if booking is None:
+        return None
+    stored = getattr(booking, key[0]) or ''
+    return booking if hmac.compare_digest(stored, key[1]) else None
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=SALT)
+
+
+def bookings_token(key):
+    return _serializer().dumps(list(key))
+
+
+# The (kind, value) a token was issued for; ValueError when it is forged or expired
+def read_token(token):
+    try:
+        kind, value = _serializer().loads(token, max_age=current_app.config['GUEST_LINK_MAX_AGE'])
+    except (BadSignature, ValueError, TypeError):
+        raise ValueError('invalid or expired link')
+    if kind not in ('email', 'phone'):
+        raise ValueError('invalid link')
+    return kind, value
+
+
+# Newest stays first, at most GUEST_BOOKINGS_LIMIT of them
+def guest_bookings(key):
+    column = Booking.email if key[0] == 'email' else Booking.phone
+    return Booking.query.filter(column == key[1]) \
+        .order_by(Booking.checkin_date.desc(), Booking.id.desc()) \
+        .limit(current_app.config['GUEST_BOOKINGS_LIMIT']).all()
@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, true
+
+from hotel import journal
+from hotel.extensions import db
+from hotel.models import Booking, utcnow
+from hotel.services import record_booking, sync_booking
+
+logger = logging.getLogger(__name__)
+
+# Expiry of unpaid holds.
+#
+# A booking made online holds its room from the moment it is created (hold is
+# set by Reservations.book). If it is still pending and unpaid HOLD_TTL seconds
+# later, it is cancelled (payment_status 'expired') and its nights go back on
+# sale. Imported bookings and ones whose status staff have set are not holds and
+# never expire. Candidates come from a range scan of
+# ix_booking_status_hold_created, so a sweep only reads holds that have actually
+# expired. Each release is a conditional UPDATE, so a payment starting at the
+# same moment, or another process sweeping too, can't race it.
+
+RELEASABLE = ('pending', 'failed')  # payment states of an abandoned hold; 'processing' is left alone
+
+
+def _expired(cutoff, limit):
+    return db.session.query(Booking.id, Booking.room_type, Booking.room_id, Booking.checkin_date,
+                            Booking.checkout_date) \
+        .filter(Booking.status == 'pending', Booking.hold == true(), Booking.created_at < cutoff,
+                Booking.payment_status.in_(RELEASABLE)) \
+        .order_by(Booking.created_at).limit(limit).all()
+
+
+# Release every hold older than HOLD_TTL, one transaction per batch; returns how many were released
+def expire_holds(now=None):
+    config = current_app.config
+    cutoff = (now or utcnow()) - timedelta(seconds=config['HOLD_TTL'])
+    released = 0
+    while True:
+        candidates = _expired(cutoff, config['HOLD_SWEEP_BATCH'])
+        db.session.commit()  # the releases below start a fresh write transaction
+        batch = []
+        for booking in candidates:
+            updated = Booking.query.filter(Booking.id == booking.id, Booking.status == 'pending',
+                                           Booking.hold == true(), Booking.payment_status.in_(RELEASABLE)) \
+                .update({Booking.status: 'cancelled', Booking.payment_status: 'expired'},
+                        synchronize_session=False)
+            if updated:
+                record_booking(booking, -1)
+                batch.append(booking)
+        if batch:
+            # The UPDATEs bypass the ORM's flush, so their journal events are written here
+            ids = [booking.id for booking in batch]
+            rows = db.session.execute(select(Booking.__table__).where(Booking.id.in_(ids))).mappings()
+            journal.append_rows(db.session, 'status', rows)
+        db.session.commit()
+        for booking in batch:
+            sync_booking(booking, deleted=True)
+        released += len(batch)
+        if len(candidates) < config['HOLD_SWEEP_BATCH']:
+            return released
+
+
+# Runs expire_holds every HOLD_SWEEP_INTERVAL seconds on a background thread of
+# this process, started on the first request, and keeps the counters for /admin/holds.
+class HoldSweeper:
+    def __init__(self, app):
+        self.app = app
+        self.sweeps = 0
+        self.released = 0
+        self.last_sweep_at = None
+        self.last_released = 0
+        self.last_duration_ms = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        if self._pid == os.getpid() or not self.app.config['HOLD_SWEEP_IN_PROCESS']:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._loop, name='hold-sweeper', daemon=True).start()
+
+    def sweep(self):
+        started = time.perf_counter()
+        with self.app.app_context():
+            released = expire_holds()
+        with self._lock:
+            self.sweeps += 1
+            self.released += released
+            self.last_released = released
+            self.last_sweep_at = utcnow()
+            self.last_duration_ms = (time.perf_counter() - started) * 1000
+        if released:
+            logger.info('released %d expired holds', released)
+        return released
+
+    def _loop(self):
+        while True:
+            time.sleep(self.app.config['HOLD_SWEEP_INTERVAL'])
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception('hold sweep failed')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hold_ttl_seconds': self.app.config['HOLD_TTL'],
+                'sweeps': self.sweeps,
+                'holds_released': self.released,
+                'last_sweep_at': self.last_sweep_at.isoformat() if self.last_sweep_at else None,
+                'last_sweep_released': self.last_released,
+                'last_sweep_ms': self.last_duration_ms,
+            }
+
+
+def hold_sweeper():
+    return current_app.extensions['hold_sweeper']
+
+
+def init_holds(app):
+    sweeper = HoldSweeper(app)
+    app.extensions['hold_sweeper'] = sweeper
+    app.before_request(sweeper.start)
+
+
+holds_cli = AppGroup('holds', help='Expire unpaid booking holds.')
+
+
+# Separate sweeper process, for when the web processes run with HOLD_SWEEP_IN_PROCESS = False
+@holds_cli.command('expire')
+@click.option('--loop', is_flag=True, help='Keep sweeping every HOLD_SWEEP_INTERVAL seconds.')
+def expire_command(loop):
+    sweeper = HoldSweeper(current_app._get_current_object())
+    while True:
+        click.echo(f'{sweeper.sweep()} holds released')
+        if not loop:
+            return
+        time.sleep(current_app.config['HOLD_SWEEP_INTERVAL'])
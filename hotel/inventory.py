@@ -0,0 +1,129 @@
+from collections import Counter, defaultdict
+
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from hotel.availability import nights
+
+
+# Helpers for the RoomNightInventory table: one row per (room_type, night)
+# holding how many units of that type are sold for the night. Callers apply
+# deltas inside the same transaction as the booking change, so an availability
+# check over a stay is a single primary-key range read instead of a count over
+# every overlapping Booking row.
+
+def _in_range(inventory_model, room_type, checkin, checkout):
+    return (inventory_model.room_type == room_type,
+            inventory_model.night >= checkin,
+            inventory_model.night < checkout)
+
+
+# Add `delta` (+1 for a new hold, -1 for a release) to every night of the stay
+def record_stay(session, inventory_model, room_type, checkin, checkout, delta=1):
+    in_range = _in_range(inventory_model, room_type, checkin, checkout)
+    session.query(inventory_model).filter(*in_range) \
+        .update({inventory_model.sold: inventory_model.sold + delta}, synchronize_session=False)
+    existing = {night for (night,) in session.query(inventory_model.night).filter(*in_range)}
+    for night in nights(checkin, checkout):
+        if night not in existing:
+            session.add(inventory_model(room_type=room_type, night=night, sold=delta))
+
+
+# Stored rows (plain tuples, not ORM objects) of a table keyed by (room_type, night) for
+# exactly `keys`, a batch of keys per query. Filtering by the room types and the date
+# span instead reads most of the table once a batch covers many room types, and SQLite
+# won't use the primary key for a (room_type, night) IN (...) row-value match, so each
+# batch asks for `room_type = ? AND night IN (...)` per room type.
+def rows_by_key(session, model, keys, batch_size=400):
+    keys = sorted(keys)
+    found = {}
+    for start in range(0, len(keys), batch_size):
+        by_type = defaultdict(list)
+        for room_type, night in keys[start:start + batch_size]:
+            by_type[room_type].append(night)
+        rows = session.execute(select(*model.__table__.columns).where(or_(*(
+            and_(model.room_type == room_type, model.night.in_(nights)) for room_type, nights in by_type.items()))))
+        for row in rows:
+            found[row.room_type, row.night] = row
+    return found
+
+
+# Add {(room_type, night): {column: delta}} to a table keyed by (room_type, night); the caller
+# commits. Stored rows get one executemany `column = column + delta` UPDATE, so writers running
+# at the same time add up instead of overwriting each other's totals. Missing rows are inserted
+# in a savepoint; when another transaction created some of them first, those are added to instead.
+def add_by_key(session, model, deltas):
+    table = model.__table__
+    names = list(next(iter(deltas.values()), {}))  # every entry carries the same columns
+    add = update(table).where(table.c.room_type == bindparam('key_type'), table.c.night == bindparam('key_night')) \
+        .values({name: table.c[name] + bindparam('add_' + name) for name in names})
+    pending = dict(deltas)
+    while pending:
+        stored = rows_by_key(session, model, pending)
+        updates = [dict({'add_' + name: columns[name] for name in names}, key_type=key[0], key_night=key[1])
+                   for key, columns in pending.items() if key in stored]
+        if updates:
+            session.execute(add, updates)
+        pending = {key: columns for key, columns in pending.items() if key not in stored}
+        if not pending:
+            return
+        try:
+            with session.begin_nested():
+                session.execute(insert(table), [dict(columns, room_type=key[0], night=key[1])
+                                                for key, columns in pending.items()])
+            return
+        except IntegrityError:
+            pass  # lost the race to create a row: read again and add to it
+
+
+# Apply a {(room_type, night): delta} mapping in bulk, e.g. for a batch of imported bookings
+def add_counts(session, inventory_model, counts):
+    add_by_key(session, inventory_model, {key: {'sold': delta} for key, delta in counts.items()})
+
+
+# Units sold on the busiest night of [checkin, checkout)
+def peak_sold(session, inventory_model, room_type, checkin, checkout):
+    peak = session.query(func.max(inventory_model.sold)) \
+        .filter(*_in_range(inventory_model, room_type, checkin, checkout)).scalar()
+    return peak or 0
+
+
+# Busiest night of [checkin, checkout) for every room type that has sales in the range
+def peak_sold_by_type(session, inventory_model, checkin, checkout):
+    rows = session.query(inventory_model.room_type, func.max(inventory_model.sold)) \
+        .filter(inventory_model.night >= checkin, inventory_model.night < checkout) \
+        .group_by(inventory_model.room_type)
+    return dict(rows)
+
+
+# Counters as they should be, from (room_type, checkin, checkout, booking_id) rows
+def expected_counts(stays):
+    counts = Counter()
+    for room_type, checkin, checkout, _ in stays:
+        for night in nights(checkin, checkout):
+            counts[room_type, night] += 1
+    return counts
+
+
+# List (room_type, night, stored, expected) for every counter that disagrees with the bookings
+def find_drift(session, inventory_model, stays):
+    expected = expected_counts(stays)
+    stored = {(row.room_type, row.night): row.sold for row in session.query(inventory_model)}
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        if stored.get(key, 0) != expected.get(key, 0):
+            drift.append((key[0], key[1], stored.get(key, 0), expected.get(key, 0)))
+    return drift
+
+
+# Recompute every counter from the bookings; returns the drift that was repaired
+def rebuild(session, inventory_model, stays):
+    stays = list(stays)
+    drift = find_drift(session, inventory_model, stays)
+    session.query(inventory_model).delete(synchronize_session=False)
+    rows = [{'room_type': room_type, 'night': night, 'sold': sold}
+            for (room_type, night), sold in expected_counts(stays).items()]
+    if rows:
+        session.execute(insert(inventory_model), rows)
+    session.commit()
+    return drift
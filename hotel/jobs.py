@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import random
+import threading
+from collections import Counter
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, or_
+
+from hotel.extensions import db
+from hotel.models import Job, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Background job queue stored in the database.
+#
+# submit() records a job and returns at once; worker threads (in each web
+# process, or a separate `flask jobs work` process) claim due jobs with a
+# conditional UPDATE, so any number of workers can share the table without two
+# of them running the same job. A handler's database changes are committed
+# together with the job's new status. A failed attempt is retried with
+# exponential backoff until JOB_MAX_ATTEMPTS; raising JobFailed gives up at
+# once. A job whose worker died is retried once its lease runs out.
+
+HANDLERS = {}
+
+
+class JobFailed(Exception):
+    pass
+
+
+# Register `func(payload)` for jobs of `kind`; `on_failure(payload, error)` runs when the job gives up
+def handler(kind, on_failure=None):
+    def register(func):
+        HANDLERS[kind] = (func, on_failure)
+        return func
+    return register
+
+
+# Queue a job and commit it (with anything else pending in the session)
+def submit(kind, payload, reference=None, delay=0):
+    now = utcnow()
+    job = Job(kind=kind, payload=json.dumps(payload), reference=reference, status='queued', attempts=0,
+              run_at=now + timedelta(seconds=delay), created_at=now)
+    db.session.add(job)
+    db.session.commit()
+    job_runner().wake()
+    return job
+
+
+def latest(reference):
+    return Job.query.filter_by(reference=reference).order_by(Job.id.desc()).first()
+
+
+def backoff(attempts, config):
+    delay = min(config['JOB_RETRY_BACKOFF'] * 2 ** (attempts - 1), config['JOB_RETRY_MAX_DELAY'])
+    return delay * random.uniform(0.8, 1.2)  # jitter, so failed jobs don't all come back together
+
+
+# Take the next due job, or None. The UPDATE only matches while the job is still
+# unclaimed, so when two workers pick the same row only one of them gets it.
+def claim():
+    now = utcnow()
+    lease = timedelta(seconds=current_app.config['JOB_LEASE'])
+    claimable = or_(and_(Job.status == 'queued', Job.run_at <= now),
+                    and_(Job.status == 'running', Job.locked_until < now))  # its worker vanished mid-run
+    due = [job_id for (job_id,) in db.session.query(Job.id)
+           .filter(Job.status == 'queued', Job.run_at <= now).order_by(Job.run_at).limit(10)]
+    if not due:
+        due = [job_id for (job_id,) in db.session.query(Job.id)
+               .filter(Job.status == 'running', Job.locked_until < now).limit(10)]
+    for job_id in due:
+        claimed = Job.query.filter(Job.id == job_id, claimable) \
+            .update({Job.status: 'running', Job.attempts: Job.attempts + 1, Job.locked_until: now + lease},
+                    synchronize_session=False)
+        if claimed:
+            db.session.commit()
+            return db.session.get(Job, job_id)
+    db.session.commit()
+    return None
+
+
+# Run a claimed job and record the outcome; returns the job's new status
+def execute(job):
+    config = current_app.config
+    job_id, kind, attempts = job.id, job.kind, job.attempts
+    payload = json.loads(job.payload)
+    func, on_failure = HANDLERS[kind]
+    try:
+        result = func(payload)
+    except Exception as error:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = f'{type(error).__name__}: {error}'
+        job.locked_until = None
+        if isinstance(error, JobFailed) or attempts >= config['JOB_MAX_ATTEMPTS']:
+            logger.warning('job %s (%s) failed after %d attempts: %s', job_id, kind, attempts, error)
+            job.status = 'failed'
+            job.finished_at = utcnow()
+            if on_failure is not None:
+                on_failure(payload, error)
+        else:
+            job.status = 'queued'
+            job.run_at = utcnow() + timedelta(seconds=backoff(attempts, config))
+        db.session.commit()
+        return 'retried' if job.status == 'queued' else 'failed'
+    job = db.session.get(Job, job_id)
+    job.status = 'succeeded'
+    job.result = json.dumps(result)
+    job.locked_until = None
+    job.finished_at = utcnow()
+    db.session.commit()
+    return 'succeeded'
+
+
+# Worker threads for one process. They start with the process's first request (or
+# submit()) rather than at import, so forked web workers each get their own, startup
+# stays cheap, and jobs queued or delayed before this process started still run.
+class JobRunner:
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self.processed = Counter()  # succeeded / retried / failed
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def start(self):
+        if self._pid == os.getpid() or not self.workers:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._threads = [threading.Thread(target=self._loop, name=f'job-worker-{n}', daemon=True)
+                             for n in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._lock:
+            self._threads = []
+            self._pid = None
+
+    # Claim and run one due job; False when there was nothing to do
+    def run_next(self):
+        with self.app.app_context():
+            try:
+                job = claim()
+                if job is None:
+                    return False
+                outcome = execute(job)
+            except Exception:
+                logger.exception('job worker error')
+                db.session.rollback()
+                return False
+        with self._lock:
+            self.processed[outcome] += 1
+        return True
+
+    # Run due jobs on the calling thread until none are left
+    def drain(self):
+        count = 0
+        while self.run_next():
+            count += 1
+        return count
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            if not self.run_next():
+                self._wakeup.wait(self.app.config['JOB_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+
+def job_runner():
+    return current_app.extensions['job_runner']
+
+
+def init_jobs(app):
+    runner = JobRunner(app, app.config['JOB_WORKERS'])
+    app.extensions['job_runner'] = runner
+    app.before_request(runner.start)
+
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+
+# Dedicated worker process, for when the web processes run with JOB_WORKERS = 0
+@jobs_cli.command('work')
+@click.option('--threads', type=int, default=4, show_default=True)
+@click.option('--once', is_flag=True, help='Run the jobs that are due now, then exit.')
+def work_command(threads, once):
+    runner = JobRunner(current_app._get_current_object(), threads)
+    if once:
+        click.echo(f'{runner.drain()} jobs run')
+        return
+    runner.start()
+    click.echo(f'running jobs on {threads} threads, Ctrl+C to stop')
+    try:
+        for thread in runner._threads:
+            thread.join()
+    except KeyboardInterrupt:
+        runner.stop(timeout=30)
+
+
+@jobs_cli.command('status')
+def status_command():
+    rows = db.session.query(Job.kind, Job.status, db.func.count()).group_by(Job.kind, Job.status)
+    for kind, status, count in rows:
+        click.echo(f'{kind:20} {status:10} {count}')
@@ -0,0 +1,319 @@
+import gzip
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, inspect, insert, select
+
+from hotel import inventory
+from hotel.catalog import JOURNAL, load_versions
+from hotel.extensions import db
+from hotel.models import Booking, BookingEvent, JournalCursor, JournalSnapshot, RoomNightInventory, utcnow
+
+# Append-only journal of booking changes.
+#
+# Every insert, update and delete of a Booking appends a BookingEvent carrying
+# the whole row after the change. A flush hook writes them on the flush's own
+# connection, so they commit or roll back with the change, and a flush touching
+# many bookings appends all of its events in one executemany. Writes that go
+# around the ORM (bulk import, hold expiry) append theirs with append_rows().
+# Nothing ever updates or deletes an event.
+#
+# Since each event is a full row, the state at any position is the snapshot
+# before it plus the events after, last one wins, and replaying an event twice
+# changes nothing. `flask journal snapshot` (from cron) stores every row with
+# the position it includes, so a replay only reads what came after. Readers
+# tail the log by position: JournalReader keeps a named cursor in the database
+# for consumers outside the web app, and every web process follows the log to
+# patch its availability indexes instead of reloading them.
+
+COLUMNS = tuple(column.name for column in Booking.__table__.columns)
+EVENTS = BookingEvent.__table__
+READ_BATCH = 5000
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+# Append one event per row ({column: value}); the caller commits
+def append_rows(connection, kind, rows):
+    now = utcnow()
+    events = [{'booking_id': row['id'], 'kind': kind, 'created_at': now,
+               'data': _dumps({name: _json_value(row.get(name)) for name in COLUMNS})} for row in rows]
+    if events:
+        connection.execute(insert(EVENTS), events)
+    return len(events)
+
+
+def _kind(booking):
+    attrs = inspect(booking).attrs
+    changed = {name for name in COLUMNS if attrs[name].history.has_changes()}
+    if 'status' in changed:
+        return 'status'
+    if 'payment_status' in changed:
+        return 'payment'
+    return 'updated' if changed else None
+
+
+# Runs with the flush's new/dirty/deleted sets and attribute history still in place
+def _after_flush(session, flush_context):
+    rows = {'created': [], 'updated': [], 'status': [], 'payment': [], 'deleted': []}
+    for booking in session.new:
+        if isinstance(booking, Booking):
+            rows['created'].append({name: getattr(booking, name) for name in COLUMNS})
+    for booking in session.dirty:
+        if isinstance(booking, Booking):
+            kind = _kind(booking)
+            if kind is not None:
+                rows[kind].append({name: getattr(booking, name) for name in COLUMNS})
+    for booking in session.deleted:
+        if isinstance(booking, Booking):
+            rows['deleted'].append(dict(inspect(booking).dict))  # the row is gone, so no loading
+    connection = None
+    for kind, kind_rows in rows.items():
+        if kind_rows:
+            connection = connection or session.connection()
+            append_rows(connection, kind, kind_rows)
+
+
+def read_events(connection, after, limit=READ_BATCH, until=None):
+    query = select(EVENTS).where(EVENTS.c.id > after).order_by(EVENTS.c.id).limit(limit)
+    if until is not None:
+        query = query.where(EVENTS.c.id <= until)
+    return connection.execute(query).all()
+
+
+def last_position(connection):
+    return connection.execute(select(func.max(EVENTS.c.id))).scalar() or 0
+
+
+# An event's booking as an object with dates, shaped like the model for sync_booking()
+def booking_state(data):
+    state = SimpleNamespace(**data)
+    state.checkin_date = date.fromisoformat(data['checkin_date'])
+    state.checkout_date = date.fromisoformat(data['checkout_date'])
+    return state
+
+
+# Store every booking row with the position it includes; keeps the `keep` newest snapshots.
+# The position is read first: an event committed in between is then replayed on top of a
+# row that already has it, which changes nothing.
+def take_snapshot(connection, keep=None):
+    position = last_position(connection)
+    rows = [[_json_value(row[name]) for name in COLUMNS]
+            for row in connection.execute(select(Booking.__table__)).mappings()]
+    data = gzip.compress(_dumps({'columns': COLUMNS, 'rows': rows}).encode('utf-8'), 6)
+    connection.execute(insert(JournalSnapshot.__table__).values(
+        position=position, bookings=len(rows), data=data, created_at=utcnow()))
+    if keep:
+        snapshots = JournalSnapshot.__table__
+        stale = select(snapshots.c.id).order_by(snapshots.c.position.desc(), snapshots.c.id.desc()).offset(keep)
+        connection.execute(delete(snapshots).where(snapshots.c.id.in_(stale.scalar_subquery())))
+    return position, len(rows), len(data)
+
+
+def _load_snapshot(snapshot):
+    payload = json.loads(gzip.decompress(snapshot.data))
+    columns = payload['columns']
+    return {row[columns.index('id')]: dict(zip(columns, row)) for row in payload['rows']}
+
+
+# {booking_id: row} as of event `until` (default: the latest), and the position it reflects
+def replay(connection, until=None):
+    snapshots = JournalSnapshot.__table__
+    query = select(snapshots).order_by(snapshots.c.position.desc(), snapshots.c.id.desc()).limit(1)
+    if until is not None:
+        query = query.where(snapshots.c.position <= until)
+    snapshot = connection.execute(query).first()
+    bookings = _load_snapshot(snapshot) if snapshot is not None else {}
+    position = snapshot.position if snapshot is not None else 0
+    while True:
+        events = read_events(connection, position, READ_BATCH, until)
+        for row in events:
+            if row.kind == 'deleted':
+                bookings.pop(row.booking_id, None)
+            else:
+                bookings[row.booking_id] = json.loads(row.data)
+        if events:
+            position = events[-1].id
+        if len(events) < READ_BATCH:
+            return bookings, position
+
+
+# (booking_id, problem) for every booking whose row disagrees with the replayed journal
+def compare(connection, bookings):
+    problems = []
+    seen = set()
+    for row in connection.execute(select(Booking.__table__).order_by(Booking.id)).mappings():
+        seen.add(row['id'])
+        replayed = bookings.get(row['id'])
+        if replayed is None:
+            problems.append((row['id'], 'not in the journal'))
+            continue
+        differing = [name for name in COLUMNS if replayed.get(name) != _json_value(row[name])]
+        if differing:
+            problems.append((row['id'], 'differs in ' + ', '.join(differing)))
+    problems.extend((booking_id, 'deleted from the table') for booking_id in sorted(set(bookings) - seen))
+    return problems
+
+
+# Out-of-process consumer with its position kept in journal_cursor under `name`. Delivery is
+# at least once: commit() the position after handling what read() returned.
+class JournalReader:
+    def __init__(self, name, gap_grace=5.0):
+        self.name = name
+        self.gap_grace = gap_grace
+
+    @property
+    def position(self):
+        cursor = db.session.get(JournalCursor, self.name)
+        return cursor.position if cursor is not None else 0
+
+    # The next events in order. On a server database ids can commit out of order, so a hole
+    # in the ids is waited on for gap_grace seconds in case the missing event is still in flight.
+    def read(self, limit=500):
+        position = self.position
+        events = read_events(db.session, position, limit)
+        settled = utcnow() - timedelta(seconds=self.gap_grace)
+        ready = []
+        for row in events:
+            if row.id != position + 1 and row.created_at > settled:
+                break
+            ready.append(row)
+            position = row.id
+        db.session.commit()
+        return ready
+
+    def commit(self, position):
+        cursor = db.session.get(JournalCursor, self.name)
+        if cursor is None:
+            cursor = JournalCursor(name=self.name)
+            db.session.add(cursor)
+        cursor.position = position
+        cursor.updated_at = utcnow()
+        db.session.commit()
+
+
+# Keeps this process's availability indexes in step with bookings changed by other processes:
+# when the cache versions move, the events since the last catch-up are applied with
+# `apply(kind, state)` instead of dropping the indexes. On the first request, or when far
+# behind, it calls `reset()` instead. The latest position comes with the cache versions, so
+# catching up costs one read of the new events. An event committing out of id order on a
+# server database can be missed; the indexes' own TTL reload still picks it up.
+class JournalFollower:
+    def __init__(self, apply, reset, catch_up_max=5000):
+        self._apply = apply
+        self._reset = reset
+        self.catch_up_max = catch_up_max
+        self.position = None
+        self.applied = 0
+        self.resets = 0
+        self._lock = threading.Lock()
+
+    def catch_up(self):
+        latest = load_versions().get(JOURNAL, 0)
+        with self._lock:
+            if self.position is None or not 0 <= latest - self.position <= self.catch_up_max:
+                # Taken before the indexes reload, so nothing between the two is missed
+                self.position = latest
+                self._reset()
+                self.resets += 1
+                return
+            if latest == self.position:
+                return
+            events = read_events(db.session, self.position, self.catch_up_max, until=latest)
+            for row in events:
+                self._apply(row.kind, booking_state(json.loads(row.data)))
+            self.position = latest
+            self.applied += len(events)
+
+
+def journal_follower():
+    return current_app.extensions['journal_follower']
+
+
+def init_journal(app):
+    from hotel.services import availability_reset, sync_booking
+
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+    app.extensions['journal_follower'] = JournalFollower(
+        lambda kind, state: sync_booking(state, deleted=kind == 'deleted'), availability_reset,
+        app.config['JOURNAL_CATCH_UP_MAX'])
+
+
+journal_cli = AppGroup('journal', help='Snapshot, replay and tail the booking journal.')
+
+
+#   flask journal snapshot
+@journal_cli.command('snapshot', help='Store every booking as of the latest event.')
+def snapshot_command():
+    position, bookings, size = take_snapshot(db.session, current_app.config['JOURNAL_SNAPSHOT_KEEP'])
+    db.session.commit()
+    click.echo(f'snapshot of {bookings} bookings at event {position}, {size} bytes')
+
+
+# Rebuild booking and inventory state from the last snapshot and the events after it, and
+# report where the tables disagree with it (with --until, only count the bookings then):
+#   flask journal replay [--until 1200] [--rebuild-inventory]
+@journal_cli.command('replay', help='Replay the journal and report where the tables disagree with it.')
+@click.option('--until', type=int, help='Replay up to this event instead of the latest.')
+@click.option('--rebuild-inventory', is_flag=True, help='Rewrite the per-night counters from the replayed bookings.')
+def replay_command(until, rebuild_inventory):
+    started = time.perf_counter()
+    bookings, position = replay(db.session, until)
+    click.echo(f'{len(bookings)} bookings at event {position}, replayed in {time.perf_counter() - started:.2f} s')
+    if until is not None:
+        return
+    problems = compare(db.session, bookings)
+    for booking_id, problem in problems[:50]:
+        click.echo(f'booking {booking_id}: {problem}')
+    click.echo(f'{len(problems)} bookings disagree with the journal')
+    stays = [(state.room_type, state.checkin_date, state.checkout_date, state.id)
+             for state in map(booking_state, bookings.values()) if state.status != 'cancelled']
+    if rebuild_inventory:
+        drift = inventory.rebuild(db.session, RoomNightInventory, stays)
+    else:
+        drift = inventory.find_drift(db.session, RoomNightInventory, stays)
+    click.echo(f'{len(drift)} inventory counters differ from the replay' + (', rewritten' if rebuild_inventory else ''))
+
+
+#   flask journal history 42
+@journal_cli.command('history', help='Print the events of one booking.')
+@click.argument('booking_id', type=int)
+def history_command(booking_id):
+    rows = db.session.execute(select(EVENTS).where(EVENTS.c.booking_id == booking_id).order_by(EVENTS.c.id))
+    for row in rows:
+        click.echo(f'{row.id} {row.created_at.isoformat()} {row.kind} {row.data}')
+
+
+# Print events as JSON lines from where reader NAME left off, moving its cursor on:
+#   flask journal tail --reader analytics [--follow]
+@journal_cli.command('tail', help="Print new events as JSON lines, moving the reader's cursor on.")
+@click.option('--reader', 'name', default='cli', show_default=True, help='Cursor to read from and move on.')
+@click.option('--follow', is_flag=True, help='Keep waiting for new events.')
+@click.option('--limit', default=500, show_default=True, help='Events per batch.')
+def tail_command(name, follow, limit):
+    config = current_app.config
+    reader = JournalReader(name, config['JOURNAL_GAP_GRACE'])
+    while True:
+        events = reader.read(limit)
+        for row in events:
+            click.echo(_dumps({'position': row.id, 'booking_id': row.booking_id, 'kind': row.kind,
+                               'at': row.created_at.isoformat(), 'booking': json.loads(row.data)}))
+        if events:
+            reader.commit(events[-1].id)
+        elif not follow:
+            return
+        else:
+            time.sleep(config['JOURNAL_TAIL_INTERVAL'])
@@ -0,0 +1,285 @@
+import copy
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, has_app_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from hotel.templating import after_stream
+
+logger = logging.getLogger(__name__)
+
+# Request metrics in the Prometheus text format, served on /metrics.
+#
+# Per endpoint: request count, latency and response size histograms, SQL
+# statement count and time (from engine events) and template render time.
+# The numbers live in this process; with several worker processes set
+# METRICS_MULTIPROCESS_DIR to a directory they share: each process writes its
+# snapshot there every few seconds and /metrics adds all snapshots up, so
+# whichever worker answers the scrape reports the totals.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values = {}
+
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, labels, value):  # for counts kept by another module, copied in before each snapshot
+        self.values[labels] = value
+
+    def merge(self, labels, value):
+        self.inc(labels, value)
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield self.name + '_total', labels, value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self.values = {}  # labels -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def merge(self, labels, value):
+        entry = self.values.get(labels)
+        if entry is None:
+            self.values[labels] = list(value)
+        else:
+            for position, amount in enumerate(value):
+                entry[position] += amount
+
+    def samples(self):
+        for labels, entry in sorted(self.values.items()):
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), entry[:-1]):
+                running += count
+                yield self.name + '_bucket', labels + (('le', _format(bound)),), running
+            yield self.name + '_sum', labels, entry[-1]
+            yield self.name + '_count', labels, running
+
+
+def _format(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []  # callables run before each snapshot, for numbers kept by other modules
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _collect(self):
+        for collect in self.collectors:
+            try:
+                collect(self)
+            except Exception:
+                logger.exception('metrics collector failed')
+
+    def snapshot(self):
+        with self.lock:
+            self._collect()
+            return {name: [[list(labels), value] for labels, value in metric.values.items()]
+                    for name, metric in self.metrics.items()}
+
+    # Text exposition of `snapshots` added together
+    def render(self, snapshots):
+        merged = {}
+        for name, metric in self.metrics.items():
+            merged[name] = copy.copy(metric)
+            merged[name].values = {}
+        for snapshot in snapshots:
+            for name, entries in snapshot.items():
+                if name in merged:
+                    for labels, value in entries:
+                        merged[name].merge(tuple(tuple(pair) for pair in labels), value)
+        lines = []
+        for metric in merged.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample, labels, value in metric.samples():
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+                lines.append(f'{sample}{{{label_text}}} {_format(value)}' if label_text else f'{sample} {_format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**pairs):
+    return tuple(pairs.items())
+
+
+class RequestMetrics:
+    def __init__(self, app):
+        self.app = app
+        self.registry = registry = Registry()
+        self.requests = registry.register(Counter('hotel_http_requests', 'HTTP requests.', ('endpoint', 'method', 'status')))
+        self.latency = registry.register(Histogram('hotel_http_request_duration_seconds', 'Request latency.', ('endpoint',)))
+        self.size = registry.register(Histogram('hotel_http_response_size_bytes', 'Response body size.', ('endpoint',),
+                                                SIZE_BUCKETS))
+        self.sql_count = registry.register(Histogram('hotel_sql_queries_per_request', 'SQL statements per request.',
+                                                     ('endpoint',), COUNT_BUCKETS))
+        self.sql_time = registry.register(Histogram('hotel_sql_duration_seconds', 'SQL time per request.', ('endpoint',)))
+        self.render_time = registry.register(Histogram('hotel_template_render_seconds', 'Template render time.',
+                                                       ('template',)))
+        self._directory = app.config['METRICS_MULTIPROCESS_DIR']
+        self._last_write = 0.0
+
+    # Called after every request, or for a streamed one once it has been sent
+    def observe(self, endpoint, method, response, elapsed, sql=None):
+        # Only what's already in memory: measuring a streamed body would buffer all of it
+        length = None if response.is_streamed else response.calculate_content_length()
+        with self.registry.lock:
+            self.requests.inc(_labels(endpoint=endpoint, method=method, status=str(response.status_code)))
+            self.latency.observe(_labels(endpoint=endpoint), elapsed)
+            if length is not None:
+                self.size.observe(_labels(endpoint=endpoint), length)
+            if sql is not None:
+                self.sql_count.observe(_labels(endpoint=endpoint), sql[0])
+                self.sql_time.observe(_labels(endpoint=endpoint), sql[1])
+        if self._directory and time.monotonic() - self._last_write > self.app.config['METRICS_WRITE_INTERVAL']:
+            self.write_snapshot()
+
+    def observe_render(self, template_name, elapsed):
+        with self.registry.lock:
+            self.render_time.observe(_labels(template=template_name or 'string'), elapsed)
+
+    def write_snapshot(self):
+        self._last_write = time.monotonic()
+        path = os.path.join(self._directory, f'metrics-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as handle:
+            json.dump(self.registry.snapshot(), handle)
+        os.replace(path + '.tmp', path)
+
+    def render(self):
+        if not self._directory:
+            return self.registry.render([self.registry.snapshot()])
+        self.write_snapshot()
+        snapshots = []
+        for path in glob.glob(os.path.join(self._directory, 'metrics-*.json')):
+            try:
+                with open(path) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+        return self.registry.render(snapshots)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_metrics_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('_metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if has_app_context() and '_metrics_sql' in g:
+        g._metrics_sql[0] += 1
+        g._metrics_sql[1] += elapsed
+
+
+def _start_request():
+    g._metrics_started = time.perf_counter()
+    g._metrics_sql = [0, 0.0]
+
+
+def _finish_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return response
+    metrics = current_app.extensions['metrics']
+    endpoint, method, sql = request.endpoint or 'unmatched', request.method, g.get('_metrics_sql')
+
+    # A streamed page is timed, and its SQL counted, until its last chunk has gone out
+    def finish(completed=True):
+        metrics.observe(endpoint, method, response, time.perf_counter() - started, sql)
+
+    if not after_stream(response, finish):
+        finish()
+    return response
+
+
+def _start_render(sender, template, context, **extra):
+    g.setdefault('_metrics_renders', []).append(time.perf_counter())
+
+
+def _end_render(sender, template, context, **extra):
+    renders = g.get('_metrics_renders')
+    if renders:
+        sender.extensions['metrics'].observe_render(template.name, time.perf_counter() - renders.pop())
+
+
+# Counts the caches, job runner, hold sweeper and async server already keep, copied in at snapshot time
+def _app_counters(app, registry):
+    lookups = registry.register(Counter('hotel_room_catalog_lookups', 'Room catalog cache lookups.', ('result',)))
+    jobs = registry.register(Counter('hotel_jobs_processed', 'Background jobs run by this process.', ('outcome',)))
+    holds = registry.register(Counter('hotel_holds_released', 'Unpaid holds released by this process.'))
+    served = registry.register(Counter('hotel_async_requests', 'Requests the async server coalesced or turned away.',
+                                       ('outcome',)))
+
+    def collect(registry):
+        catalog = app.extensions.get('room_catalog')
+        if catalog is not None:
+            lookups.set(_labels(result='hit'), catalog.hits)
+            lookups.set(_labels(result='miss'), catalog.misses)
+        runner = app.extensions.get('job_runner')
+        if runner is not None:
+            for outcome, count in runner.processed.items():
+                jobs.set(_labels(outcome=outcome), count)
+        sweeper = app.extensions.get('hold_sweeper')
+        if sweeper is not None:
+            holds.set((), sweeper.released)
+        asgi_app = app.extensions.get('asgi')
+        if asgi_app is not None:
+            served.set(_labels(outcome='coalesced'), asgi_app.coalesced)
+            served.set(_labels(outcome='rejected'), asgi_app.rejected)
+    registry.collectors.append(collect)
+
+
+def metrics_view():
+    return Response(current_app.extensions['metrics'].render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    metrics = RequestMetrics(app)
+    _app_counters(app, metrics.registry)
+    app.extensions['metrics'] = metrics
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_end_render, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
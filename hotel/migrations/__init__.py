@@ -0,0 +1,79 @@
+import importlib
+import pkgutil
+import re
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, select
+
+from hotel.extensions import db
+
+# Versioned schema migrations.
+#
+# Every module in hotel/migrations/versions named NNNN_description.py defines
+# upgrade(connection) and runs once, in its own transaction, in version order.
+# Applied versions are recorded in the schema_version table, so starting a
+# worker never touches the schema; deploys run `flask db upgrade` instead.
+
+VERSIONS_PACKAGE = __name__ + '.versions'
+
+metadata = MetaData()
+schema_version = Table(
+    'schema_version', metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False, server_default=func.current_timestamp()),
+)
+
+
+# (version, module name) for every migration, oldest first
+def migrations():
+    package = importlib.import_module(VERSIONS_PACKAGE)
+    found = []
+    for module in pkgutil.iter_modules(package.__path__):
+        match = re.match(r'(\d+)_\w+$', module.name)
+        if match:
+            found.append((int(match.group(1)), module.name))
+    return sorted(found)
+
+
+def current_version(connection):
+    schema_version.create(connection, checkfirst=True)
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+# Apply every migration newer than the database, up to `target`; returns the names applied
+def upgrade(engine, target=None):
+    with engine.begin() as connection:
+        version = current_version(connection)
+    applied = []
+    for number, name in migrations():
+        if number <= version or (target is not None and number > target):
+            continue
+        module = importlib.import_module(f'{VERSIONS_PACKAGE}.{name}')
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(insert(schema_version).values(version=number, name=name))
+        applied.append(name)
+    return applied
+
+
+db_cli = AppGroup('db', help='Manage the database schema.')
+
+
+@db_cli.command('upgrade')
+@click.option('--to', 'target', type=int, help='Stop at this version.')
+def upgrade_command(target):
+    for name in upgrade(db.engine, target):
+        click.echo(f'applied {name}')
+    with db.engine.begin() as connection:
+        click.echo(f'schema at version {current_version(connection)}')
+
+
+@db_cli.command('current')
+def current_command():
+    with db.engine.begin() as connection:
+        version = current_version(connection)
+    pending = [name for number, name in migrations() if number > version]
+    click.echo(f'schema at version {version}, {len(pending)} pending' +
+               (': ' + ', '.join(pending) if pending else ''))
@@ -0,0 +1,56 @@
+from sqlalchemy import (Column, Date, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+                        UniqueConstraint)
+
+# Unified room, booking and per-night inventory tables. test.py's string
+# check_in/check_out become the Date columns checkin_date/checkout_date.
+# Tables are frozen here rather than taken from hotel.models, so later model
+# changes don't rewrite history.
+
+metadata = MetaData()
+
+Table(
+    'room', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(100)),
+    Column('room_number', String(100)),
+    Column('room_type', String(100), nullable=False),
+    Column('price', Float),
+    Column('status', String(100)),
+    Column('max_guests', Integer, nullable=False),
+    Column('min_guests', Integer, nullable=False),
+    Column('max_adults', Integer, nullable=False),
+    Column('max_children', Integer, nullable=False),
+    Column('total_of_this_type', Integer, nullable=False),
+    Column('room_description', Text),
+    Column('room_image', String(120)),
+    UniqueConstraint('room_number', name='uq_room_room_number'),
+)
+
+Table(
+    'booking', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('customer_name', String(100), nullable=False),
+    Column('email', String(120)),
+    Column('phone', String(20)),
+    Column('room_id', Integer, ForeignKey('room.id')),
+    Column('room_type', String(100), nullable=False),
+    Column('checkin_date', Date, nullable=False),
+    Column('checkout_date', Date, nullable=False),
+    Column('price', Float),
+    Column('payment_method', String(50)),
+    Column('status', String(50), nullable=False),
+    Column('payment_status', String(100), nullable=False),
+    Column('idempotency_key', String(64)),
+    UniqueConstraint('idempotency_key', name='uq_booking_idempotency_key'),
+)
+
+Table(
+    'room_night_inventory', metadata,
+    Column('room_type', String(100), primary_key=True),
+    Column('night', Date, primary_key=True),
+    Column('sold', Integer, nullable=False),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection)
@@ -0,0 +1,19 @@
+from sqlalchemy import text
+
+# Indexes for date-range availability, status filters and the admin dashboard sorts
+
+INDEXES = [
+    'CREATE INDEX ix_room_room_type ON room (room_type)',
+    'CREATE INDEX ix_booking_room_type_stay ON booking (room_type, checkin_date, checkout_date)',
+    'CREATE INDEX ix_booking_status ON booking (status)',
+    'CREATE INDEX ix_booking_status_checkin ON booking (status, checkin_date)',
+    'CREATE INDEX ix_booking_room_checkin ON booking (room_id, checkin_date)',
+    'CREATE INDEX ix_booking_checkin_date ON booking (checkin_date)',
+    'CREATE INDEX ix_booking_customer_name ON booking (customer_name)',
+    'CREATE INDEX ix_booking_email ON booking (email)',
+]
+
+
+def upgrade(connection):
+    for statement in INDEXES:
+        connection.execute(text(statement))
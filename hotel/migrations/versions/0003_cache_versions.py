@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert
+
+# Version counters the room catalog cache checks, so every worker notices
+# room and booking changes made by the others
+
+metadata = MetaData()
+
+cache_version = Table(
+    'cache_version', metadata,
+    Column('name', String(50), primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection)
+    connection.execute(insert(cache_version), [{'name': 'rooms', 'version': 0},
+                                               {'name': 'bookings', 'version': 0}])
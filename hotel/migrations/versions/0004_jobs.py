@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text
+
+# Background job queue, first used for payment capture
+
+metadata = MetaData()
+
+Table(
+    'job', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('kind', String(50), nullable=False),
+    Column('reference', String(100)),
+    Column('payload', Text, nullable=False),
+    Column('status', String(20), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('run_at', DateTime, nullable=False),
+    Column('locked_until', DateTime),
+    Column('last_error', Text),
+    Column('result', Text),
+    Column('created_at', DateTime, nullable=False),
+    Column('finished_at', DateTime),
+    Index('ix_job_status_run_at', 'status', 'run_at'),
+    Index('ix_job_reference', 'reference'),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection)
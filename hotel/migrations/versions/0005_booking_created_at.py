@@ -0,0 +1,16 @@
+from sqlalchemy import text
+
+# Creation time of each booking, so unpaid holds can expire. Existing bookings
+# are stamped with the upgrade time, which gives open ones one full hold TTL to
+# be paid before they are released.
+
+STATEMENTS = [
+    'ALTER TABLE booking ADD COLUMN created_at DATETIME',
+    'UPDATE booking SET created_at = CURRENT_TIMESTAMP',
+    'CREATE INDEX ix_booking_status_created ON booking (status, created_at)',
+]
+
+
+def upgrade(connection):
+    for statement in STATEMENTS:
+        connection.execute(text(statement))
@@ -0,0 +1,37 @@
+from sqlalchemy import (Column, Date, Float, ForeignKey, Integer, MetaData, String, Table, insert)
+
+# Rate plans per room type and the seasonal, day-of-week and length-of-stay
+# rules that adjust them, plus the cache version the price calendars follow
+
+metadata = MetaData()
+
+Table(
+    'rate_plan', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('room_type', String(100), nullable=False, unique=True),
+    Column('name', String(100)),
+    Column('base_rate', Float, nullable=False),
+)
+
+Table(
+    'rate_rule', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('rate_plan_id', Integer, ForeignKey('rate_plan.id'), nullable=False, index=True),
+    Column('name', String(100)),
+    Column('start_date', Date),
+    Column('end_date', Date),
+    Column('weekdays', String(7)),
+    Column('min_nights', Integer),
+    Column('percent', Float, nullable=False),
+)
+
+cache_version = Table(
+    'cache_version', MetaData(),
+    Column('name', String(50), primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection)
+    connection.execute(insert(cache_version).values(name='rates', version=0))
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Date, Float, Integer, MetaData, String, Table
+
+# Rooms sold and revenue per room type per night, for the occupancy/ADR/RevPAR
+# reports. Starts empty; fill it from existing bookings with
+# `flask analytics recompute`.
+
+metadata = MetaData()
+
+Table(
+    'daily_rollup', metadata,
+    Column('room_type', String(100), primary_key=True),
+    Column('night', Date, primary_key=True),
+    Column('rooms_sold', Integer, nullable=False),
+    Column('revenue', Float, nullable=False),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection)
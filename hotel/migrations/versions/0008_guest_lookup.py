@@ -0,0 +1,54 @@
+import re
+import secrets
+
+from sqlalchemy import text
+
+# Guest self-service lookup: a booking reference for every booking and an index
+# on phone (email already has one). Existing rows get a fresh reference and
+# their email and phone normalized the way new writes store them, so lookups
+# can match exactly. The normalizers and the reference format are copied from
+# hotel.models as they are at this version, so later changes there don't
+# change what this migration writes.
+
+BATCH = 1000
+REFERENCE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+
+def normalize_email(value):
+    value = (value or '').strip().lower()
+    return value or None
+
+
+def normalize_phone(value):
+    value = (value or '').strip()
+    digits = re.sub(r'\D', '', value)
+    if not digits:
+        return None
+    if value.startswith('+'):
+        return '+' + digits
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    return digits
+
+
+def new_reference():
+    return ''.join(secrets.choice(REFERENCE_ALPHABET) for _ in range(8))
+
+
+def upgrade(connection):
+    connection.execute(text('ALTER TABLE booking ADD COLUMN reference VARCHAR(12)'))
+    rows = connection.execute(text('SELECT id, email, phone FROM booking')).all()
+    used = set()
+    update = text('UPDATE booking SET reference = :reference, email = :email, phone = :phone WHERE id = :id')
+    for start in range(0, len(rows), BATCH):
+        batch = []
+        for booking_id, email, phone in rows[start:start + BATCH]:
+            reference = new_reference()
+            while reference in used:
+                reference = new_reference()
+            used.add(reference)
+            batch.append({'id': booking_id, 'reference': reference,
+                          'email': normalize_email(email), 'phone': normalize_phone(phone)})
+        connection.execute(update, batch)
+    connection.execute(text('CREATE UNIQUE INDEX ix_booking_reference ON booking (reference)'))
+    connection.execute(text('CREATE INDEX ix_booking_phone ON booking (phone)'))
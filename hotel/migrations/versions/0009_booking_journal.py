@@ -0,0 +1,76 @@
+import gzip
+import json
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Column, Date, DateTime, Float, Index, Integer, LargeBinary, MetaData, String, Table, Text, \
+    insert, select
+
+# Append-only journal of booking changes, its snapshots and reader cursors.
+# Bookings made before the journal existed go into a first snapshot at
+# position 0, so a replay starts from them rather than from nothing. The
+# snapshot is written in the journal's format from the booking columns as
+# they are at this version, not from the live model.
+
+metadata = MetaData()
+
+Table(
+    'booking_event', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('booking_id', Integer, nullable=False),
+    Column('kind', String(20), nullable=False),
+    Column('data', Text, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Index('ix_booking_event_booking_id', 'booking_id'),
+)
+
+Table(
+    'journal_snapshot', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('position', Integer, nullable=False),
+    Column('bookings', Integer, nullable=False),
+    Column('data', LargeBinary, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Index('ix_journal_snapshot_position', 'position'),
+)
+
+Table(
+    'journal_cursor', metadata,
+    Column('name', String(50), primary_key=True),
+    Column('position', Integer, nullable=False),
+    Column('updated_at', DateTime),
+)
+
+
+# The booking table as of this migration, only read from
+booking = Table(
+    'booking', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('customer_name', String(100)),
+    Column('email', String(120)),
+    Column('phone', String(20)),
+    Column('room_id', Integer),
+    Column('room_type', String(100)),
+    Column('checkin_date', Date),
+    Column('checkout_date', Date),
+    Column('price', Float),
+    Column('payment_method', String(50)),
+    Column('status', String(50)),
+    Column('payment_status', String(100)),
+    Column('idempotency_key', String(64)),
+    Column('created_at', DateTime),
+    Column('reference', String(12)),
+)
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def upgrade(connection):
+    metadata.create_all(connection)
+    columns = [column.name for column in booking.columns]
+    rows = [[_json_value(value) for value in row] for row in connection.execute(select(booking).order_by(booking.c.id))]
+    data = json.dumps({'columns': columns, 'rows': rows}, separators=(',', ':'))
+    connection.execute(insert(metadata.tables['journal_snapshot']).values(
+        position=0, bookings=len(rows), data=gzip.compress(data.encode('utf-8'), 6),
+        created_at=datetime.now(timezone.utc).replace(tzinfo=None)))
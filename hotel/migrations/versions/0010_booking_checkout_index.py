@@ -0,0 +1,8 @@
+from sqlalchemy import text
+
+# The admin listings sort by checkout date and filter on checkout > from; without
+# an index both read the whole booking table
+
+
+def upgrade(connection):
+    connection.execute(text('CREATE INDEX ix_booking_checkout_date ON booking (checkout_date)'))
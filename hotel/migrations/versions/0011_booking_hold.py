@@ -0,0 +1,18 @@
+from sqlalchemy import text
+
+# Marks the bookings made online, the only ones the hold sweeper may release;
+# imported bookings and ones set by staff stay pending until someone acts. Rows
+# already stored are left unmarked, since nothing tells an abandoned web hold
+# from an imported pending booking: leftovers are cancelled by hand rather than
+# risk releasing a booking that is not a hold.
+
+STATEMENTS = [
+    'ALTER TABLE booking ADD COLUMN hold BOOLEAN NOT NULL DEFAULT FALSE',
+    'DROP INDEX ix_booking_status_created',
+    'CREATE INDEX ix_booking_status_hold_created ON booking (status, hold, created_at)',
+]
+
+
+def upgrade(connection):
+    for statement in STATEMENTS:
+        connection.execute(text(statement))
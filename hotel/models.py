@@ -0,0 +1,214 @@
+import re
+import secrets
+from datetime import datetime, timezone
+
+from hotel.extensions import db
+
+
+# One schema for main.py, app.py and test.py. main.py's room-type rows carry
+# total_of_this_type and the guest limits, app.py's per-room rows a
+# room_number and status, test.py's rows a photo and price; the columns one
+# entry point doesn't use are nullable or defaulted. The older field names are
+# kept as synonyms so templates and queries written against them still work.
+# Schema changes go through hotel/migrations, not db.create_all().
+# Timestamps are naive UTC.
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Guest contact details are stored normalized so lookups can match them exactly through
+# their indexes: emails lowercased, phones reduced to digits with an optional leading +
+# ('00' becomes '+'). There is no country to assume, so local numbers stay local.
+def normalize_email(value):
+    value = (value or '').strip().lower()
+    return value or None
+
+
+def normalize_phone(value):
+    value = (value or '').strip()
+    digits = re.sub(r'\D', '', value)
+    if not digits:
+        return None
+    if value.startswith('+'):
+        return '+' + digits
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    return digits
+
+
+# Booking references guests quote back: 8 characters without the easily confused 0/O and 1/I
+REFERENCE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+
+def new_reference():
+    return ''.join(secrets.choice(REFERENCE_ALPHABET) for _ in range(8))
+
+
+def normalize_reference(value):
+    return re.sub(r'[\s-]', '', value or '').upper() or None
+
+
+class Room(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=True)
+    room_number = db.Column(db.String(100), nullable=True, unique=True)
+    room_type = db.Column(db.String(100), nullable=False, index=True)
+    price = db.Column(db.Float, nullable=True)
+    status = db.Column(db.String(100), default='available')  # available, out_of_service; nightly availability lives in the index
+    max_guests = db.Column(db.Integer, nullable=False, default=2)
+    min_guests = db.Column(db.Integer, nullable=False, default=1)
+    max_adults = db.Column(db.Integer, nullable=False, default=2)
+    max_children = db.Column(db.Integer, nullable=False, default=0)
+    total_of_this_type = db.Column(db.Integer, nullable=False, default=1)
+    room_description = db.Column(db.Text, nullable=True)
+    room_image = db.Column(db.String(120), nullable=True)
+
+    photo = db.synonym('room_image')  # test.py
+
+    def __repr__(self):
+        return f'<Room {self.room_number or self.name or self.room_type}>'
+
+
+class Booking(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    customer_name = db.Column(db.String(100), nullable=False, index=True)
+    email = db.Column(db.String(120), nullable=True, index=True)
+    phone = db.Column(db.String(20), nullable=True)
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'), nullable=True)
+    room_type = db.Column(db.String(100), nullable=False)
+    checkin_date = db.Column(db.Date, nullable=False, index=True)
+    checkout_date = db.Column(db.Date, nullable=False, index=True)
+    price = db.Column(db.Float, nullable=True)
+    payment_method = db.Column(db.String(50), nullable=True)
+    status = db.Column(db.String(50), nullable=False, default='pending')  # pending, confirmed, cancelled
+    payment_status = db.Column(db.String(100), nullable=False, default='pending')  # pending, paid
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=True)  # sent by the booking form, dedupes retries
+    created_at = db.Column(db.DateTime, nullable=True, default=utcnow)  # unpaid holds expire from here
+    reference = db.Column(db.String(12), nullable=True, default=new_reference)  # quoted by the guest to look it up
+    hold = db.Column(db.Boolean, nullable=False, default=False)  # made online, released if left unpaid
+
+    room = db.relationship('Room', backref=db.backref('bookings', lazy=True))
+
+    # test.py
+    guest_name = db.synonym('customer_name')
+    guest_email = db.synonym('email')
+    guest_phone = db.synonym('phone')
+    check_in = db.synonym('checkin_date')
+    check_out = db.synonym('checkout_date')
+
+    # Indexes behind the availability checks and the admin dashboard filters and sorts
+    __table_args__ = (
+        db.Index('ix_booking_room_type_stay', 'room_type', 'checkin_date', 'checkout_date'),
+        db.Index('ix_booking_status', 'status'),
+        db.Index('ix_booking_status_checkin', 'status', 'checkin_date'),
+        db.Index('ix_booking_room_checkin', 'room_id', 'checkin_date'),
+        db.Index('ix_booking_status_hold_created', 'status', 'hold', 'created_at'),
+        db.Index('ix_booking_reference', 'reference', unique=True),
+        db.Index('ix_booking_phone', 'phone'),
+    )
+
+    @db.validates('email')
+    def _normalize_email(self, key, value):
+        return normalize_email(value)
+
+    @db.validates('phone')
+    def _normalize_phone(self, key, value):
+        return normalize_phone(value)
+
+    def __repr__(self):
+        return f'<Booking {self.customer_name} - {self.room_type}>'
+
+
+# One change to a booking, appended in the transaction that made it; see hotel/journal.py.
+# `id` is the position in the log. No foreign key, since deleted bookings keep their history.
+class BookingEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # created, updated, status, payment, deleted
+    data = db.Column(db.Text, nullable=False)  # JSON of the booking row after the change (before, for deleted)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+# Every booking row as of event `position`, so a replay only reads the events after it
+class JournalSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    position = db.Column(db.Integer, nullable=False, index=True)
+    bookings = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)  # gzipped JSON
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+# How far a named reader of the journal has got
+class JournalCursor(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+
+# Units of each room type sold per night, kept in step with Booking by every write path
+class RoomNightInventory(db.Model):
+    room_type = db.Column(db.String(100), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    sold = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Counters bumped in the same transaction as room/booking changes; see hotel/catalog.py
+class CacheVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# A unit of background work, see hotel/jobs.py
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    reference = db.Column(db.String(100), nullable=True)  # what the job is about, e.g. 'booking:42'
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False)  # not before; pushed back on every retry
+    locked_until = db.Column(db.DateTime, nullable=True)  # lease of the worker running it
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        db.Index('ix_job_reference', 'reference'),
+    )
+
+
+# Nightly base rate for a room type; rooms without a plan are quoted at Room.price
+class RatePlan(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    room_type = db.Column(db.String(100), nullable=False, unique=True)
+    name = db.Column(db.String(100), nullable=True)
+    base_rate = db.Column(db.Float, nullable=False)
+
+    rules = db.relationship('RateRule', backref='rate_plan', lazy=True, cascade='all, delete-orphan')
+
+
+# Adjusts a plan's rate by `percent` (-10 is 10% off). A rule with min_nights is a
+# length-of-stay discount on the whole stay, any other rule applies to each night
+# in [start_date, end_date) falling on one of `weekdays` ('0'-'6', Monday is 0).
+# Missing dates or weekdays mean no restriction.
+class RateRule(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    rate_plan_id = db.Column(db.Integer, db.ForeignKey('rate_plan.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=True)
+    start_date = db.Column(db.Date, nullable=True)
+    end_date = db.Column(db.Date, nullable=True)
+    weekdays = db.Column(db.String(7), nullable=True)
+    min_nights = db.Column(db.Integer, nullable=True)
+    percent = db.Column(db.Float, nullable=False)
+
+
+# Confirmed rooms and revenue per room type per night, see hotel/analytics.py
+class DailyRollup(db.Model):
+    room_type = db.Column(db.String(100), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    rooms_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
@@ -0,0 +1,177 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import Response, current_app, make_response, request
+
+# Full-page cache for the static marketing routes.
+#
+# Their output is the same for every visitor, so a hit returns the stored body
+# without running the view or Jinja. Entries are keyed by a version built from
+# the template files and HOTEL_INFO: editing either produces a new version, so
+# stale pages are never served and simply age out of the LRU. Every response
+# carries an ETag and Last-Modified and answers conditional GETs with 304.
+# Only the query args a view declares (`vary`) are part of the key, so junk
+# query strings all land on the same entry instead of flooding the cache.
+
+
+class LRUCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl=None):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared across worker processes; needs the optional `redis` package. Entries are stored as a
+# line of JSON followed by the body, never pickled, so whoever can write to Redis can't run code here.
+class RedisCache:
+    def __init__(self, url, prefix='hotel:page:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PAGE_CACHE_BACKEND='redis' needs the redis package (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        meta, _, body = raw.partition(b'\n')
+        try:
+            entry = json.loads(meta)
+        except ValueError:
+            return None
+        entry['body'] = body
+        return entry
+
+    def set(self, key, entry, ttl=None):
+        meta = {name: value for name, value in entry.items() if name != 'body'}
+        self._client.set(self._prefix + key, json.dumps(meta).encode() + b'\n' + entry['body'], ex=ttl)
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+
+class PageCache:
+    def __init__(self, app, backend):
+        self.backend = backend
+        self._app = app
+        self._version = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    # Fingerprint of every template file, the hotel info shown on the pages and the asset build they link
+    def _fingerprint(self):
+        digest = hashlib.sha1()
+        for folder in self._app.jinja_loader.searchpath:
+            for root, _, files in os.walk(folder):
+                for name in sorted(files):
+                    stat = os.stat(os.path.join(root, name))
+                    digest.update(f'{name}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+        digest.update(json.dumps(self._app.config['HOTEL_INFO'], sort_keys=True).encode())
+        digest.update(self._app.extensions['assets'].version.encode())
+        digest.update(str(self._generation).encode())
+        return digest.hexdigest()[:16]
+
+    @property
+    def version(self):
+        # Re-stat the templates on every request only while they are being edited
+        if self._version is None or self._app.debug or self._app.config['PAGE_CACHE_WATCH_TEMPLATES']:
+            with self._lock:
+                self._version = self._fingerprint()
+        return self._version
+
+    # Drop every cached page, e.g. after changing HOTEL_INFO at runtime
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._version = None
+        self.backend.clear()
+
+    def _render(self, view, args, kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+            return response, None
+        body = response.get_data()
+        entry = {
+            'body': body,
+            'mimetype': response.mimetype,
+            'etag': hashlib.sha1(body).hexdigest()[:20],
+            'last_modified': int(time.time()),
+        }
+        return response, entry
+
+    def serve(self, view, args, kwargs, vary=()):
+        if request.method not in ('GET', 'HEAD'):
+            return view(*args, **kwargs)
+        query = urlencode([(name, value) for name in sorted(vary) for value in request.args.getlist(name)])
+        key = f'{self.version}:{request.path}?{query}'
+        entry = self.backend.get(key)
+        status = 'HIT'
+        if entry is None:
+            status = 'MISS'
+            response, entry = self._render(view, args, kwargs)
+            if entry is None:
+                return response
+            self.backend.set(key, entry, ttl=self._app.config['PAGE_CACHE_TTL'])
+
+        response = Response(entry['body'], mimetype=entry['mimetype'])
+        response.set_etag(entry['etag'])
+        response.last_modified = entry['last_modified']
+        response.cache_control.public = True
+        response.cache_control.max_age = self._app.config['PAGE_CACHE_MAX_AGE']
+        response.headers['X-Page-Cache'] = status
+        return response.make_conditional(request)
+
+
+# @cached_page, or @cached_page(vary=('lang',)) for a view whose page depends on those query args
+def cached_page(view=None, vary=()):
+    if view is None:
+        return functools.partial(cached_page, vary=tuple(vary))
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.extensions.get('page_cache')
+        if cache is None:
+            return view(*args, **kwargs)
+        return cache.serve(view, args, kwargs, vary)
+    return wrapper
+
+
+def page_cache():
+    return current_app.extensions['page_cache']
+
+
+def init_page_cache(app):
+    if not app.config['PAGE_CACHE_ENABLED']:
+        return
+    if app.config['PAGE_CACHE_BACKEND'] == 'redis':
+        backend = RedisCache(app.config['PAGE_CACHE_URL'])
+    else:
+        backend = LRUCache(app.config['PAGE_CACHE_MAX_ENTRIES'])
+    app.extensions['page_cache'] = PageCache(app, backend)
@@ -0,0 +1,129 @@
+import base64
+import binascii
+import json
+from datetime import date
+
+from sqlalchemy import and_, false, or_
+
+from hotel.availability import parse_date
+
+MAX_PAGE_SIZE = 200
+
+
+# Opaque cursor carrying the sort value and id of the last row on a page
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, date):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError('invalid cursor')
+    return sort_value, row_id
+
+
+def _is_date_column(column):
+    try:
+        return column.type.python_type is date
+    except NotImplementedError:
+        return False
+
+
+class Page:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+# Keyset (seek) pagination: rows after the cursor's (sort value, id) are found
+# through the index on the sort column, so page N costs the same as page 1
+# instead of skipping N * per_page rows the way OFFSET does.
+def paginate(query, sort_column, id_column, cursor=None, per_page=50, descending=False):
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        if _is_date_column(sort_column) and sort_value is not None:
+            sort_value = parse_date(sort_value)
+        if descending:
+            query = query.filter(or_(sort_column < sort_value,
+                                     and_(sort_column == sort_value, id_column < last_id)))
+        else:
+            query = query.filter(or_(sort_column > sort_value,
+                                     and_(sort_column == sort_value, id_column > last_id)))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return Page(items, next_cursor)
+
+
+# Apply the admin listing filters from request args.
+#
+# `columns` maps filter names to model columns: 'status', 'room_type',
+# 'checkin' and 'checkout' to a single column, 'guest' to a list of columns
+# matched by prefix. A column stored normalized is given as (column, normalize)
+# so the typed prefix is normalized the same way. The prefix match is a range
+# (>= prefix and < prefix + U+FFFF) rather than LIKE, so it can use the column's
+# index: SQLite won't use one for a case-sensitive LIKE ... ESCAPE. `from`/`to`
+# select bookings whose stay overlaps that date range.
+def apply_filters(query, args, columns):
+    if args.get('status') and 'status' in columns:
+        query = query.filter(columns['status'] == args['status'])
+    if args.get('room_type') and 'room_type' in columns:
+        query = query.filter(columns['room_type'] == args['room_type'])
+
+    start = parse_date(args.get('from'))
+    end = parse_date(args.get('to'))
+    if end and 'checkin' in columns:
+        query = query.filter(columns['checkin'] < end)
+    if start and 'checkout' in columns:
+        query = query.filter(columns['checkout'] > start)
+
+    guest = (args.get('guest') or '').strip()
+    if guest and columns.get('guest'):
+        matches = []
+        for column in columns['guest']:
+            column, normalize = column if isinstance(column, tuple) else (column, None)
+            prefix = normalize(guest) if normalize else guest
+            if prefix:
+                matches.append(_prefix_match(column, prefix))
+        query = query.filter(or_(*matches) if matches else false())
+    return query
+
+
+def _prefix_match(column, prefix):
+    return and_(column >= prefix, column < prefix + '\uffff')
+
+
+# Read sort/order/cursor/per_page from request args and return the page of `query`
+def paginate_from_args(query, args, sort_options, id_column, default_sort, per_page=50, default_order='asc'):
+    sort_column = sort_options.get(args.get('sort'), sort_options[default_sort])
+    try:
+        per_page = int(args.get('per_page', per_page))
+    except ValueError:
+        pass
+    return paginate(query, sort_column, id_column, cursor=args.get('after'),
+                    per_page=per_page, descending=args.get('order', default_order) == 'desc')
@@ -0,0 +1,148 @@
+import random
+import time
+import uuid
+
+from flask import current_app
+
+from hotel import jobs
+from hotel.availability import nights
+from hotel.extensions import db
+from hotel.models import Booking, Room
+from hotel.reservations import lock_booking
+from hotel.services import record_status
+
+# Payment capture runs as a background job, so a slow gateway never holds up
+# a web worker: the payment form only queues the capture and the guest's page
+# polls /payment/<id>/status until the job has confirmed the booking. A booking
+# cancelled while the gateway was charging it is not confirmed after all: its
+# nights may have been sold again, so the charge goes back through a refund job.
+
+
+class GatewayError(Exception):
+    pass
+
+
+# Declines are final, so the job doesn't retry them
+class PaymentDeclined(jobs.JobFailed):
+    pass
+
+
+# Stand-in gateway with configurable latency and error rates, for development and benchmarks
+class FakeGateway:
+    def __init__(self, latency=0.5, failure_rate=0.0, decline_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+
+    # `reference` is the gateway's idempotency key, so a retried capture never charges twice
+    def capture(self, amount, method, reference):
+        time.sleep(self.latency)
+        roll = random.random()
+        if roll < self.decline_rate:
+            raise PaymentDeclined('card declined')
+        if roll < self.decline_rate + self.failure_rate:
+            raise GatewayError('gateway timed out')
+        return {'transaction_id': 'fake_' + uuid.uuid4().hex[:16], 'amount': amount, 'method': method}
+
+    def refund(self, transaction_id, amount, reference):
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise GatewayError('gateway timed out')
+        return {'refund_id': 'fake_' + uuid.uuid4().hex[:16], 'transaction_id': transaction_id, 'amount': amount}
+
+
+def gateway():
+    return current_app.extensions['payment_gateway']
+
+
+def reference(booking_id):
+    return f'booking:{booking_id}'
+
+
+def booking_amount(booking):
+    if booking.price is not None:
+        return booking.price
+    room_price = booking.room.price if booking.room is not None and booking.room.price else 0
+    return room_price * len(list(nights(booking.checkin_date, booking.checkout_date)))
+
+
+def _payment_failed(payload, error):
+    booking = db.session.get(Booking, payload['booking_id'])
+    if booking is not None and booking.payment_status == 'processing':
+        booking.payment_status = 'failed'
+
+
+@jobs.handler('capture_payment', on_failure=_payment_failed)
+def capture_payment(payload):
+    booking = db.session.get(Booking, payload['booking_id'])
+    if booking is None or booking.status == 'cancelled':
+        raise jobs.JobFailed('booking no longer open')
+    if booking.payment_status == 'paid':
+        return {'skipped': 'already paid'}
+    amount, method = booking_amount(booking), booking.payment_method
+    db.session.commit()  # no transaction stays open across the gateway call
+
+    receipt = gateway().capture(amount, method, reference(booking.id))
+
+    # Under the type's lock, so a cancellation can't slip in between this check and the commit
+    booking = lock_booking(db.session, Booking, Room, payload['booking_id'])
+    if booking is None or booking.status == 'cancelled':
+        if booking is not None:
+            booking.payment_status = 'refund_pending'
+        jobs.submit('refund_payment', {'booking_id': payload['booking_id'], 'amount': receipt['amount'],
+                                       'transaction_id': receipt['transaction_id']},
+                    reference=reference(payload['booking_id']))
+        return dict(receipt, refund='queued')
+    booking.payment_status = 'paid'
+    record_status(booking, booking.status, 'confirmed')
+    booking.status = 'confirmed'
+    return receipt
+
+
+def _refund_failed(payload, error):
+    booking = db.session.get(Booking, payload['booking_id'])
+    if booking is not None:
+        booking.payment_status = 'refund_failed'  # left for staff to settle with the gateway
+
+
+@jobs.handler('refund_payment', on_failure=_refund_failed)
+def refund_payment(payload):
+    booking_id = payload['booking_id']
+    receipt = gateway().refund(payload['transaction_id'], payload['amount'], 'refund:' + reference(booking_id))
+    booking = db.session.get(Booking, booking_id)
+    if booking is not None:
+        booking.payment_status = 'refunded'
+    return receipt
+
+
+# Queue the capture for a booking unless one is already queued, running or done
+def start_payment(booking, payment_method=None):
+    job = jobs.latest(reference(booking.id))
+    if booking.payment_status == 'paid' or (job is not None and job.status in ('queued', 'running')):
+        return job
+    booking.payment_method = payment_method or booking.payment_method
+    booking.payment_status = 'processing'
+    return jobs.submit('capture_payment', {'booking_id': booking.id}, reference=reference(booking.id))
+
+
+def payment_state(booking):
+    job = jobs.latest(reference(booking.id))
+    return {
+        'booking_id': booking.id,
+        'status': booking.status,
+        'payment_status': booking.payment_status,
+        'job': None if job is None else {
+            'status': job.status,
+            'attempts': job.attempts,
+            'next_attempt_at': job.run_at.isoformat() if job.status == 'queued' else None,
+            'error': job.last_error,
+        },
+    }
+
+
+def init_payments(app):
+    if app.config['PAYMENT_GATEWAY'] != 'fake':
+        raise RuntimeError(f"unknown PAYMENT_GATEWAY {app.config['PAYMENT_GATEWAY']!r}")
+    app.extensions['payment_gateway'] = FakeGateway(app.config['FAKE_GATEWAY_LATENCY'],
+                                                    app.config['FAKE_GATEWAY_FAILURE_RATE'],
+                                                    app.config['FAKE_GATEWAY_DECLINE_RATE'])
@@ -0,0 +1,148 @@
+import threading
+from array import array
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from itertools import accumulate
+
+from flask import current_app
+
+from hotel.availability import nights
+from hotel.catalog import RATES, load_versions
+from hotel.models import RatePlan, RateRule
+
+# Stay quotes from rate plans.
+#
+# A plan's nightly rate is its base rate adjusted by every seasonal and
+# day-of-week rule matching the night; a length-of-stay rule then discounts the
+# whole stay (the one with the highest min_nights the stay qualifies for wins).
+# Evaluating rules night by night is only done once per room type: the nightly
+# rates for the next PRICE_CALENDAR_DAYS are laid out in an array along with
+# their running totals, so a quote's subtotal is the difference of two prefix
+# sums and the nightly breakdown a slice. Calendars are rebuilt when the
+# 'rates' cache version moves, in every worker. Room types without a plan are
+# quoted at the room's flat price.
+
+Rule = namedtuple('Rule', 'start_date end_date weekdays min_nights percent')
+Plan = namedtuple('Plan', 'base_rate nightly_rules stay_rules')
+Quote = namedtuple('Quote', 'room_type checkin_date checkout_date nights nightly subtotal discount total')
+
+
+def _in_dates(rule, day):
+    return (rule.start_date is None or day >= rule.start_date) and (rule.end_date is None or day < rule.end_date)
+
+
+def nightly_rate(plan, night):
+    rate = plan.base_rate
+    for rule in plan.nightly_rules:
+        if _in_dates(rule, night) and (not rule.weekdays or str(night.weekday()) in rule.weekdays):
+            rate *= 1 + rule.percent / 100
+    return round(rate, 2)
+
+
+# Discount (a negative amount) from the best length-of-stay rule for the stay
+def stay_discount(plan, checkin, night_count, subtotal):
+    rules = [rule for rule in plan.stay_rules if rule.min_nights <= night_count and _in_dates(rule, checkin)]
+    if not rules:
+        return 0.0
+    best = max(rules, key=lambda rule: rule.min_nights)
+    return round(subtotal * best.percent / 100, 2)
+
+
+def _quote(plan, room_type, checkin, checkout, nightly):
+    subtotal = round(sum(nightly), 2)
+    discount = stay_discount(plan, checkin, len(nightly), subtotal)
+    return Quote(room_type, checkin, checkout, len(nightly), nightly, subtotal, discount,
+                 round(subtotal + discount, 2))
+
+
+# Reference path: evaluate the rules for every night of the stay
+def quote_by_rules(plan, room_type, checkin, checkout):
+    return _quote(plan, room_type, checkin, checkout, [nightly_rate(plan, night) for night in nights(checkin, checkout)])
+
+
+class PriceCalendar:
+    def __init__(self, plan, start, days):
+        self.plan = plan
+        self.start = start
+        self.rates = array('d', (nightly_rate(plan, start + timedelta(days=offset)) for offset in range(days)))
+        self.totals = array('d', accumulate(self.rates, initial=0.0))
+
+    def covers(self, checkin, checkout):
+        return checkin >= self.start and (checkout - self.start).days <= len(self.rates)
+
+    def quote(self, room_type, checkin, checkout):
+        first, last = (checkin - self.start).days, (checkout - self.start).days
+        subtotal = round(self.totals[last] - self.totals[first], 2)
+        discount = stay_discount(self.plan, checkin, last - first, subtotal)
+        return Quote(room_type, checkin, checkout, last - first, self.rates[first:last].tolist(), subtotal,
+                     discount, round(subtotal + discount, 2))
+
+
+def load_plans():
+    rules = defaultdict(list)
+    for rule in RateRule.query:
+        rules[rule.rate_plan_id].append(Rule(rule.start_date, rule.end_date, rule.weekdays, rule.min_nights,
+                                             rule.percent))
+    plans = {}
+    for rate_plan in RatePlan.query:
+        plan_rules = rules[rate_plan.id]
+        plans[rate_plan.room_type] = Plan(rate_plan.base_rate,
+                                          tuple(rule for rule in plan_rules if rule.min_nights is None),
+                                          tuple(rule for rule in plan_rules if rule.min_nights is not None))
+    return plans
+
+
+class PricingEngine:
+    def __init__(self, horizon_days=730):
+        self.horizon_days = horizon_days
+        self._lock = threading.Lock()
+        self._version = None
+        self._plans = {}
+        self._calendars = {}
+
+    def _refresh(self):
+        version = load_versions().get(RATES, 0)
+        if version != self._version:
+            plans = load_plans()
+            with self._lock:
+                self._plans, self._calendars, self._version = plans, {}, version
+
+    def _calendar(self, room_type, plan):
+        calendar = self._calendars.get(room_type)
+        if calendar is None:
+            calendar = PriceCalendar(plan, date.today() - timedelta(days=1), self.horizon_days)
+            with self._lock:
+                self._calendars[room_type] = calendar
+        return calendar
+
+    # Quote [checkin, checkout) for a room type; `flat_rate` prices types without a plan
+    def quote(self, room_type, checkin, checkout, flat_rate=None):
+        if checkout <= checkin:
+            raise ValueError('checkout must be after checkin')
+        self._refresh()
+        plan = self._plans.get(room_type)
+        if plan is None:
+            if flat_rate is None:
+                raise LookupError(room_type)
+            return _quote(Plan(flat_rate, (), ()), room_type, checkin, checkout,
+                          [flat_rate] * (checkout - checkin).days)
+        calendar = self._calendar(room_type, plan)
+        if calendar.covers(checkin, checkout):
+            return calendar.quote(room_type, checkin, checkout)
+        return quote_by_rules(plan, room_type, checkin, checkout)
+
+
+def pricing():
+    return current_app.extensions['pricing']
+
+
+# Quote a stay in `room` (a Room or catalog RoomRow); None when the room has neither a plan nor a price
+def quote_room(room, checkin, checkout):
+    try:
+        return pricing().quote(room.room_type, checkin, checkout, flat_rate=room.price)
+    except LookupError:
+        return None
+
+
+def init_pricing(app):
+    app.extensions['pricing'] = PricingEngine(app.config['PRICE_CALENDAR_DAYS'])
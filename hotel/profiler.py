@@ -0,0 +1,112 @@
+import heapq
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+# Sampling profiler for single requests.
+#
+# A request is profiled when it sends `X-Profile: 1` (honoured only with
+# PROFILER_ALLOW_HEADER) or is picked at PROFILER_SAMPLE_RATE. While it runs, a
+# helper thread reads the request thread's stack every PROFILER_INTERVAL
+# seconds and counts each distinct stack, which costs the request almost
+# nothing. Only the PROFILER_KEEP slowest profiled requests are kept, written to
+# PROFILER_DIR in the collapsed-stack format flamegraph.pl and speedscope read
+# ("outer;inner;leaf count" per line); faster ones are dropped as slower ones
+# come in.
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_fold(frame)] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return self.samples
+
+
+class Profiler:
+    def __init__(self, app):
+        self.app = app
+        self.directory = app.config['PROFILER_DIR']
+        self._kept = []  # min-heap of (duration, path)
+        self._lock = threading.Lock()
+
+    def wanted(self):
+        config = self.app.config
+        if config['PROFILER_ALLOW_HEADER'] and request.headers.get('X-Profile') == '1':
+            return True
+        return random.random() < config['PROFILER_SAMPLE_RATE']
+
+    def start(self):
+        if self.wanted():
+            sampler = Sampler(threading.get_ident(), self.app.config['PROFILER_INTERVAL'])
+            g._profile = (sampler, time.perf_counter())
+            sampler.start()
+
+    def finish(self, response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+        sampler, started = profile
+        samples = sampler.stop()
+        path = self.keep(time.perf_counter() - started, request.endpoint or 'unmatched', samples)
+        if path is not None:
+            response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    # Write the profile if it is among the slowest seen; returns its path, or None when dropped
+    def keep(self, duration, endpoint, samples):
+        with self._lock:
+            if len(self._kept) >= self.app.config['PROFILER_KEEP'] and duration <= self._kept[0][0]:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{duration * 1000:08.1f}ms-{endpoint}-{time.time_ns()}.folded')
+            with open(path, 'w') as handle:
+                for stack, count in samples.most_common():
+                    handle.write(f'{stack} {count}\n')
+            heapq.heappush(self._kept, (duration, path))
+            if len(self._kept) > self.app.config['PROFILER_KEEP']:
+                _, dropped = heapq.heappop(self._kept)
+                try:
+                    os.remove(dropped)
+                except OSError:
+                    pass
+        logger.info('profiled %s in %.1f ms: %s', endpoint, duration * 1000, path)
+        return path
+
+
+def init_profiler(app):
+    if not (app.config['PROFILER_ALLOW_HEADER'] or app.config['PROFILER_SAMPLE_RATE']):
+        return
+    profiler = Profiler(app)
+    app.extensions['profiler'] = profiler
+    app.before_request(profiler.start)
+    app.after_request(profiler.finish)
@@ -0,0 +1,147 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import click
+from flask import Blueprint, Flask, current_app, jsonify, redirect, request
+from flask.cli import AppGroup
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+from hotel import create_app
+from hotel.api import search_room_types
+from hotel.availability import parse_stay
+from hotel.config import Config
+from hotel.extensions import db
+from hotel.migrations import current_version, upgrade
+
+logger = logging.getLogger(__name__)
+
+# Several properties (hotels) served by one deployment, each on its own database.
+#
+# PROPERTIES maps a short code to the property's name and database URL, plus any
+# config overrides for that property:
+#
+#   HOTEL_PROPERTIES='{"sunrise": {"name": "Sunrise Hotel", "database": "sqlite:////srv/hotel.db"},
+#                      "hostel": {"name": "Beach Hostel", "database": "sqlite:////srv/hostel.db",
+#                                 "DATABASE_POOL_SIZE": 5}}'
+#   flask --app group properties upgrade
+#   gunicorn group:app
+#
+# Each property is a complete app from create_app() mounted under /<code>, so
+# it has its own engine and connection pool (with SQLite its own file and
+# write lock, so one busy hotel's writes never wait on another's) and its own
+# caches, availability indexes, job workers and hold sweeper, which never mix
+# two properties' rooms. The group app in front answers the cross-property
+# search by running each property's search on a thread of its own and merging
+# the results; a property that fails or takes longer than
+# PROPERTY_SEARCH_TIMEOUT is reported as unavailable instead of holding up
+# the others. Commands for one property run against its database directly,
+# e.g. DATABASE_URL=sqlite:////srv/hostel.db flask --app main jobs work.
+
+bp = Blueprint('group', __name__)
+
+
+def properties():
+    return current_app.extensions['properties']
+
+
+def _property_url(code, path):
+    return f'{request.script_root}/{code}{path}'
+
+
+@bp.route('/')
+def home():
+    return redirect(_property_url(next(iter(properties())), '/'))
+
+
+@bp.route('/api/v1/properties')
+def list_properties():
+    return jsonify({'data': [{'code': code, 'name': app.config['HOTEL_INFO']['name'], 'url': _property_url(code, '/')}
+                             for code, app in properties().items()]})
+
+
+def _search(app, checkin_date, checkout_date, guests, room_type):
+    with app.app_context():
+        return search_room_types(checkin_date, checkout_date, guests, room_type)
+
+
+# Every property's free room types for ?checkin_date=&checkout_date=[&guests=&room_type=], cheapest first
+@bp.route('/api/v1/availability')
+def search_availability():
+    try:
+        checkin_date, checkout_date = parse_stay(request.args)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    if checkin_date is None:
+        return jsonify({'error': 'checkin_date and checkout_date are required'}), 400
+    guests = request.args.get('guests', type=int)
+    room_type = request.args.get('room_type')
+
+    pool = current_app.extensions['property_search_pool']
+    futures = {code: pool.submit(_search, app, checkin_date, checkout_date, guests, room_type)
+               for code, app in properties().items()}
+    done, _ = wait(futures.values(), timeout=current_app.config['PROPERTY_SEARCH_TIMEOUT'])
+
+    results, unavailable = [], []
+    stay = f'checkin_date={checkin_date.isoformat()}&checkout_date={checkout_date.isoformat()}'
+    for code, future in futures.items():
+        if future not in done or future.exception() is not None:
+            if future in done:
+                logger.warning('search of property %s failed', code, exc_info=future.exception())
+            unavailable.append(code)
+            continue
+        name = properties()[code].config['HOTEL_INFO']['name']
+        for result in future.result():
+            results.append(dict(result, property=code, property_name=name,
+                                url=_property_url(code, '/room_details?' + stay)))
+    results.sort(key=lambda result: (result['total'] is None, result['total'] or 0, result['property']))
+    return jsonify({'checkin_date': checkin_date.isoformat(), 'checkout_date': checkout_date.isoformat(),
+                    'data': results, 'unavailable': unavailable})
+
+
+properties_cli = AppGroup('properties', help="Manage every property's database.")
+
+
+#   flask --app group properties list
+@properties_cli.command('list')
+def list_command():
+    for code, app in properties().items():
+        with app.app_context(), db.engine.begin() as connection:
+            version = current_version(connection)
+        click.echo(f"{code}: {app.config['HOTEL_INFO']['name']}, {db_url(app)}, schema version {version}")
+
+
+#   flask --app group properties upgrade
+@properties_cli.command('upgrade')
+def upgrade_command():
+    for code, app in properties().items():
+        with app.app_context():
+            applied = upgrade(db.engine)
+        click.echo(f"{code}: {', '.join(applied) if applied else 'up to date'}")
+
+
+def db_url(app):
+    return app.config['SQLALCHEMY_DATABASE_URI'].rsplit('@', 1)[-1]  # no password in the output
+
+
+# The group app: the properties in `config` (a dict of overrides on top of Config, applied to
+# every property as well) mounted under /<code>, plus the cross-property API
+def create_group_app(config=None):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.from_mapping(config or {})
+    if not app.config['PROPERTIES']:
+        raise RuntimeError('PROPERTIES is empty: set HOTEL_PROPERTIES, or serve main:app for a single property')
+
+    apps = {}
+    for code, entry in app.config['PROPERTIES'].items():
+        overrides = {key: value for key, value in entry.items() if key.isupper()}
+        apps[code] = create_app(dict(
+            config or {}, **overrides, PROPERTY=code, SQLALCHEMY_DATABASE_URI=entry['database'],
+            HOTEL_INFO=dict(app.config['HOTEL_INFO'], name=entry.get('name', code))))
+    app.extensions['properties'] = apps
+    app.extensions['property_search_pool'] = ThreadPoolExecutor(
+        app.config['PROPERTY_SEARCH_THREADS'] or len(apps), thread_name_prefix='property-search')
+    app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {'/' + code: property_app for code, property_app in apps.items()})
+    app.register_blueprint(bp)
+    app.cli.add_command(properties_cli)
+    return app
@@ -0,0 +1,97 @@
+from flask import Blueprint, abort, current_app, jsonify, render_template, request, redirect, url_for
+
+from hotel.availability import parse_stay
+from hotel.catalog import all_rooms, room_types_free
+from hotel.page_cache import cached_page
+from hotel.pricing import quote_room
+from hotel.query_budget import query_budget
+from hotel.services import availability
+from hotel.templating import stream_page
+
+bp = Blueprint('public', __name__)
+
+
+@bp.route("/")
+@cached_page
+def index():
+    return render_template('index.html', hotel_info=current_app.config['HOTEL_INFO'])
+
+
+@bp.route("/about")
+@cached_page
+def about():
+    return render_template("about.html")
+
+
+@bp.route("/gallery")
+@cached_page
+def gallery():
+    return render_template("gallery.html")
+
+
+@bp.route("/room")
+@cached_page
+def room():
+    return render_template("room.html")
+
+
+@bp.route("/service")
+@cached_page
+def service():
+    return render_template("services.html")
+
+
+@bp.route("/dining")
+@cached_page
+def dining():
+    return render_template("dining.html")
+
+
+@bp.route("/events")
+@cached_page
+def events():
+    return render_template("events.html")
+
+
+# Route to display room details, optionally only the room types free for ?checkin_date=&checkout_date=
+@bp.route('/room_details')
+@query_budget(3)
+def room_details():
+    try:
+        checkin_date, checkout_date = parse_stay(request.args)
+    except ValueError:
+        return redirect(url_for('public.room_details'))
+
+    if checkin_date:
+        rooms = room_types_free(checkin_date, checkout_date, availability())
+    else:
+        rooms = all_rooms()
+    return stream_page('room_details.html', rooms=rooms,
+                       checkin_date=checkin_date, checkout_date=checkout_date)
+
+
+# Price a stay: /quote?room_type=Deluxe&checkin_date=2031-05-01&checkout_date=2031-05-04 (or room_id=)
+@bp.route('/quote')
+@query_budget(4)
+def quote():
+    try:
+        checkin_date, checkout_date = parse_stay(request.args)
+    except ValueError:
+        abort(400)
+    if checkin_date is None:
+        abort(400)
+    room_id = request.args.get('room_id', type=int)
+    room_type = request.args.get('room_type')
+    if room_id is not None:
+        rooms = [room for room in all_rooms() if room.id == room_id]
+    else:
+        rooms = [room for room in all_rooms() if room.room_type == room_type]
+    # Without a rate plan a room type is quoted at its cheapest room
+    rooms.sort(key=lambda room: room.price if room.price is not None else float('inf'))
+    stay_quote = quote_room(rooms[0], checkin_date, checkout_date) if rooms else None
+    if stay_quote is None:
+        abort(404)
+    result = stay_quote._asdict()
+    result['checkin_date'] = checkin_date.isoformat()
+    result['checkout_date'] = checkout_date.isoformat()
+    return jsonify(result)
@@ -0,0 +1,105 @@
+import logging
+import threading
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from hotel.templating import after_stream
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# Counts SQL statements run on this thread while active; usable around any code
+#
+#   with count_queries() as counter:
+#       client.get('/admin/dashboard')
+#   assert counter.count <= 3
+class count_queries:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __enter__(self):
+        _stack().append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _stack().remove(self)
+        return False
+
+
+def _stack():
+    if not hasattr(_local, 'counters'):
+        _local.counters = []
+    return _local.counters
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in _stack():
+        counter.count += 1
+        counter.statements.append(statement)
+    if has_app_context() and '_request_queries' in g:
+        g._request_queries.count += 1
+        g._request_queries.statements.append(statement)
+
+
+# Mark a view with the most SQL statements one request may run
+def query_budget(limit):
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def _budget_for_request():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'query_budget', current_app.config.get('SQL_QUERY_BUDGET'))
+
+
+def _start_counting():
+    g._request_queries = count_queries()
+
+
+def _check_budget(response):
+    counter = g.get('_request_queries')
+    if counter is None:
+        return response
+    endpoint, budget = request.endpoint, _budget_for_request()
+    # Under test (or when asked to) going over budget is a failure, in production a warning
+    strict = current_app.testing or current_app.config.get('SQL_QUERY_BUDGET_STRICT')
+
+    def enforce():
+        if budget is not None and counter.count > budget:
+            message = f'{endpoint} ran {counter.count} SQL statements, budget is {budget}'
+            if strict:
+                raise QueryBudgetExceeded(message + ':\n' + '\n'.join(counter.statements))
+            logger.warning(message)
+
+    # A streamed page runs its template, and whatever SQL that triggers, while it is sent: the
+    # counter stays in g, which the stream's context shares, and is checked once the page is out
+    def finish(completed):
+        if completed:
+            enforce()
+
+    if after_stream(response, finish):
+        return response  # and no X-SQL-Queries: its headers go out before the count is known
+    g.pop('_request_queries')
+    response.headers['X-SQL-Queries'] = str(counter.count)
+    enforce()
+    return response
+
+
+# Count the SQL statements of every request and enforce the per-view budgets
+def init_query_budget(app):
+    app.config.setdefault('SQL_QUERY_BUDGET', None)  # default for views without @query_budget
+    app.config.setdefault('SQL_QUERY_BUDGET_STRICT', False)
+    app.before_request(_start_counting)
+    app.after_request(_check_budget)
@@ -0,0 +1,184 @@
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from hotel import inventory
+from hotel.availability import IntervalIndex, type_capacities
+
+
+class SoldOut(Exception):
+    pass
+
+
+# Take the inventory lock for a room's type and return the room row.
+#
+# Capacity is per room type (Room.total_of_this_type), so the lock covers the
+# whole type. SQLite has no row locks, so the whole write transaction is
+# started with BEGIN IMMEDIATE: the second writer waits (busy timeout) until
+# the first one commits and then sees its booking. Server databases lock the
+# type's first room row (lowest id) with SELECT ... FOR UPDATE, so bookings of
+# different rooms of one type queue behind each other too.
+def lock_room(session, room_model, room_id):
+    session.rollback()  # the lock has to be the first statement of a fresh transaction
+    if session.get_bind().dialect.name == 'sqlite':
+        session.execute(text('BEGIN IMMEDIATE'))
+        return session.get(room_model, room_id, populate_existing=True)
+    room = session.get(room_model, room_id)
+    while room is not None:
+        room_type = room.room_type
+        _lock_type(session, room_model, room_type)
+        room = session.get(room_model, room_id, populate_existing=True)
+        if room is None or room.room_type == room_type:
+            return room
+        # retyped while we waited for the lock: take its new type's lock too
+    return None
+
+
+def _lock_type(session, room_model, room_type):
+    session.query(room_model.id).filter_by(room_type=room_type).order_by(room_model.id).limit(1) \
+        .with_for_update().first()
+
+
+# The lock of every type in `room_types` at once, e.g. for a batch of imported bookings; taken in
+# name order, so two batches wait for each other instead of deadlocking
+def lock_room_types(session, room_model, room_types):
+    session.rollback()
+    if session.get_bind().dialect.name == 'sqlite':
+        session.execute(text('BEGIN IMMEDIATE'))
+        return
+    for room_type in sorted(room_types):
+        _lock_type(session, room_model, room_type)
+
+
+# The same lock for a booking's type, returning the booking as it is once the lock is held
+def lock_booking(session, booking_model, room_model, booking_id):
+    session.rollback()
+    if session.get_bind().dialect.name == 'sqlite':
+        session.execute(text('BEGIN IMMEDIATE'))
+        return session.get(booking_model, booking_id, populate_existing=True)
+    booking = session.get(booking_model, booking_id)
+    if booking is not None:
+        _lock_type(session, room_model, booking.room_type)
+        booking = session.get(booking_model, booking_id, populate_existing=True)
+    return booking
+
+
+# Oversell-safe booking path for the room-type inventory.
+#
+# The overlap count is read from the database while the lock is held, so the
+# check and the insert are atomic against the type's capacity (the sum of
+# total_of_this_type over its rooms) no matter how many workers are running.
+# An idempotency key turns client retries into a lookup of the booking the
+# first attempt created. With an inventory model the count is a range read of
+# the per-night counters, which are bumped in the same transaction as the
+# insert. `on_write()` runs in that transaction too, e.g. to bump a cache
+# version.
+class Reservations:
+    def __init__(self, db, room_model, booking_model, availability=None, inventory_model=None, on_write=None):
+        self.db = db
+        self.Room = room_model
+        self.Booking = booking_model
+        self.availability = availability
+        self.Inventory = inventory_model
+        self.on_write = on_write
+
+    def find_by_key(self, idempotency_key):
+        if not idempotency_key:
+            return None
+        return self.Booking.query.filter_by(idempotency_key=idempotency_key).first()
+
+    # Units of room_type for sale, read from the database (under the type's lock)
+    def capacity(self, room_type):
+        Room = self.Room
+        rows = self.db.session.query(Room.room_type, Room.total_of_this_type).filter(Room.room_type == room_type)
+        return type_capacities(rows)[room_type]
+
+    # Units of room_type booked on the busiest night of [checkin, checkout), read from the database
+    def booked_units(self, room_type, checkin, checkout):
+        if self.Inventory is not None:
+            return inventory.peak_sold(self.db.session, self.Inventory, room_type, checkin, checkout)
+        Booking = self.Booking
+        rows = self.db.session.query(Booking.checkin_date, Booking.checkout_date, Booking.id) \
+            .filter(Booking.room_type == room_type,
+                    Booking.status != 'cancelled',
+                    Booking.checkin_date < checkout,
+                    Booking.checkout_date > checkin)
+        index = IntervalIndex()
+        for row_checkin, row_checkout, booking_id in rows:
+            index.add(room_type, row_checkin, row_checkout, booking_id)
+        return index.peak_occupancy(room_type, checkin, checkout)
+
+    def book(self, room_id, checkin_date, checkout_date, idempotency_key=None, **fields):
+        session = self.db.session
+        if checkout_date <= checkin_date:
+            raise ValueError('checkout must be after checkin')
+
+        existing = self.find_by_key(idempotency_key)
+        if existing is not None:
+            return existing
+
+        try:
+            room = lock_room(session, self.Room, room_id)
+            if room is None:
+                raise LookupError(room_id)
+
+            # A retry may have committed while we were waiting for the lock
+            existing = self.find_by_key(idempotency_key)
+            if existing is not None:
+                session.rollback()
+                return existing
+
+            if self.booked_units(room.room_type, checkin_date, checkout_date) >= self.capacity(room.room_type):
+                raise SoldOut(room.room_type)
+
+            booking = self.Booking(room_id=room.id, room_type=room.room_type, checkin_date=checkin_date,
+                                   checkout_date=checkout_date, idempotency_key=idempotency_key, hold=True, **fields)
+            session.add(booking)
+            if self.Inventory is not None:
+                inventory.record_stay(session, self.Inventory, room.room_type, checkin_date, checkout_date)
+            if self.on_write is not None:
+                self.on_write()
+            session.commit()
+        except IntegrityError:
+            # Lost a race on the idempotency key with a request that had no lock to wait on
+            session.rollback()
+            existing = self.find_by_key(idempotency_key)
+            if existing is None:
+                raise
+            return existing
+        except Exception:
+            session.rollback()
+            raise
+
+        if self.availability is not None:
+            self.availability.add(booking.room_type, checkin_date, checkout_date, booking.id)
+        return booking
+
+    # Apply change(booking), a status change, to booking `booking_id` and commit it. A cancelled
+    # booking that comes back takes its nights again, so it gets the lock and capacity check of a
+    # new booking and raises SoldOut when its type has no unit left on one of them.
+    def reinstate(self, booking_id, change):
+        session = self.db.session
+        try:
+            booking = lock_booking(session, self.Booking, self.Room, booking_id)
+            if booking is None:
+                raise LookupError(booking_id)
+            cancelled = booking.status == 'cancelled'
+            if cancelled:
+                taken = self.booked_units(booking.room_type, booking.checkin_date, booking.checkout_date)
+                if taken >= self.capacity(booking.room_type):
+                    raise SoldOut(booking.room_type)
+            change(booking)
+            if cancelled and booking.status != 'cancelled':
+                if self.Inventory is not None:
+                    inventory.record_stay(session, self.Inventory, booking.room_type, booking.checkin_date,
+                                          booking.checkout_date)
+                if self.on_write is not None:
+                    self.on_write()
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        if self.availability is not None and booking.status != 'cancelled':
+            self.availability.add(booking.room_type, booking.checkin_date, booking.checkout_date, booking.id)
+        return booking
@@ -0,0 +1,71 @@
+import functools
+import keyword
+from datetime import date, datetime
+
+# Serializers for the JSON API.
+#
+# A Schema maps output field names to object attributes. For each field
+# selection it generates and caches a plain function that builds the dict with
+# direct attribute reads, e.g. lambda obj: {'id': obj.id, 'checkin_date':
+# _iso(obj.checkin_date)}, so a request doesn't walk the model's columns or
+# look attributes up by name per row. Selections are put in the schema's field
+# order without duplicates, so ?fields=b,a,a and ?fields=a,b share one function,
+# and at most SERIALIZER_CACHE_SIZE of them are kept.
+
+SERIALIZER_CACHE_SIZE = 64
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+class Schema:
+    # `fields` maps output names to attribute names; dates and datetimes are sent as ISO strings
+    def __init__(self, fields):
+        for name, attribute in fields.items():
+            if not attribute.isidentifier() or keyword.iskeyword(attribute):
+                raise ValueError(f'bad attribute for {name}: {attribute!r}')
+        self.fields = dict(fields)
+        self._compiled = functools.lru_cache(maxsize=SERIALIZER_CACHE_SIZE)(self._compile)
+
+    # Parse a ?fields=a,b selection; None or '' selects every field
+    def select(self, selection):
+        if not selection:
+            return tuple(self.fields)
+        names = {name.strip() for name in selection.split(',') if name.strip()}
+        unknown = sorted(names - set(self.fields))
+        if unknown:
+            raise ValueError('unknown fields: ' + ', '.join(unknown))
+        return self._canonical(names)
+
+    def _canonical(self, names):
+        names = set(names)
+        return tuple(name for name in self.fields if name in names)
+
+    def _compile(self, names):
+        items = ', '.join(f'{name!r}: _iso(obj.{self.fields[name]})' for name in names)
+        namespace = {'_iso': _iso}
+        exec(f'def dump(obj):\n    return {{{items}}}\n', namespace)
+        return namespace['dump']
+
+    def serializer(self, names=None):
+        return self._compiled(self._canonical(names) if names else tuple(self.fields))
+
+    def dump_many(self, objects, names=None):
+        dump = self.serializer(names)
+        return [dump(obj) for obj in objects]
+
+
+ROOM = Schema({
+    'id': 'id', 'name': 'name', 'room_number': 'room_number', 'room_type': 'room_type', 'price': 'price',
+    'status': 'status', 'max_guests': 'max_guests', 'min_guests': 'min_guests', 'max_adults': 'max_adults',
+    'max_children': 'max_children', 'total_of_this_type': 'total_of_this_type',
+    'description': 'room_description', 'image': 'room_image',
+})
+
+BOOKING = Schema({
+    'id': 'id', 'customer_name': 'customer_name', 'email': 'email', 'phone': 'phone', 'room_id': 'room_id',
+    'room_type': 'room_type', 'checkin_date': 'checkin_date', 'checkout_date': 'checkout_date', 'price': 'price',
+    'payment_method': 'payment_method', 'status': 'status', 'payment_status': 'payment_status',
+    'created_at': 'created_at',
+})
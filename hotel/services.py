@@ -0,0 +1,76 @@
+from flask import current_app
+
+from hotel import analytics, inventory
+from hotel.availability import AvailabilityEngine
+from hotel.catalog import BOOKINGS, bump_version
+from hotel.extensions import db
+from hotel.models import Booking, Room, RoomNightInventory
+from hotel.reservations import Reservations
+
+# Per-app booking services. create_app() builds them once and views reach them
+# through current_app, so importing the package never touches the database.
+
+
+# Every booking except a cancelled one holds a unit of its room type
+def load_booked_stays():
+    rows = db.session.query(Booking.room_type, Booking.checkin_date, Booking.checkout_date, Booking.id) \
+        .filter(Booking.status != 'cancelled')
+    return [tuple(row) for row in rows]
+
+
+# The same stays keyed by room, for the per-room listing where each room is a single unit
+def load_booked_rooms():
+    rows = db.session.query(Booking.room_id, Booking.checkin_date, Booking.checkout_date, Booking.id) \
+        .filter(Booking.status != 'cancelled', Booking.room_id.isnot(None))
+    return [tuple(row) for row in rows]
+
+
+def init_services(app):
+    ttl = app.config['AVAILABILITY_INDEX_TTL']
+    room_types = AvailabilityEngine(load_booked_stays, ttl=ttl)
+    app.extensions['availability'] = room_types
+    app.extensions['room_availability'] = AvailabilityEngine(load_booked_rooms, ttl=ttl)
+    app.extensions['reservations'] = Reservations(db, Room, Booking, room_types, RoomNightInventory,
+                                                  on_write=lambda: bump_version(BOOKINGS))
+
+
+def availability():
+    return current_app.extensions['availability']
+
+
+def room_availability():
+    return current_app.extensions['room_availability']
+
+
+def reservations():
+    return current_app.extensions['reservations']
+
+
+# Drop both in-memory indexes; they reload from the bookings on next use
+def availability_reset():
+    availability().invalidate()
+    room_availability().invalidate()
+
+
+# Add (+1) or release (-1) the booking's nights and bump the bookings version; the caller commits
+def record_booking(booking, delta):
+    inventory.record_stay(db.session, RoomNightInventory, booking.room_type,
+                          booking.checkin_date, booking.checkout_date, delta)
+    bump_version(BOOKINGS)
+
+
+# Roll the booking into or out of the daily analytics when it enters or leaves 'confirmed'
+# (new_status None when it is deleted); the caller commits
+def record_status(booking, old_status, new_status):
+    analytics.record_status_change(db.session, booking, old_status, new_status)
+
+
+# Bring the in-memory indexes in line with a booking after its change is committed
+def sync_booking(booking, deleted=False):
+    if deleted or booking.status == 'cancelled':
+        availability().remove(booking.id)
+        room_availability().remove(booking.id)
+        return
+    availability().add(booking.room_type, booking.checkin_date, booking.checkout_date, booking.id)
+    if booking.room_id is not None:
+        room_availability().add(booking.room_id, booking.checkin_date, booking.checkout_date, booking.id)
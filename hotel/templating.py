@@ -0,0 +1,125 @@
+import os
+import time
+
+import click
+from flask import Response, current_app, stream_template
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+# Template compilation and streamed rendering.
+#
+# Jinja turns each template into Python source and compiles it the first time
+# a process uses it, which is most of what a cold worker's first pages cost.
+# With TEMPLATE_CACHE_DIR set, the compiled code is kept on disk, keyed by the
+# template and checked against a hash of its source: `flask templates compile`
+# fills it at deploy time, and every worker started after that loads the code
+# instead of compiling it. An edited template no longer matches its entry, so
+# it is compiled and stored again on first use and nothing stale is served.
+#
+# Listing pages that grow with the data render through stream_page(): the
+# page goes out in TEMPLATE_STREAM_CHUNK pieces while the template runs, so
+# the first byte doesn't wait for the last row and the whole page is never
+# held in memory. Their views still load the rows before returning, so the
+# SQL shows up early; what the template runs while streaming happens after
+# the request's hooks, which is why the query budget and the request metrics
+# finish a streamed response through after_stream() once it has been sent.
+
+EXTENSIONS = ('html', 'txt', 'xml')  # what `flask templates compile` picks up from the template folders
+
+
+class TemplateCache(FileSystemBytecodeCache):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.hits = self.misses = 0
+
+    def load_bytecode(self, bucket):
+        try:
+            super().load_bytecode(bucket)
+        except OSError:
+            pass  # unreadable cache: compile as if there were none
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass  # no cache directory, or a read-only one: the template is still compiled in memory
+
+
+def _joined(pieces, size):
+    buffered, length = [], 0
+    for piece in pieces:
+        buffered.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buffered)
+            buffered, length = [], 0
+    if buffered:
+        yield ''.join(buffered)
+
+
+# render_template() for pages whose size grows with the data, sent as it renders
+def stream_page(template_name, **context):
+    pieces = stream_template(template_name, **context)
+    return Response(_joined(pieces, current_app.config['TEMPLATE_STREAM_CHUNK']), mimetype='text/html')
+
+
+# Call callback(completed) once a streamed body has been sent, or has stopped because of an
+# error or a client that went away (completed is False). The request's context is gone by then,
+# so the callback takes what it needs from the request beforehand. Returns False, changing
+# nothing, for responses that aren't streamed or are files sent as they are.
+def after_stream(response, callback):
+    if not response.is_streamed or response.direct_passthrough:
+        return False
+    body = response.response
+
+    def chunks():
+        completed = False
+        try:
+            yield from body
+            completed = True
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            callback(completed)
+
+    response.response = chunks()
+    return True
+
+
+templates_cli = AppGroup('templates', help='Precompile the Jinja templates.')
+
+
+# Run at deploy time, after the templates are in place and before the workers start:
+#   flask templates compile [--clear]
+@templates_cli.command('compile')
+@click.option('--clear', is_flag=True, help='Empty the cache first, e.g. after a Jinja upgrade.')
+def compile_command(clear):
+    environment = current_app.jinja_env
+    cache = environment.bytecode_cache
+    if not isinstance(cache, TemplateCache):
+        raise click.ClickException('TEMPLATE_CACHE_DIR is not set')
+    os.makedirs(cache.directory, exist_ok=True)
+    if clear:
+        cache.clear()
+    started = time.perf_counter()
+    failed = 0
+    names = environment.list_templates(extensions=EXTENSIONS)
+    for name in names:
+        try:
+            environment.get_template(name)
+        except TemplateError as error:
+            failed += 1
+            click.echo(f'{name}: {error}', err=True)
+    click.echo(f'{len(names)} templates in {cache.directory}: {cache.misses} compiled, {cache.hits} already cached, '
+               f'{(time.perf_counter() - started) * 1000:.0f} ms')
+    if failed:
+        raise click.ClickException(f'{failed} templates failed to compile')
+
+
+def init_templates(app):
+    if app.config['TEMPLATE_CACHE_DIR']:
+        app.jinja_env.bytecode_cache = TemplateCache(app.config['TEMPLATE_CACHE_DIR'])
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hotel import create_app  # noqa: E402
+from hotel.extensions import db  # noqa: E402
+from hotel.migrations import upgrade  # noqa: E402
+
+
+# make_app(**config): an app on this test's migrated SQLite file, with no background threads
+# unless the test asks for them. Apps made in one test share the database, like processes would.
+@pytest.fixture
+def make_app(tmp_path):
+    apps = []
+
+    def make(**config):
+        app = create_app(dict({
+            'TESTING': True,
+            'JOB_WORKERS': 0,
+            'HOLD_SWEEP_IN_PROCESS': False,
+            'TEMPLATE_CACHE_DIR': str(tmp_path / 'templates'),
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'hotel.db'),
+        }, **config))
+        with app.app_context():
+            upgrade(db.engine)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        app.extensions['job_runner'].stop(timeout=5)
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
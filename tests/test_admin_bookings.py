@@ -0,0 +1,72 @@
+from datetime import date
+
+import pytest
+
+from hotel.extensions import db
+from hotel.models import Booking, Room, RoomNightInventory
+
+STAY = {'checkin_date': '2031-01-01', 'checkout_date': '2031-01-03'}
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add(Room(room_number='101', room_type='Deluxe', price=100, total_of_this_type=1))
+        db.session.commit()
+    return app
+
+
+def book(client, name):
+    response = client.post('/api/v1/bookings', json=dict(STAY, room_id=1, customer_name=name))
+    assert response.status_code == 201
+    return response.json['data']['id']
+
+
+def state(app):
+    with app.app_context():
+        statuses = dict(db.session.query(Booking.customer_name, Booking.status))
+        sold = {row.night: row.sold for row in db.session.query(RoomNightInventory)}
+    return statuses, sold
+
+
+@pytest.mark.parametrize('reinstate', [
+    lambda client, booking_id: client.post('/admin/update_booking_status/%d' % booking_id,
+                                           data={'status': 'confirmed'}),
+    lambda client, booking_id: client.post('/admin/confirm-booking/%d' % booking_id),
+])
+def test_uncancelling_into_a_full_type_is_refused(app, client, reinstate):
+    first = book(client, 'A')
+    client.post('/admin/cancel-booking/%d' % first)
+    book(client, 'B')
+
+    assert reinstate(client, first).status_code == 409
+    statuses, sold = state(app)
+    assert statuses == {'A': 'cancelled', 'B': 'pending'}
+    assert sold == {date(2031, 1, 1): 1, date(2031, 1, 2): 1}
+
+
+def test_uncancelling_takes_the_nights_back(app, client):
+    first = book(client, 'A')
+    client.post('/admin/cancel-booking/%d' % first)
+
+    assert client.post('/admin/confirm-booking/%d' % first).status_code == 302
+    statuses, sold = state(app)
+    assert statuses == {'A': 'confirmed'}
+    assert sold == {date(2031, 1, 1): 1, date(2031, 1, 2): 1}
+    assert client.post('/api/v1/bookings', json=dict(STAY, room_id=1, customer_name='B')).status_code == 409
+
+
+def test_dashboard_lists_the_newest_bookings_first(client):
+    for day, name in ((1, 'Ann'), (5, 'Bob'), (9, 'Cy')):
+        response = client.post('/api/v1/bookings', json={
+            'room_id': 1, 'customer_name': name,
+            'checkin_date': '2031-02-%02d' % day, 'checkout_date': '2031-02-%02d' % (day + 1)})
+        assert response.status_code == 201
+
+    with client.get('/admin_dash') as response:
+        page = response.get_data(as_text=True)
+    assert page.index('Cy') < page.index('Bob') < page.index('Ann')
+    with client.get('/admin_dash?sort=id&order=asc') as response:
+        page = response.get_data(as_text=True)
+    assert page.index('Ann') < page.index('Bob') < page.index('Cy')
@@ -0,0 +1,44 @@
+from datetime import date
+
+from sqlalchemy import update
+
+from hotel import analytics, inventory
+from hotel.extensions import db
+from hotel.models import DailyRollup
+
+NIGHT = date(2031, 1, 1)
+
+
+def rollup(app):
+    with app.app_context():
+        row = db.session.query(DailyRollup).one()
+        return row.rooms_sold, row.revenue
+
+
+def test_rollup_deltas_add_to_what_others_wrote_meanwhile(app, monkeypatch):
+    with app.app_context():
+        analytics.apply(db.session, {('Deluxe', NIGHT): [1, 100.0]})
+        db.session.commit()
+
+        read = inventory.rows_by_key
+
+        # Another worker confirms a booking for the night between our read and our write
+        def racing(session, model, keys):
+            found = read(session, model, keys)
+            with db.engine.begin() as other:
+                other.execute(update(DailyRollup).values(rooms_sold=DailyRollup.rooms_sold + 1,
+                                                         revenue=DailyRollup.revenue + 100))
+            return found
+
+        monkeypatch.setattr(inventory, 'rows_by_key', racing)
+        analytics.apply(db.session, {('Deluxe', NIGHT): [1, 100.0]})
+        db.session.commit()
+    assert rollup(app) == (3, 300.0)
+
+
+def test_rollup_rows_are_created_and_released(app):
+    with app.app_context():
+        analytics.apply(db.session, {('Deluxe', NIGHT): [1, 80.0]})
+        analytics.apply(db.session, {('Deluxe', NIGHT): [-1, -80.0]})
+        db.session.commit()
+    assert rollup(app) == (0, 0.0)
@@ -0,0 +1,66 @@
+import pytest
+
+from hotel.extensions import db
+from hotel.models import Booking, Room
+
+TOKEN = 'secret-token'
+STAY = {'checkin_date': '2031-01-01', 'checkout_date': '2031-01-03'}
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(API_ADMIN_TOKEN=TOKEN)
+    with app.app_context():
+        db.session.add(Room(room_number='1', room_type='Deluxe', price=100, total_of_this_type=5))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def booking(client):
+    response = client.post('/api/v1/bookings', json=dict(STAY, room_id=1, customer_name='Ann',
+                                                         email='ann@example.com', phone='555 0100'))
+    assert response.status_code == 201
+    return response.json['data']
+
+
+def status_of(app, booking_id):
+    with app.app_context():
+        return db.session.get(Booking, booking_id).status
+
+
+def test_anonymous_read_by_id_is_rejected(client, booking):
+    for path in ('/api/v1/bookings/%d' % booking['id'], '/api/v1/admin/bookings/%d' % booking['id']):
+        response = client.get(path)
+        assert response.status_code in (401, 404)
+        assert 'ann@example.com' not in response.get_data(as_text=True)
+
+
+def test_anonymous_cancel_by_id_is_rejected(app, client, booking):
+    for path in ('/api/v1/bookings/%d/cancel' % booking['id'], '/api/v1/admin/bookings/%d/cancel' % booking['id']):
+        assert client.post(path).status_code in (401, 404)
+    assert status_of(app, booking['id']) == 'pending'
+
+
+def test_reference_needs_the_matching_contact(app, client, booking):
+    path = '/api/v1/bookings/' + booking['reference']
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'X-Booking-Contact': 'eve@example.com'}).status_code == 404
+    assert client.post(path + '/cancel', headers={'X-Booking-Contact': 'eve@example.com'}).status_code == 404
+
+    response = client.get(path, headers={'X-Booking-Contact': 'ANN@example.com'})
+    assert response.status_code == 200 and response.json['data']['id'] == booking['id']
+    response = client.post(path + '/cancel', headers={'X-Booking-Contact': '555-0100'})
+    assert response.status_code == 200 and response.json['data']['status'] == 'cancelled'
+
+
+def test_admin_token_reads_and_cancels_by_id(app, client, booking):
+    headers = {'Authorization': 'Bearer ' + TOKEN}
+    assert client.get('/api/v1/admin/bookings/%d' % booking['id'], headers=headers).status_code == 200
+    assert client.post('/api/v1/admin/bookings/%d/cancel' % booking['id'], headers=headers).status_code == 200
+    assert status_of(app, booking['id']) == 'cancelled'
+
+
+def test_admin_api_is_off_without_a_token(make_app):
+    client = make_app(API_ADMIN_TOKEN=None).test_client()
+    assert client.get('/api/v1/admin/bookings').status_code == 403
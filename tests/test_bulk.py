@@ -0,0 +1,74 @@
+import io
+from datetime import date
+
+from hotel.bulk import import_rows
+from hotel.extensions import db
+from hotel.models import Booking, BookingEvent, Room, RoomNightInventory
+
+BOOKINGS = '''customer_name,email,phone,room_id,checkin_date,checkout_date,price
+Ann,ann@example.com,,1,2031-01-01,2031-01-03,200
+Bob,,555 0101,1,2031-01-02,2031-01-04,200
+Cy,cy@example.com,555 0102,1,2031-01-03,2031-01-05,
+Di,,,1,2031-01-04,2031-01-06,200
+'''
+
+
+def test_import_bookings_with_mixed_empty_columns(app):
+    with app.app_context():
+        db.session.add(Room(room_number='1', room_type='Deluxe', price=100, total_of_this_type=5))
+        db.session.commit()
+
+        report = import_rows('bookings', io.StringIO(BOOKINGS))
+
+        assert report.as_dict() == {'inserted': 4, 'errors': []}
+        bookings = {booking.customer_name: booking for booking in db.session.query(Booking)}
+        assert (bookings['Ann'].email, bookings['Ann'].phone) == ('ann@example.com', None)
+        assert (bookings['Bob'].email, bookings['Bob'].phone) == (None, '5550101')
+        assert bookings['Cy'].price is None
+        assert all(booking.status == 'pending' and booking.reference for booking in bookings.values())
+        assert db.session.query(BookingEvent).count() == 4
+
+
+def test_import_reports_bookings_past_the_type_capacity(app):
+    with app.app_context():
+        db.session.add_all(Room(room_number=number, room_type='Deluxe', price=100, total_of_this_type=1)
+                           for number in ('101', '102'))
+        db.session.commit()
+    response = app.test_client().post('/api/v1/bookings', json={
+        'room_id': 1, 'checkin_date': '2031-01-02', 'checkout_date': '2031-01-03', 'customer_name': 'Ann'})
+    assert response.status_code == 201
+
+    with app.app_context():
+        report = import_rows('bookings', io.StringIO('''customer_name,room_type,checkin_date,checkout_date,status
+Bob,Deluxe,2031-01-01,2031-01-03,pending
+Cy,Deluxe,2031-01-01,2031-01-03,pending
+Di,Deluxe,2031-01-01,2031-01-02,confirmed
+Ed,Deluxe,2031-01-02,2031-01-04,cancelled
+'''))
+        assert report.as_dict() == {'inserted': 3,
+                                    'errors': [{'line': 3, 'error': 'Deluxe has no unit left on 2031-01-02'}]}
+        sold = dict(db.session.query(RoomNightInventory.night, RoomNightInventory.sold))
+        assert sold == {date(2031, 1, 1): 2, date(2031, 1, 2): 2}
+
+
+def test_import_and_export_need_an_admin(make_app):
+    app = make_app(API_ADMIN_TOKEN='s3cret')
+    client = app.test_client()
+
+    def export(**headers):
+        with client.get('/admin/export/bookings', headers=headers) as response:
+            response.get_data()
+            return response.status_code
+
+    upload = {'kind': 'rooms', 'file': (io.BytesIO(b'room_number,room_type,price\n1,Deluxe,100\n'), 'rooms.csv')}
+    assert client.post('/admin/import', data=upload).status_code == 302
+    assert export() == 302
+    assert export(Authorization='Bearer nope') == 401
+    with app.app_context():
+        assert db.session.query(Room).count() == 0
+
+    assert export(Authorization='Bearer s3cret') == 200
+    client.post('/admin', data={'username': 'admin', 'password': 'admin'})
+    assert export() == 200
+    client.get('/logout')
+    assert export() == 302
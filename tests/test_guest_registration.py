@@ -0,0 +1,31 @@
+import pytest
+
+from hotel.extensions import db
+from hotel.models import Booking, Room
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add(Room(room_number='1', room_type='Deluxe', price=100, total_of_this_type=5))
+        db.session.commit()
+    return app
+
+
+def register(client, email):
+    return client.post('/guest/registration', data={'guest_name': 'Eve', 'guest_email': email, 'room_id': '1',
+                                                    'check_in': '2031-01-01', 'check_out': '2031-01-03'})
+
+
+def test_registration_shows_only_the_new_reference(app, client):
+    client.post('/api/v1/bookings', json={'room_id': 1, 'checkin_date': '2031-02-01', 'checkout_date': '2031-02-03',
+                                          'customer_name': 'Ann', 'email': 'ann@example.com'})
+    response = register(client, 'ann@example.com')
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    with app.app_context():
+        references = [booking.reference for booking in db.session.query(Booking).order_by(Booking.id)]
+    assert references[1] in html
+    assert references[0] not in html  # Ann's earlier booking isn't reachable by typing her email
+    assert '/guest/bookings/' not in html
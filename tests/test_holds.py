@@ -0,0 +1,27 @@
+import io
+from datetime import timedelta
+
+from hotel.bulk import import_rows
+from hotel.extensions import db
+from hotel.holds import expire_holds
+from hotel.models import Booking, Room, utcnow
+
+STAY = {'checkin_date': '2031-01-01', 'checkout_date': '2031-01-03'}
+
+
+def test_only_web_holds_expire(app, client):
+    with app.app_context():
+        db.session.add(Room(room_number='101', room_type='Deluxe', price=100, total_of_this_type=5))
+        db.session.commit()
+    for name in ('Web', 'Staff'):
+        response = client.post('/api/v1/bookings', json=dict(STAY, room_id=1, customer_name=name))
+        assert response.status_code == 201
+    client.post('/admin/update_booking_status/2', data={'status': 'confirmed'})
+    client.post('/admin/update_booking_status/2', data={'status': 'pending'})
+
+    with app.app_context():
+        import_rows('bookings', io.StringIO('customer_name,room_type,checkin_date,checkout_date,status\n'
+                                            'Imported,Deluxe,2031-01-01,2031-01-03,pending\n'))
+        assert expire_holds(now=utcnow() + timedelta(days=1)) == 1
+        statuses = dict(db.session.query(Booking.customer_name, Booking.status))
+    assert statuses == {'Web': 'cancelled', 'Staff': 'pending', 'Imported': 'pending'}
@@ -0,0 +1,41 @@
+import time
+
+from hotel import jobs
+from hotel.extensions import db
+from hotel.models import Job
+
+
+@jobs.handler('test.echo')
+def echo(payload):
+    return payload
+
+
+def wait_for_status(app, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        with app.app_context():
+            current = db.session.get(Job, job_id).status
+        if current == status or time.monotonic() > deadline:
+            return current
+        time.sleep(0.02)
+
+
+# A job left queued by an earlier process runs once this one serves a request, with no new submit()
+def test_job_queued_before_startup_runs(make_app):
+    earlier = make_app()
+    with earlier.app_context():
+        job_id = jobs.submit('test.echo', {'n': 1}).id
+
+    app = make_app(JOB_WORKERS=1, JOB_POLL_INTERVAL=0.05)
+    assert app.test_client().get('/about').status_code == 200
+    assert wait_for_status(app, job_id, 'succeeded') == 'succeeded'
+
+
+# Likewise for `flask jobs work --once` in a process of its own
+def test_worker_command_runs_queued_jobs(make_app):
+    app = make_app()
+    with app.app_context():
+        job_id = jobs.submit('test.echo', {'n': 2}).id
+    result = app.test_cli_runner().invoke(args=['jobs', 'work', '--once'])
+    assert '1 jobs run' in result.output
+    assert wait_for_status(app, job_id, 'succeeded', timeout=0) == 'succeeded'
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+import pytest
+
+from hotel.extensions import db
+from hotel.holds import expire_holds
+from hotel.models import Booking, Job, Room, utcnow
+from hotel.payments import FakeGateway, start_payment
+
+TOKEN = 'secret-token'
+STAY = {'checkin_date': '2031-01-01', 'checkout_date': '2031-01-03'}
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(API_ADMIN_TOKEN=TOKEN, FAKE_GATEWAY_LATENCY=0)
+    with app.app_context():
+        db.session.add(Room(room_number='101', room_type='Deluxe', price=100, total_of_this_type=1))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def booking_id(app, client):
+    response = client.post('/api/v1/bookings', json=dict(STAY, room_id=1, customer_name='Ann'))
+    assert response.status_code == 201
+    booking_id = response.json['data']['id']
+    with app.app_context():
+        start_payment(db.session.get(Booking, booking_id), 'card')
+    return booking_id
+
+
+def run_jobs(app):
+    return app.test_cli_runner().invoke(args=['jobs', 'work', '--once']).output
+
+
+def test_booking_cancelled_during_the_capture_is_refunded(app, client, booking_id, monkeypatch):
+    capture = FakeGateway.capture
+
+    def cancel_meanwhile(gateway, *args):
+        response = client.post('/api/v1/admin/bookings/%d/cancel' % booking_id,
+                               headers={'Authorization': 'Bearer ' + TOKEN})
+        assert response.status_code == 200
+        return capture(gateway, *args)
+
+    monkeypatch.setattr(FakeGateway, 'capture', cancel_meanwhile)
+    assert '2 jobs run' in run_jobs(app)
+    with app.app_context():
+        booking = db.session.get(Booking, booking_id)
+        assert (booking.status, booking.payment_status) == ('cancelled', 'refunded')
+        assert sorted(kind for (kind,) in db.session.query(Job.kind)) == ['capture_payment', 'refund_payment']
+
+
+def test_sweeper_leaves_a_capture_in_flight_alone(app, booking_id):
+    with app.app_context():
+        assert expire_holds(now=utcnow() + timedelta(days=1)) == 0
+    assert '1 jobs run' in run_jobs(app)
+    with app.app_context():
+        booking = db.session.get(Booking, booking_id)
+        assert (booking.status, booking.payment_status) == ('confirmed', 'paid')
@@ -0,0 +1,43 @@
+import pytest
+
+from hotel.extensions import db
+from hotel.models import Booking, Room
+
+STAY = {'checkin_date': '2031-01-01', 'checkout_date': '2031-01-03'}
+
+
+# app.py's rooms: one row per room, three rooms of one type
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all(Room(room_number=number, room_type='Deluxe', price=100, total_of_this_type=1,
+                                status='available') for number in ('101', '102', '103'))
+        db.session.commit()
+    return app
+
+
+def active_bookings(app):
+    with app.app_context():
+        return db.session.query(Booking).filter(Booking.status != 'cancelled').count()
+
+
+def test_each_room_of_a_type_can_be_booked(app, client):
+    for room_id in (1, 2, 3):
+        response = client.post('/book_room/%d' % room_id, data=dict(STAY, customer_name='guest %d' % room_id))
+        assert response.status_code == 302
+        assert '/payment/' in response.headers['Location']
+    assert active_bookings(app) == 3
+
+
+def test_a_type_sells_out_at_the_sum_of_its_rooms(app, client):
+    for n in range(4):
+        response = client.post('/api/v1/bookings', json=dict(STAY, room_id=1, customer_name='guest %d' % n))
+        assert response.status_code == (201 if n < 3 else 409)
+    assert active_bookings(app) == 3
+
+
+def test_search_counts_every_room_of_a_type(client):
+    client.post('/api/v1/bookings', json=dict(STAY, room_id=2, customer_name='Ann'))
+    response = client.get('/api/v1/availability', query_string=STAY)
+    assert [(row['room_type'], row['available_units']) for row in response.json['data']] == [('Deluxe', 2)]
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import select
+
+from hotel.extensions import db
+from hotel.models import Room
+from hotel.query_budget import QueryBudgetExceeded, query_budget
+from hotel.templating import stream_page
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(METRICS_ENABLED=True)
+    with app.app_context():
+        db.session.add_all(Room(room_number=str(number), room_type='Deluxe', price=100, total_of_this_type=3)
+                           for number in (1, 2, 3))
+        db.session.commit()
+
+    # Rooms the template reads one query at a time while the page streams
+    @query_budget(2)
+    def lazy_rooms():
+        def rooms():
+            for room_id in (1, 2, 3):
+                yield db.session.execute(select(Room).where(Room.id == room_id)).scalar_one()
+        return stream_page('customer_rooms.html', rooms=rooms())
+
+    app.add_url_rule('/lazy-rooms', view_func=lazy_rooms)
+    return app
+
+
+def test_streamed_page_over_budget_is_caught(client):
+    response = client.get('/lazy-rooms')
+    with pytest.raises(QueryBudgetExceeded, match='lazy_rooms ran 3 SQL statements, budget is 2'):
+        response.get_data()  # the budget is checked once the page has been sent
+
+
+def test_streamed_page_queries_are_in_the_metrics(app, client):
+    app.config['SQL_QUERY_BUDGET_STRICT'] = False
+    app.testing = False
+    response = client.get('/lazy-rooms')
+    assert response.status_code == 200 and response.get_data(as_text=True).count('Book Now') == 3
+
+    metrics = app.extensions['metrics']
+    sql = metrics.sql_count.values[(('endpoint', 'lazy_rooms'),)]
+    assert sql[-1] == 3  # sum of the statements counted for the one request
+    assert metrics.render_time.values[(('template', 'customer_rooms.html'),)][-1] > 0